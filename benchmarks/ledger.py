@@ -0,0 +1,143 @@
+import csv
+import random
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Iterator
+
+# Group hierarchies modeled after `data/session1.csv`. Each group has a typical amount range,
+# positive values for incomes and negative for expenses.
+GROUPS = {
+    "incomes::work": (20000, 60000),
+    "incomes::freelance": (1000, 15000),
+    "incomes::investments": (100, 5000),
+    "incomes::rental": (5000, 15000),
+    "incomes::donations": (100, 2000),
+    "expenses::food": (-3000, -50),
+    "expenses::food::restaurants": (-2000, -150),
+    "expenses::utilities": (-3000, -300),
+    "expenses::utilities::electricity": (-2500, -500),
+    "expenses::utilities::water": (-1000, -200),
+    "expenses::insurance": (-5000, -500),
+    "expenses::entertainment": (-2000, -100),
+    "expenses::health": (-4000, -100),
+    "expenses::education": (-6000, -300),
+    "expenses::transport": (-1500, -30),
+    "expenses::transport::fuel": (-2500, -500),
+    "expenses::travel": (-20000, -1000),
+    "expenses::subscriptions": (-500, -100),
+    "expenses::clothing": (-4000, -300),
+    "expenses::gifts": (-3000, -200),
+    "expenses::pets": (-1500, -100),
+    "expenses::services": (-2000, -200),
+    "expenses::maintenance": (-6000, -500),
+    "expenses::communications": (-1000, -200),
+}
+
+TITLES = {
+    "incomes::work": ["Salary", "Bonus", "Overtime"],
+    "incomes::freelance": ["Freelance Project", "Consulting"],
+    "incomes::investments": ["Dividends", "Interest"],
+    "incomes::rental": ["Rental Income"],
+    "incomes::donations": ["Gift from family"],
+    "expenses::food": ["Grocery Shopping", "Bakery", "Farmers Market"],
+    "expenses::food::restaurants": ["Dinner out", "Lunch", "Coffee"],
+    "expenses::utilities": ["Utility Bill", "Gas Bill"],
+    "expenses::utilities::electricity": ["Electricity bill"],
+    "expenses::utilities::water": ["Water bill"],
+    "expenses::insurance": ["Car Insurance", "Health Insurance"],
+    "expenses::entertainment": ["Concert Tickets", "Cinema", "Streaming"],
+    "expenses::health": ["Pharmacy", "Dentist", "Gym Membership"],
+    "expenses::education": ["Online Course", "Books"],
+    "expenses::transport": ["Bus Ticket", "Taxi"],
+    "expenses::transport::fuel": ["Fuel"],
+    "expenses::travel": ["Flight Tickets", "Hotel"],
+    "expenses::subscriptions": ["Magazine Subscription", "Cloud Storage"],
+    "expenses::clothing": ["New Clothes", "Shoes"],
+    "expenses::gifts": ["Birthday Gift"],
+    "expenses::pets": ["Pet Food", "Veterinarian"],
+    "expenses::services": ["Haircut", "Cleaning"],
+    "expenses::maintenance": ["Home Repair", "Car Service"],
+    "expenses::communications": ["Phone Bill", "Internet"],
+}
+
+# Most transactions are in the home currency, the rest is spread over a few foreign ones.
+CURRENCIES = ["CZK", "EUR", "USD", "GBP", "JPY"]
+CURRENCY_WEIGHTS = [80, 10, 6, 3, 1]
+
+START_DATE = date(2015, 1, 1)
+
+
+def generate_rows(count: int, seed: int = 0, start: date = START_DATE) -> Iterator[list[str]]:
+    """
+    Generates `count` ledger rows in the same shape as `data/session1.csv`.
+    The rows are in chronological order, with a few transactions per day.
+
+    :param count: The number of rows to generate.
+    :param seed: The seed of the random generator, so that the ledgers are reproducible.
+    :param start: The date of the first transaction.
+    """
+    rng = random.Random(seed)
+    groups = list(GROUPS.keys())
+    # Incomes are rarer than expenses
+    weights = [1 if g.startswith("incomes") else 6 for g in groups]
+    current = start
+
+    for _ in range(count):
+        if rng.random() < 0.3:
+            current += timedelta(days=1)
+
+        group = rng.choices(groups, weights)[0]
+        low, high = GROUPS[group]
+        amount = round(rng.uniform(low, high), 2)
+        currency = rng.choices(CURRENCIES, CURRENCY_WEIGHTS)[0]
+        title = rng.choice(TITLES[group])
+        description = "" if rng.random() < 0.5 else f"{title} #{rng.randrange(1000)}"
+
+        yield [current.isoformat(), title, group, str(amount), currency, description]
+
+
+def write_ledger(filename: Path, count: int, seed: int = 0) -> Path:
+    """
+    Writes a synthetic ledger of `count` rows into a header-less CSV file.
+
+    :return: The path to the written file.
+    """
+    with open(filename, 'w', encoding="utf-8", newline='') as f:
+        writer = csv.writer(f)
+        writer.writerows(generate_rows(count, seed))
+
+    return filename
+
+
+def generate_conversions(count: int, seed: int = 0) -> list[dict]:
+    """Generates `count` conversion entries in the format of `config.json`."""
+    rng = random.Random(seed)
+    letters = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+    codes = list({"".join(rng.choices(letters, k=3)) for _ in range(max(2, count // 4))})
+
+    conversions = []
+    for _ in range(count):
+        first, second = rng.sample(codes, 2)
+        conversions.append({"#1": first, "#2": second, "Value": round(rng.uniform(0.001, 100), 4)})
+
+    return conversions
+
+
+def generate_rate_history(months: int, seed: int = 0, start: date = START_DATE, to_currency: str = "CZK") -> list[dict]:
+    """
+    Generates monthly dated conversions of every currency in `CURRENCIES` to `to_currency`,
+    in the format of `config.json`.
+    """
+    rng = random.Random(seed)
+    conversions = []
+    for currency in CURRENCIES:
+        if currency == to_currency:
+            continue
+        rate = rng.uniform(0.1, 30)
+        for month in range(months):
+            year, month = divmod(start.month - 1 + month, 12)
+            effective = date(start.year + year, month + 1, 1)
+            rate *= rng.uniform(0.97, 1.03)
+            conversions.append({"#1": currency, "#2": to_currency, "Value": round(rate, 4),
+                                "Date": effective.isoformat()})
+    return conversions
@@ -0,0 +1,573 @@
+"""
+Benchmark suite of the data layer. Generates synthetic ledgers of the requested sizes, times the
+hot paths on them and stores the results as JSON, so that two runs can be compared.
+
+Usage:
+    python -m benchmarks --sizes 10000 1000000 --output results.json
+    python -m benchmarks --sizes 10000 --compare baseline.json
+"""
+import argparse
+import csv
+import gc
+import io
+import json
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable
+
+from benchmarks.ledger import write_ledger, generate_conversions, generate_rate_history, generate_rows
+from mamlambo.Database import Database, DatabaseView, SQLiteDatabase
+from mamlambo.Database.autocomplete import AutocompleteIndex
+from mamlambo.Database.balance_index import BalanceIndex
+from mamlambo.Database.chunked_list import ChunkedList
+from mamlambo.Database.pivot import PivotTable
+from mamlambo.Database.progressive_load import ProgressiveLoad
+from mamlambo.Database.query import CompositeKey, SortKey, parse_filter
+from mamlambo.Database.statistics import compute_statistics, sample_statistics
+from mamlambo.Diagnostics import instruments
+from mamlambo.Transactions import Transaction
+from mamlambo.Transactions.converter import Converter
+
+DEFAULT_SIZES = [10_000, 1_000_000, 10_000_000]
+ROOT = Path(__file__).resolve().parent.parent
+
+# Shows the main window and closes it as soon as it is painted
+COLD_START_SCRIPT = """
+from mamlambo.GUI import MainWindow
+app = MainWindow()
+app.update()
+app.destroy()
+"""
+
+
+class SkipCase(Exception):
+    """Raised by a case that cannot run in the current environment."""
+
+
+class Context:
+    """Holds the generated ledger of a single size, along with lazily loaded shared data."""
+    def __init__(self, size: int, workdir: Path, seed: int, repeat: int):
+        self.size = size
+        self.workdir = workdir
+        self.seed = seed
+        self.repeat = repeat
+        self.csv_path = write_ledger(workdir / f"ledger_{size}.csv", size, seed)
+        self._view = None
+
+    @property
+    def view(self) -> DatabaseView:
+        """A view with the whole ledger loaded, sorted by date in descending order."""
+        if self._view is None:
+            self._view = DatabaseView(lambda x: x.date, True)
+            self._view.load(str(self.csv_path), Transaction.parse)
+        return self._view
+
+    def measure(self, run: Callable[[], None], setup: Callable[[], None] = None, rows: int = None) -> dict:
+        """
+        Times `run` `self.repeat` times. `setup` is called before every run and is not timed.
+        The garbage collector is disabled while timing, the same way `timeit` does it.
+        """
+        timings = []
+        for _ in range(self.repeat):
+            if setup is not None:
+                setup()
+            gc.collect()
+            gc.disable()
+            try:
+                start = time.perf_counter()
+                run()
+                timings.append(time.perf_counter() - start)
+            finally:
+                gc.enable()
+
+        rows = self.size if rows is None else rows
+        median = statistics.median(timings)
+        return {
+            "rows": rows,
+            "best": min(timings),
+            "median": median,
+            "mean": statistics.fmean(timings),
+            "rows_per_sec": rows / median if median > 0 else None,
+            "timings": timings,
+        }
+
+
+def bench_load(ctx: Context) -> dict:
+    return ctx.measure(lambda: Database().load(str(ctx.csv_path), Transaction.parse))
+
+
+def bench_dump_csv(ctx: Context) -> dict:
+    target = ctx.workdir / "dump.csv"
+    return ctx.measure(lambda: ctx.view.dump(target))
+
+
+def bench_dump_csv_cold(ctx: Context) -> dict:
+    # The first save of a freshly loaded ledger, which has to format every transaction
+    target = ctx.workdir / "dump.csv"
+    database = Database()
+
+    def setup():
+        database.load(str(ctx.csv_path), Transaction.parse)
+
+    return ctx.measure(lambda: database.dump(target), setup)
+
+
+def bench_dump_json(ctx: Context) -> dict:
+    target = ctx.workdir / "dump.json"
+    return ctx.measure(lambda: ctx.view.dump(target))
+
+
+def bench_dump_gzip(ctx: Context) -> dict:
+    target = ctx.workdir / "dump.csv.gz"
+    return ctx.measure(lambda: ctx.view.dump(target))
+
+
+def bench_load_gzip(ctx: Context) -> dict:
+    path = ctx.workdir / f"ledger_{ctx.size}.csv.gz"
+    if not path.exists():
+        ctx.view.dump(path)
+    return ctx.measure(lambda: Database().load(str(path), Transaction.parse))
+
+
+def _load_progressively(ctx: Context, pages: int | None) -> None:
+    """Load the ledger progressively into a view, until it has the given number of pages, or completely."""
+    database = Database()
+    view = DatabaseView(SortKey("Date"), True, database=database)
+    loading = ProgressiveLoad(database, str(ctx.csv_path), Transaction.parse)
+    while not loading.poll():
+        if pages is not None and len(view) >= 50 * pages:
+            loading.cancel()
+            return
+        time.sleep(0.001)
+
+
+def bench_load_first_page(ctx: Context) -> dict:
+    # How long until a progressively loaded ledger shows its first page, compare with `database.load`
+    return ctx.measure(lambda: _load_progressively(ctx, 1))
+
+
+def bench_load_progressive(ctx: Context) -> dict:
+    # The whole progressive load, including the merges of every chunk into a view
+    return ctx.measure(lambda: _load_progressively(ctx, None))
+
+
+def bench_sort(ctx: Context) -> dict:
+    return ctx.measure(lambda: ctx.view.sort_by(sort_key=lambda x: x.amount.exact, reverse=False, filters=[]))
+
+
+def bench_sort_filtered(ctx: Context) -> dict:
+    filters = [lambda x: x.currency == "CZK", lambda x: x.amount.exact < 0]
+    return ctx.measure(lambda: ctx.view.sort_by(sort_key=lambda x: x.amount.exact, reverse=False, filters=filters))
+
+
+def bench_sort_multi(ctx: Context) -> dict:
+    # Sorting by several columns at once, the way the main window does after Shift-clicking the headings
+    key = CompositeKey([("Group", False), ("Date", True), ("Amount", False)])
+    return ctx.measure(lambda: ctx.view.sort_by(sort_key=key, reverse=False, filters=[]))
+
+
+def _schedule_mixed_changes(view: DatabaseView, count: int, seed: int) -> None:
+    """Schedules `count` adds, edits and removes each, spread over the whole view."""
+    rng = random.Random(seed)
+    new_rows = list(generate_rows(count, seed + 1))
+    indices = rng.sample(range(len(view)), min(2 * count, len(view)))
+
+    for row in new_rows:
+        view.add(Transaction.parse(row))
+    for index, row in zip(indices[:count], new_rows):
+        view.edit(index, Transaction.parse(row))
+    for index in indices[count:]:
+        view.remove(index)
+
+
+def bench_commit(ctx: Context) -> dict:
+    view = ctx.view
+    view.sort_by(sort_key=lambda x: x.date, reverse=True, filters=[])
+    changes = max(1, ctx.size // 100)
+    state = {"committed": False}
+
+    def setup():
+        if state["committed"]:
+            view.revert()
+        _schedule_mixed_changes(view, changes, ctx.seed)
+
+    def run():
+        view.commit()
+        state["committed"] = True
+
+    result = ctx.measure(run, setup, rows=3 * changes)
+    view.revert()
+    return result
+
+
+def bench_revert(ctx: Context) -> dict:
+    view = ctx.view
+    view.sort_by(sort_key=lambda x: x.date, reverse=True, filters=[])
+    changes = max(1, ctx.size // 100)
+
+    def setup():
+        _schedule_mixed_changes(view, changes, ctx.seed)
+        view.commit()
+
+    return ctx.measure(view.revert, setup, rows=3 * changes)
+
+
+def bench_consolidate(ctx: Context) -> dict:
+    entries = list(ctx.view.database)
+    database = Database()
+    rng = random.Random(ctx.seed)
+    removed = rng.sample(range(len(entries)), max(1, len(entries) // 100))
+
+    def setup():
+        database._entries = ChunkedList(entries)
+        for i in removed:
+            database._entries[i] = None
+
+    return ctx.measure(database._consolidate, setup)
+
+
+def bench_snapshot(ctx: Context) -> dict:
+    # A snapshot followed by a single edit, which copies the one chunk shared with the snapshot
+    database = ctx.view.database
+    entry = database[0]
+
+    def run():
+        database.snapshot()
+        database._entries[0] = entry
+
+    return ctx.measure(run, rows=len(database))
+
+
+def bench_import_duplicates(ctx: Context) -> dict:
+    # Appending a monthly export that overlaps with the ledger: a tenth of it, half of which is already there
+    database = Database()
+    database.load(str(ctx.csv_path), Transaction.parse)
+    count = max(2, ctx.size // 10)
+    export = list(database)[-count // 2:] + [Transaction.parse(row) for row in generate_rows(count // 2, ctx.seed + 1)]
+    database.import_entries(export[:1])  # Builds the duplicate index, which is then kept up to date
+
+    def setup():
+        database.get_commits().clear()
+
+    return ctx.measure(lambda: database.import_entries(export), setup, rows=len(export))
+
+
+def bench_import_tail(ctx: Context) -> dict:
+    # Following a growing export: a hundredth of the ledger is appended to the file before every run
+    path = ctx.workdir / "growing.csv"
+    shutil.copyfile(ctx.csv_path, path)
+    database = Database()
+    database.load(str(path), Transaction.parse)
+    appended = max(1, ctx.size // 100)
+    rows = list(generate_rows(appended * ctx.repeat, ctx.seed + 1))
+
+    def setup():
+        database.get_commits().clear()
+        with open(path, "a", encoding="utf-8", newline="") as f:
+            csv.writer(f).writerows(rows[:appended])
+        del rows[:appended]
+
+    return ctx.measure(database.import_tail, setup, rows=appended)
+
+
+def bench_diff_file(ctx: Context) -> dict:
+    # Reloading a ledger that another program changed: a hundred transactions edited in place
+    path = ctx.workdir / f"ledger_{ctx.size}.changed.csv"
+    if not path.exists():
+        entries = list(ctx.view.database)
+        for i in range(0, len(entries), max(1, len(entries) // 100)):
+            entry = entries[i]
+            entries[i] = Transaction(entry.date, entry.title + " (changed)", entry.group, entry.amount,
+                                     entry.currency, entry.description)
+        database = Database()
+        database.import_entries(entries)
+        database.commit()
+        database.dump(path)
+
+    database = Database()
+
+    def setup():
+        database.load(str(ctx.csv_path), Transaction.parse)
+
+    return ctx.measure(lambda: database.apply_diff(database.diff_file(path)), setup)
+
+
+def bench_load_many(ctx: Context) -> dict:
+    # Merging monthly exports: the ledger split into 12 files by its rows, each loaded by its own worker
+    paths = []
+    for month in range(12):
+        path = ctx.workdir / f"month_{month}.csv"
+        if not path.exists():
+            write_ledger(path, max(1, ctx.size // 12), ctx.seed + month)
+        paths.append(str(path))
+
+    return ctx.measure(lambda: Database().load_many(paths, Transaction.parse), rows=max(1, ctx.size // 12) * 12)
+
+
+def bench_sqlite_page(ctx: Context) -> dict:
+    # Opening an SQLite ledger and showing the first page of a filtered view, sorted by amount, the way
+    # the main window does it
+    path = ctx.workdir / f"ledger_{ctx.size}.sqlite"
+    if not path.exists():
+        database = SQLiteDatabase()
+        database.load(str(ctx.csv_path), Transaction.parse)
+        database.dump(path)
+        database.close()
+
+    def run():
+        view = DatabaseView(SortKey("Amount"), True, database=SQLiteDatabase(),
+                            filters=[parse_filter("Currency", "== CZK")])
+        view.load(str(path), Transaction.parse)
+        view[0:10]
+        len(view)
+        view.database.close()
+
+    return ctx.measure(run)
+
+
+def bench_compact_page(ctx: Context) -> dict:
+    # Loading a ledger into compact storage and paging through it the way the main window does,
+    # with a cache budget of a few pages
+    def run():
+        view = DatabaseView(SortKey("Date"), True, database=Database(cache_budget=1024 * 1024))
+        view.load(str(ctx.csv_path), Transaction.parse)
+        for start in range(0, len(view), max(1, len(view) // 20)):
+            view[start:start + 50]
+        view.close()
+
+    return ctx.measure(run)
+
+
+def bench_statistics(ctx: Context) -> dict:
+    # The same computation as `StatisticsWindow._prepare_data`, without importing the GUI
+    view = DatabaseView(lambda x: x.date, False, database=ctx.view.database, filters=[lambda x: x.currency == "CZK"])
+    result = ctx.measure(lambda: compute_statistics(view), rows=len(view))
+    view.close()
+    return result
+
+
+def bench_sample_statistics(ctx: Context) -> dict:
+    # The preview of the statistics window, estimated from a sample before the exact statistics are computed
+    view = DatabaseView(lambda x: x.date, False, database=ctx.view.database, filters=[lambda x: x.currency == "CZK"])
+    result = ctx.measure(lambda: sample_statistics(view, seed=ctx.seed), rows=len(view))
+    view.close()
+    return result
+
+
+def bench_pivot(ctx: Context) -> dict:
+    # Summarizing the ledger by second-level group and month, and writing the table out as CSV
+    database = ctx.view.database
+
+    def run():
+        table = PivotTable(database, "group:2", "month")
+        table.write_csv(io.StringIO())
+        table.close()
+
+    return ctx.measure(run)
+
+
+def bench_balance_range(ctx: Context) -> dict:
+    # Moving the date-range slider of the statistics window: the totals of 1000 random ranges
+    balances = BalanceIndex(ctx.view.database, [lambda x: x.currency == "CZK"])
+    first, last = balances.date_range()
+    rng = random.Random(ctx.seed)
+    ranges = [sorted(first + timedelta(days=rng.randrange((last - first).days + 1)) for _ in range(2))
+              for _ in range(1000)]
+
+    def run():
+        for start, end in ranges:
+            balances.incomes("CZK", start, end)
+            balances.expenses("CZK", start, end)
+            balances.balance("CZK", end)
+
+    result = ctx.measure(run, rows=len(ranges))
+    balances.close()
+    return result
+
+
+def bench_autocomplete(ctx: Context) -> dict:
+    # Typing a title and a group, a keystroke at a time, into the transaction window
+    suggestions = AutocompleteIndex(ctx.view.database)
+    suggestions.titles("")  # Builds the index
+    title = ctx.view[0].title
+    group = str(ctx.view[0].group)
+
+    def run():
+        for i in range(len(title) + 1):
+            suggestions.titles(title[:i])
+        for i in range(len(group) + 1):
+            suggestions.groups(group[:i])
+
+    result = ctx.measure(run, rows=len(title) + len(group) + 2)
+    suggestions.close()
+    return result
+
+
+def _run_python(code: str) -> None:
+    process = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True)
+    if process.returncode != 0:
+        raise SkipCase(process.stderr.strip().splitlines()[-1])
+
+
+def bench_gui_import(ctx: Context) -> dict:
+    # Includes the start of the interpreter itself, which is the same for every version of the application
+    _run_python("import mamlambo.GUI")
+    return ctx.measure(lambda: _run_python("import mamlambo.GUI"), rows=1)
+
+
+def bench_gui_cold_start(ctx: Context) -> dict:
+    # Requires a display, skipped on headless machines
+    _run_python(COLD_START_SCRIPT)
+    return ctx.measure(lambda: _run_python(COLD_START_SCRIPT), rows=1)
+
+
+def bench_converter(ctx: Context) -> dict:
+    # Real configurations are small, so the number of conversions is capped
+    conversions = generate_conversions(min(ctx.size, 100_000), ctx.seed)
+    return ctx.measure(lambda: Converter(conversions), rows=len(conversions))
+
+
+def bench_convert_many(ctx: Context) -> dict:
+    # Converting the amounts of the whole ledger at the historical rates of their dates
+    database = ctx.view.database
+    converter = Converter(generate_rate_history(240, ctx.seed))
+    currencies = [t.currency for t in database]
+    amounts = [t.amount for t in database]
+    dates = [t.date for t in database]
+    return ctx.measure(lambda: converter.convert_many(currencies, "CZK", amounts, dates))
+
+
+CASES: dict[str, Callable[[Context], dict]] = {
+    "database.load": bench_load,
+    "database.dump_csv": bench_dump_csv,
+    "database.dump_csv_cold": bench_dump_csv_cold,
+    "database.dump_json": bench_dump_json,
+    "database.dump_gzip": bench_dump_gzip,
+    "database.load_gzip": bench_load_gzip,
+    "database.load_first_page": bench_load_first_page,
+    "database.load_progressive": bench_load_progressive,
+    "view.sort_by": bench_sort,
+    "view.sort_by_filtered": bench_sort_filtered,
+    "view.sort_by_multi": bench_sort_multi,
+    "view.commit": bench_commit,
+    "view.revert": bench_revert,
+    "database.consolidate": bench_consolidate,
+    "database.snapshot": bench_snapshot,
+    "database.import_duplicates": bench_import_duplicates,
+    "database.import_tail": bench_import_tail,
+    "database.load_many": bench_load_many,
+    "database.diff_file": bench_diff_file,
+    "sqlite.open_page": bench_sqlite_page,
+    "database.compact_page": bench_compact_page,
+    "statistics.prepare_data": bench_statistics,
+    "statistics.sample": bench_sample_statistics,
+    "statistics.balance_range": bench_balance_range,
+    "statistics.pivot": bench_pivot,
+    "autocomplete.complete": bench_autocomplete,
+    "converter.construct": bench_converter,
+    "converter.convert_many": bench_convert_many,
+    "gui.import": bench_gui_import,
+    "gui.cold_start": bench_gui_cold_start,
+}
+
+
+def run_suite(sizes: list[int], cases: list[str], repeat: int, seed: int, workdir: Path,
+              profile: bool = False) -> dict:
+    """
+    Runs the selected cases for every size and returns the results in a JSON-serializable form.
+    With `profile`, the data layer's instrumentation report of every case is stored along with its timings.
+    """
+    results = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "repeat": repeat,
+            "seed": seed,
+        },
+        "results": {}
+    }
+
+    for size in sizes:
+        ctx = Context(size, workdir, seed, repeat)
+        size_results = results["results"].setdefault(str(size), {})
+        for name in cases:
+            print(f"[{size}] {name} ...", end=" ", flush=True)
+            try:
+                instruments.reset()
+                size_results[name] = CASES[name](ctx)
+                if profile:
+                    size_results[name]["profile"] = instruments.report()
+                print("{:.4f} s".format(size_results[name]["median"]))
+            except (ImportError, SkipCase) as e:
+                # Optional dependencies (e.g. matplotlib) or a display may be missing on benchmark machines
+                print(f"skipped ({e})")
+        ctx.csv_path.unlink(missing_ok=True)
+
+    return results
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list[str]:
+    """
+    Compares the medians of two result sets.
+
+    :return: A list of human-readable descriptions of the regressions exceeding `threshold`.
+    """
+    regressions = []
+    for size, cases in current["results"].items():
+        for name, result in cases.items():
+            try:
+                old = baseline["results"][size][name]["median"]
+            except KeyError:
+                continue
+            if old > 0 and result["median"] > old * (1 + threshold):
+                regressions.append("[{}] {}: {:.4f} s -> {:.4f} s (+{:.0%})".format(
+                    size, name, old, result["median"], result["median"] / old - 1))
+
+    return regressions
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Mamlambo benchmark suite.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="Ledger sizes (numbers of rows) to benchmark.")
+    parser.add_argument("--cases", nargs="+", choices=list(CASES.keys()), default=list(CASES.keys()),
+                        help="Benchmark cases to run, all by default.")
+    parser.add_argument("--repeat", type=int, default=3, help="How many times every case is timed.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic ledgers.")
+    parser.add_argument("--output", type=Path, help="Where to save the results as JSON.")
+    parser.add_argument("--compare", type=Path, help="A previous JSON result to compare against.")
+    parser.add_argument("--profile", action="store_true",
+                        help="Store the instrumentation report of every case in the results.")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="Relative slowdown reported as a regression, 0.1 by default.")
+    args = parser.parse_args(argv)
+
+    if args.profile:
+        instruments.enable()
+
+    with tempfile.TemporaryDirectory(prefix="mamlambo-bench-") as workdir:
+        results = run_suite(args.sizes, args.cases, args.repeat, args.seed, Path(workdir), args.profile)
+
+    if args.output is not None:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=4)
+
+    if args.compare is not None:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for line in regressions:
+            print(f"Regression: {line}")
+        if regressions:
+            return 1
+
+    return 0
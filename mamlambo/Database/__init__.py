@@ -1,2 +1,4 @@
 from mamlambo.Database.database import Database
+from mamlambo.Database.sqlite_database import SQLiteDatabase
+from mamlambo.Database.storage import Storage, create_database
 from mamlambo.Database.database_view import DatabaseView
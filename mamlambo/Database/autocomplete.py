@@ -0,0 +1,229 @@
+import heapq
+from bisect import bisect_left, insort
+from datetime import date
+
+from mamlambo.Diagnostics import instruments
+from mamlambo.Enums.enums import Action
+from mamlambo.Transactions import Transaction
+
+# A use of a word counts half as much as a use a year later, so recent words rank above old ones used as often
+HALF_LIFE = 365
+EPOCH = date(2000, 1, 1)
+
+# A prefix matching at most this many words is ranked by scanning them, the best words of the others are cached
+SCAN_LIMIT = 512
+
+# The number of best words cached for a prefix
+CACHED = 20
+
+# Sorts after any character, so that `prefix + LAST` bounds all words starting with the prefix
+LAST = chr(0x10FFFF)
+
+
+def recency_weight(day: date) -> float:
+    """Return the weight of a use of a word on the given day, growing exponentially with time, see `HALF_LIFE`."""
+    return 2.0 ** ((day - EPOCH).days / HALF_LIFE)
+
+
+def _tally(uses: dict[str, tuple[float, int]], word: str, weight: float) -> None:
+    """Add a use of the word to the summed weights and numbers of uses of the words."""
+    use = uses.get(word)
+    uses[word] = (weight, 1) if use is None else (use[0] + weight, use[1] + 1)
+
+
+class PrefixIndex:
+    """
+    The words starting with a prefix, ranked by their score: the sum of the weights of their uses.
+
+    The words are kept in a sorted list, which works as a flattened trie: the words with a common prefix
+    form a contiguous range, found by two binary searches. Unlike a trie of nodes, it costs no more memory
+    than the words themselves, even for hundreds of thousands of them. A short range is ranked by scanning it,
+    a long one (of a short prefix) once and then cached, and the cache is kept up to date as words are added.
+
+    Words are matched case-insensitively, and suggested in the spelling they were last added in.
+    """
+    def __init__(self):
+        self._keys: list[str] = []  # The case-folded words, sorted
+        self._scores: dict[str, float] = dict()
+        self._counts: dict[str, int] = dict()
+        self._spellings: dict[str, str] = dict()
+        self._cache: dict[str, list[str]] = dict()  # The best keys of the prefixes matching many words
+
+    def __len__(self):
+        return len(self._keys)
+
+    def extend(self, uses: dict[str, tuple[float, int]]) -> None:
+        """
+        Add the uses of the words.
+
+        :param uses: The summed weight of the uses (see `recency_weight`) and their number, by word.
+        """
+        new = []
+        scores, counts, spellings = self._scores, self._counts, self._spellings
+        for word, (weight, count) in uses.items():
+            key = word.casefold()
+            score = scores.get(key)
+            if score is None:
+                scores[key], counts[key] = weight, count
+                new.append(key)
+            else:
+                scores[key], counts[key] = score + weight, counts[key] + count
+            spellings[key] = word
+            if self._cache:
+                self._promote(key)
+
+        if len(new) > len(self._keys) // 16:
+            self._keys.extend(new)
+            self._keys.sort()
+        else:
+            for key in new:
+                insort(self._keys, key)
+
+    def discard(self, uses: dict[str, tuple[float, int]]) -> None:
+        """Remove the uses of the words added before, see `extend`."""
+        for word, (weight, count) in uses.items():
+            key = word.casefold()
+            if key not in self._scores:
+                continue
+
+            self._counts[key] -= count
+            if self._counts[key] <= 0:
+                del self._scores[key], self._counts[key], self._spellings[key]
+                self._keys.pop(bisect_left(self._keys, key))
+            else:
+                self._scores[key] -= weight
+            self._invalidate(key)
+
+    def complete(self, prefix: str, limit: int = 10) -> list[str]:
+        """Return up to `limit` words starting with the prefix, the best ranked first."""
+        prefix = prefix.casefold()
+        with instruments.probe("autocomplete.complete") as probe:
+            best = self._cache.get(prefix)
+            if best is None or limit > CACHED:
+                start = bisect_left(self._keys, prefix)
+                end = bisect_left(self._keys, prefix + LAST, start)
+                probe.rows = end - start
+                if end - start <= SCAN_LIMIT or limit > CACHED:
+                    best = heapq.nlargest(limit, self._keys[start:end], key=self._scores.__getitem__)
+                else:
+                    best = self._cache[prefix] = heapq.nlargest(CACHED, self._keys[start:end],
+                                                                key=self._scores.__getitem__)
+        return [self._spellings[key] for key in best[:limit]]
+
+    def _promote(self, key: str) -> None:
+        """Update the cached best words of the key's prefixes after its score grew."""
+        score = self._scores[key]
+        for i in range(len(key) + 1):
+            best = self._cache.get(key[:i])
+            if best is None:
+                continue
+            if key in best:
+                best.sort(key=self._scores.__getitem__, reverse=True)
+            elif len(best) < CACHED or score > self._scores[best[-1]]:
+                best.append(key)
+                best.sort(key=self._scores.__getitem__, reverse=True)
+                del best[CACHED:]
+
+    def _invalidate(self, key: str) -> None:
+        """Drop the cached best words of the key's prefixes after its score dropped, some other word may be better."""
+        for i in range(len(key) + 1):
+            best = self._cache.get(key[:i])
+            if best is not None and key in best:
+                del self._cache[key[:i]]
+
+
+class AutocompleteIndex:
+    """
+    Suggests the titles, groups and currencies of a database's transactions, the most often and most recently
+    used first (see `recency_weight`).
+
+    Groups are completed one segment at a time: `expenses::u` suggests `expenses::utilities`,
+    even if only its subgroups were ever used. The index is built on first use and then kept up to date
+    from the database's change stream, so it reflects the committed transactions.
+    """
+    def __init__(self, database):
+        """:param database: The database whose transactions are suggested, see `Storage`."""
+        self.database = database
+        self._titles: PrefixIndex | None = None
+        self._groups: list[PrefixIndex] = []  # The groups by their number of segments, less one
+        self._currencies = PrefixIndex()
+        database.subscribe(self._on_change)
+
+    def close(self) -> None:
+        """Stop following the changes of the database."""
+        self.database.unsubscribe(self._on_change)
+
+    def titles(self, prefix: str, limit: int = 10) -> list[str]:
+        """Return up to `limit` titles starting with the prefix."""
+        self._build()
+        return self._titles.complete(prefix, limit)
+
+    def groups(self, prefix: str, limit: int = 10) -> list[str]:
+        """Return up to `limit` groups starting with the prefix, with as many segments as the prefix."""
+        self._build()
+        depth = prefix.count("::")
+        if depth >= len(self._groups):
+            return []
+        return self._groups[depth].complete(prefix, limit)
+
+    def currencies(self, prefix: str, limit: int = 10) -> list[str]:
+        """Return up to `limit` currencies starting with the prefix."""
+        self._build()
+        return self._currencies.complete(prefix, limit)
+
+    def _build(self) -> None:
+        if self._titles is not None:
+            return
+
+        self._titles = PrefixIndex()
+        self._groups = []
+        self._currencies = PrefixIndex()
+        with instruments.probe("autocomplete.build") as probe:
+            entries = list(self.database)
+            self._update(entries, add=True)
+            probe.rows = len(entries)
+
+    def _update(self, entries: list[Transaction], add: bool) -> None:
+        """Add the uses of the entries' words to the indexes, or remove them."""
+        weights: dict[date, float] = dict()
+        titles, groups, currencies = dict(), dict(), dict()
+        for entry in entries:
+            weight = weights.get(entry.date)
+            if weight is None:
+                weight = weights[entry.date] = recency_weight(entry.date)
+            _tally(titles, entry.title, weight)
+            _tally(groups, entry.group.name, weight)
+            _tally(currencies, entry.currency, weight)
+
+        # Every group is a use of all of its parent groups as well
+        segments: list[dict[str, tuple[float, int]]] = []
+        for group, (weight, count) in groups.items():
+            parts = group.split("::")
+            while len(segments) < len(parts):
+                segments.append(dict())
+            for depth in range(len(parts)):
+                parent = "::".join(parts[:depth + 1])
+                use = segments[depth].get(parent, (0.0, 0))
+                segments[depth][parent] = (use[0] + weight, use[1] + count)
+        while len(self._groups) < len(segments):
+            self._groups.append(PrefixIndex())
+
+        for index, uses in [(self._titles, titles), (self._currencies, currencies), *zip(self._groups, segments)]:
+            if add:
+                index.extend(uses)
+            else:
+                index.discard(uses)
+
+    def _on_change(self, action: Action, changes: list[dict]) -> None:
+        if self._titles is None:
+            return  # Not built yet, nothing to update
+
+        match action:
+            case Action.LOAD:
+                self._titles = None  # Rebuilt on next use
+            case Action.COMMIT | Action.APPEND:
+                self._update([c["old_value"] for c in changes if "old_value" in c], add=False)
+                self._update([c["value"] for c in changes if c["action"] != "remove"], add=True)
+            case Action.REVERT:
+                self._update([c["value"] for c in changes if c["action"] != "remove"], add=False)
+                self._update([c["old_value"] for c in changes if "old_value" in c], add=True)
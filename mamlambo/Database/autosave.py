@@ -0,0 +1,84 @@
+import os
+import threading
+from pathlib import Path
+
+from mamlambo.Database.compression import ledger_suffix
+from mamlambo.Database.database import Database
+from mamlambo.Diagnostics import instruments
+
+
+class AutoSaver:
+    """
+    Periodically saves a database into a file from a background thread.
+
+    Every save works on a snapshot of the database, so the database can be changed freely while the file
+    is written, and the file always contains the database as it was at a single version. The file is
+    written under a temporary name first and then renamed, so a crash never leaves a half-written file behind.
+    """
+    def __init__(self, database: Database, filename: Path, interval: float = 300, delimiter: str = ','):
+        """
+        :param database: The database to save.
+        :param filename: The path to save the database to (the format is chosen by the extensions, see `write_entries`).
+        :param interval: The number of seconds between two saves.
+        :param delimiter: The delimiter to use in the CSV file.
+        """
+        if interval <= 0:
+            raise ValueError("The autosave interval must be positive.")
+
+        self.database = database
+        self.filename = filename
+        self.interval = interval
+        self.delimiter = delimiter
+        self.last_error: Exception | None = None  # The error of the last failed save, if any
+        # A saved (or freshly loaded) database does not need to be autosaved until it changes
+        self._saved_version = database.get_version() if database.is_saved() else None
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        """Start saving in the background. Does nothing if already started."""
+        if self._thread is not None:
+            return
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="autosave", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background thread, waiting for a save in progress to finish."""
+        if self._thread is None:
+            return
+
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def save_now(self) -> bool:
+        """
+        Save the database, unless this version of it was already autosaved.
+
+        :return: Whether the file was written.
+        """
+        snapshot = self.database.snapshot()
+        if snapshot.version == self._saved_version:
+            return False
+
+        with instruments.probe("database.autosave") as probe:
+            self.filename.parent.mkdir(parents=True, exist_ok=True)
+            # Keep the real extensions last, so the format is chosen from them
+            suffix = ledger_suffix(self.filename)
+            temporary = self.filename.with_name(f"{self.filename.name.removesuffix(suffix)}.tmp{suffix}")
+            snapshot.dump(temporary, delimiter=self.delimiter)
+            os.replace(temporary, self.filename)
+            probe.rows = len(snapshot)
+
+        self._saved_version = snapshot.version
+        return True
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.save_now()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = e
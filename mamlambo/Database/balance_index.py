@@ -0,0 +1,240 @@
+from datetime import date
+from typing import Callable
+
+from mamlambo.Diagnostics import instruments
+from mamlambo.Enums.enums import Action
+from mamlambo.Transactions import Money, Transaction
+from mamlambo.Transactions.money import currency_scale
+
+# The number of days the index reserves after the last indexed date, so that new transactions
+# do not make it rebuild every time
+RESERVED_DAYS = 366
+
+
+class FenwickTree:
+    """
+    A Fenwick (binary indexed) tree over a fixed number of slots. Adds a value to a slot and sums
+    the values of a prefix of the slots, both in O(log n). The values are Python integers, so the sums are exact
+    and never overflow, even for the large amounts of currencies like the rupiah in units of `Money.exact`.
+    """
+    def __init__(self, size: int):
+        self._tree = [0] * (size + 1)  # 1-based, the zeroth item is unused
+
+    def __len__(self):
+        return len(self._tree) - 1
+
+    def add(self, slot: int, value: int) -> None:
+        """Add the value to the slot (0-based)."""
+        i = slot + 1
+        tree = self._tree
+        while i < len(tree):
+            tree[i] += value
+            i += i & -i
+
+    def prefix(self, count: int) -> int:
+        """Return the sum of the first `count` slots."""
+        i = min(count, len(self._tree) - 1)
+        tree = self._tree
+        result = 0
+        while i > 0:
+            result += tree[i]
+            i -= i & -i
+        return result
+
+    def range(self, start: int, end: int) -> int:
+        """Return the sum of the slots from `start` up to `end`, exclusive."""
+        return self.prefix(end) - self.prefix(start) if end > start else 0
+
+
+class BalanceIndex:
+    """
+    An index of the amounts of the transactions by their date, answering the sums of incomes and expenses
+    between any two dates (and so the balance on any date) in O(log n), without walking the transactions.
+
+    Every currency has a Fenwick tree with a slot per day, for the incomes and the expenses separately,
+    and so does every group in every currency. A group also sums its subgroups, so `Food` includes
+    `Food::Restaurants`. The index is built on first use and then kept up to date from the database's
+    change stream, so it reflects the committed transactions. The trees hold the exact amounts
+    (see `Money.exact`), and the sums are returned as `Money` with the scale of their currency.
+
+    Building the index reads every transaction, so a GUI can build it from a snapshot of the database
+    in the background instead (see `index` and `attach`).
+    """
+    def __init__(self, database, filters: list[Callable[[Transaction], bool]] = None):
+        """
+        :param database: The database to index, see `Storage`.
+        :param filters: Only the transactions passing all of the filters are indexed.
+        """
+        self._database = database
+        self._filters = [] if filters is None else filters
+        self._start = 0  # The ordinal of the first day with a slot
+        self._size = 0  # The number of days with a slot
+        self._first: date | None = None  # The first and the last indexed date
+        self._last: date | None = None
+        # The incomes and the expenses by currency and group, `None` standing for all groups
+        self._trees: dict[tuple[str, str | None], tuple[FenwickTree, FenwickTree]] | None = None
+        database.subscribe(self._on_change)
+
+    def close(self) -> None:
+        """Stop following the changes of the database."""
+        self._database.unsubscribe(self._on_change)
+
+    def currencies(self) -> list[str]:
+        """Return the currencies of the indexed transactions."""
+        self._build()
+        return sorted({currency for currency, group in self._trees if group is None})
+
+    def groups(self, currency: str) -> list[str]:
+        """Return the groups (including every parent group) of the indexed transactions in the currency."""
+        self._build()
+        return sorted(group for key_currency, group in self._trees if key_currency == currency and group is not None)
+
+    def date_range(self) -> tuple[date | None, date | None]:
+        """
+        Return the first and the last date of the indexed transactions (`None` if there are none).
+        The range is not narrowed by removing transactions until the index is rebuilt.
+        """
+        self._build()
+        return self._first, self._last
+
+    def incomes(self, currency: str, start: date = None, end: date = None, group: str = None) -> Money:
+        """
+        Return the sum of the incomes in the currency from `start` to `end`, both inclusive.
+
+        :param currency: The currency of the transactions.
+        :param start: The first date, the beginning of the ledger if not given.
+        :param end: The last date, the end of the ledger if not given.
+        :param group: Only sum the transactions of the group and its subgroups, all if not given.
+        """
+        return self._sum(0, currency, start, end, group)
+
+    def expenses(self, currency: str, start: date = None, end: date = None, group: str = None) -> Money:
+        """Return the sum of the expenses (a negative number) in the currency from `start` to `end`, see `incomes`."""
+        return self._sum(1, currency, start, end, group)
+
+    def total(self, currency: str, start: date = None, end: date = None, group: str = None) -> Money:
+        """Return the sum of all amounts in the currency from `start` to `end`, see `incomes`."""
+        return (self._sum(0, currency, start, end, group) +
+                self._sum(1, currency, start, end, group))
+
+    def balance(self, currency: str, on: date, group: str = None) -> Money:
+        """Return the balance in the currency at the end of the given day, see `incomes`."""
+        return self.total(currency, None, on, group)
+
+    def _sum(self, kind: int, currency: str, start: date | None, end: date | None, group: str | None) -> Money:
+        self._build()
+        trees = self._trees.get((currency, group))
+        if trees is None:
+            return Money(0, currency_scale(currency))
+
+        first = 0 if start is None else max(0, start.toordinal() - self._start)
+        last = self._size if end is None else min(self._size, end.toordinal() - self._start + 1)
+        return Money.of_exact(trees[kind].range(first, last), currency_scale(currency))
+
+    def _build(self) -> None:
+        """Build the index from the database, unless it is built already."""
+        if self._trees is not None:
+            return
+
+        entries = self._database.read_entries(self._filters)  # A single query for an SQLite database
+        self._start, self._size, self._first, self._last, self._trees = self.index(entries)
+
+    def index(self, entries: list[Transaction]) -> tuple:
+        """
+        Index the given transactions without changing the index, so that it can run on a background thread,
+        e.g. over a snapshot of the database. The result is used by `attach`.
+
+        :param entries: The transactions passing the filters of the index.
+        """
+        with instruments.probe("balance_index.build") as probe:
+            dates = [entry.date for entry in entries]
+            first = min(dates, default=None)
+            last = max(dates, default=None)
+            if first is not None:
+                start = first.toordinal()
+                size = last.toordinal() - start + 1 + RESERVED_DAYS
+            else:
+                start = date.today().toordinal()
+                size = RESERVED_DAYS
+
+            trees = dict()
+            for entry in entries:
+                _add_to_trees(trees, start, size, entry, 1)
+            probe.rows = len(entries)
+        return start, size, first, last, trees
+
+    def attach(self, indexed: tuple, version: int) -> bool:
+        """
+        Use the transactions indexed by `index`, unless the index was already built.
+
+        :param indexed: The result of `index`.
+        :param version: The version of the database the transactions were read at, see `DatabaseSnapshot.version`.
+        :return: Whether the index was used. It is not if the database changed since the given version.
+        """
+        if self._trees is not None or version != self._database.get_version():
+            return False
+        self._start, self._size, self._first, self._last, self._trees = indexed
+        return True
+
+    def _add(self, entry: Transaction, sign: int) -> bool:
+        """
+        Add the transaction to the trees (or remove it, with a negative sign).
+
+        :return: Whether the transaction's date has a slot; if not, the index has to be rebuilt.
+        """
+        if not _add_to_trees(self._trees, self._start, self._size, entry, sign):
+            return False
+
+        if sign > 0:
+            self._first = entry.date if self._first is None else min(self._first, entry.date)
+            self._last = entry.date if self._last is None else max(self._last, entry.date)
+        return True
+
+    def _update(self, entry: Transaction, sign: int) -> None:
+        if self._trees is None or not all(fil(entry) for fil in self._filters):
+            return
+        if not self._add(entry, sign):
+            self._trees = None  # Out of the range of the slots, rebuilt on next use
+
+    def _on_change(self, action: Action, changes: list[dict]) -> None:
+        if self._trees is None:
+            return  # Not built yet, nothing to update
+
+        match action:
+            case Action.LOAD:
+                self._trees = None  # Rebuilt on next use
+            case Action.COMMIT | Action.APPEND:
+                for change in changes:
+                    if "old_value" in change:
+                        self._update(change["old_value"], -1)
+                    if change["action"] != "remove":
+                        self._update(change["value"], 1)
+            case Action.REVERT:
+                for change in reversed(changes):
+                    if change["action"] != "remove":
+                        self._update(change["value"], -1)
+                    if "old_value" in change:
+                        self._update(change["old_value"], 1)
+
+
+def _add_to_trees(trees: dict, start: int, size: int, entry: Transaction, sign: int) -> bool:
+    """
+    Add the transaction to the trees of a `BalanceIndex` whose slots start at the given day
+    (or remove it, with a negative sign).
+
+    :return: Whether the transaction's date has a slot.
+    """
+    slot = entry.date.toordinal() - start
+    if not 0 <= slot < size:
+        return False
+
+    amount = entry.amount.exact
+    kind = 0 if amount > 0 else 1
+    amount *= sign
+    parts = entry.group.parts
+    for group in [None] + ["::".join(parts[:i + 1]) for i in range(len(parts))]:
+        pair = trees.get((entry.currency, group))
+        if pair is None:
+            pair = trees[(entry.currency, group)] = (FenwickTree(size), FenwickTree(size))
+        pair[kind].add(slot, amount)
+    return True
@@ -0,0 +1,130 @@
+from itertools import chain, islice
+from typing import Iterable, Iterator
+
+
+class ChunkedList[T]:
+    """
+    A list stored in fixed-size chunks, supporting cheap copy-on-write snapshots.
+
+    Taking a snapshot only copies the list of chunks, the chunks themselves are shared. Afterwards,
+    the first write into a shared chunk copies that chunk alone, so a snapshot of a large list
+    costs memory proportional to the number of chunks changed since it was taken.
+    """
+    CHUNK_BITS = 12
+    CHUNK_SIZE = 1 << CHUNK_BITS
+    _MASK = CHUNK_SIZE - 1
+
+    def __init__(self, items: Iterable[T] = ()):
+        self._chunks: list[list[T]] = []
+        self._owned: list[bool] = []  # Whether the chunk at the same index is not shared with any snapshot
+        self._length = 0
+        self._frozen = False
+        self.extend(items)
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self) -> Iterator[T]:
+        return chain.from_iterable(self._chunks)
+
+    def __getitem__(self, item):
+        if type(item) is int and 0 <= item < self._length:
+            return self._chunks[item >> self.CHUNK_BITS][item & self._MASK]
+        if isinstance(item, slice):
+            start, stop, step = item.indices(self._length)
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+
+            result = []
+            while start < stop:
+                offset = start & self._MASK
+                part = self._chunks[start >> self.CHUNK_BITS][offset:offset + stop - start]
+                result.extend(part)
+                start += len(part)
+            return result
+        return self[self._normalize(item)]
+
+    def __setitem__(self, item, value):
+        self._check_writable()
+        if isinstance(item, slice):
+            if item != slice(None):
+                raise ValueError("Only the whole list can be assigned to.")
+            self._chunks = []
+            self._owned = []
+            self._length = 0
+            self.extend(value)
+            return
+
+        index = self._normalize(item)
+        chunk = self._writable_chunk(index >> self.CHUNK_BITS)
+        chunk[index & self._MASK] = value
+
+    def append(self, value: T) -> None:
+        self._check_writable()
+        if not self._chunks or len(self._chunks[-1]) == self.CHUNK_SIZE:
+            self._chunks.append([])
+            self._owned.append(True)
+        self._writable_chunk(len(self._chunks) - 1).append(value)
+        self._length += 1
+
+    def extend(self, values: Iterable[T]) -> None:
+        self._check_writable()
+        values = iter(values)
+
+        # Fill up the last chunk first
+        if self._chunks and len(self._chunks[-1]) < self.CHUNK_SIZE:
+            chunk = self._writable_chunk(len(self._chunks) - 1)
+            room = self.CHUNK_SIZE - len(chunk)
+            part = list(islice(values, room))
+            chunk.extend(part)
+            self._length += len(part)
+            if len(part) < room:
+                return
+
+        while part := list(islice(values, self.CHUNK_SIZE)):
+            self._chunks.append(part)
+            self._owned.append(True)
+            self._length += len(part)
+
+    def pop(self) -> T:
+        self._check_writable()
+        if self._length == 0:
+            raise IndexError("pop from empty list")
+
+        value = self._writable_chunk(len(self._chunks) - 1).pop()
+        if not self._chunks[-1]:
+            self._chunks.pop()
+            self._owned.pop()
+        self._length -= 1
+        return value
+
+    def snapshot(self) -> "ChunkedList[T]":
+        """
+        Return a read-only copy of the list, sharing all chunks with it.
+        Later writes into this list do not affect the snapshot.
+        """
+        snapshot = ChunkedList[T]()
+        snapshot._chunks = list(self._chunks)
+        snapshot._owned = [False] * len(self._chunks)
+        snapshot._length = self._length
+        snapshot._frozen = True
+        self._owned = [False] * len(self._chunks)
+        return snapshot
+
+    def _writable_chunk(self, number: int) -> list[T]:
+        """Return the chunk for writing, copying it first if it is shared with a snapshot."""
+        if not self._owned[number]:
+            self._chunks[number] = list(self._chunks[number])
+            self._owned[number] = True
+        return self._chunks[number]
+
+    def _normalize(self, index: int) -> int:
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("list index out of range")
+        return index
+
+    def _check_writable(self) -> None:
+        if self._frozen:
+            raise TypeError("A snapshot cannot be modified.")
@@ -0,0 +1,165 @@
+import csv
+import sys
+import threading
+from collections import OrderedDict
+from typing import Callable, Iterable, Iterator
+
+from mamlambo.Database.chunked_list import ChunkedList
+from mamlambo.Transactions import Transaction
+
+
+def materialized_size(entry: Transaction) -> int:
+    """Estimate the memory taken by a materialized transaction, along with the objects only it refers to."""
+    size = sys.getsizeof(entry) + sys.getsizeof(entry.__dict__)
+    size += sum(sys.getsizeof(value) for value in (entry.date, entry.title, entry.amount, entry.description))
+    group = entry.group
+    size += sys.getsizeof(group) + sys.getsizeof(group.__dict__) + sys.getsizeof(group.parts)
+    size += sum(sys.getsizeof(part) for part in group.parts)
+    return size
+
+
+class RowCache:
+    """
+    A least recently used cache of materialized transactions, keyed by their encoded rows, holding
+    as many transactions as fit in its memory budget. It may be shared by several threads.
+    """
+    def __init__(self, budget: int):
+        """:param budget: The memory the cached transactions may take, in bytes."""
+        self.budget = budget
+        self.capacity: int | None = None  # Set by the first cached transaction, from its size
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[bytes, Transaction] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, row: bytes) -> Transaction | None:
+        """Return the transaction of the row, if it is cached, making it the most recently used one."""
+        with self._lock:
+            entry = self._entries.get(row)
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries.move_to_end(row)
+            return entry
+
+    def peek(self, row: bytes) -> Transaction | None:
+        """Return the transaction of the row, if it is cached, without counting a hit or a miss."""
+        return self._entries.get(row)
+
+    def put(self, row: bytes, entry: Transaction) -> None:
+        """Cache the transaction of the row, evicting the least recently used ones over the budget."""
+        with self._lock:
+            if self.capacity is None:
+                self.capacity = max(1, self.budget // (materialized_size(entry) + sys.getsizeof(row)))
+            self._entries[row] = entry
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        """Return the hits, the misses, the number of cached transactions and how many of them fit in the budget."""
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries), "capacity": self.capacity}
+
+
+class CompactList:
+    """
+    A list of transactions stored as their encoded CSV lines (see `Transaction.csv_line`), which take several
+    times less memory than the transactions themselves. A transaction is only materialized when it is accessed,
+    and kept in a `RowCache` for the next access.
+
+    Iterating over the list does not add the transactions to the cache, so that walking the whole list
+    (e.g. to compute statistics or to save it) does not evict the rows being paged through.
+    The list supports the same operations (and snapshots) as the `ChunkedList` it is stored in.
+    """
+    def __init__(self, line_parser: Callable[[list[str]], Transaction], cache: RowCache, delimiter: str = ',',
+                 rows: ChunkedList[bytes | None] = None):
+        """
+        :param line_parser: Parses a row to a transaction.
+        :param cache: The cache of the materialized transactions.
+        :param delimiter: The delimiter of the encoded rows.
+        :param rows: The encoded rows, empty by default.
+        """
+        self.cache = cache
+        self.delimiter = delimiter
+        self._line_parser = line_parser
+        self._rows: ChunkedList[bytes | None] = ChunkedList() if rows is None else rows
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __iter__(self) -> Iterator[Transaction | None]:
+        cached = self.cache.peek
+        for row in self._rows:
+            if row is None:
+                yield None
+            else:
+                entry = cached(row)
+                yield self._decode(row) if entry is None else entry
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [self._materialize(row) for row in self._rows[item]]
+        return self._materialize(self._rows[item])
+
+    def __setitem__(self, item, value):
+        # The values may be transactions or encoded rows
+        if isinstance(item, slice):
+            self._rows[item] = map(self._encode, value)
+        else:
+            self._rows[item] = self._encode(value)
+
+    def append(self, value: Transaction | None) -> None:
+        self._rows.append(self._encode(value))
+
+    def extend(self, values: Iterable[Transaction | None]) -> None:
+        self._rows.extend(map(self._encode, values))
+
+    def pop(self) -> Transaction | None:
+        return self._materialize(self._rows.pop())
+
+    def snapshot(self) -> "CompactList":
+        """Return a read-only copy of the list, see `ChunkedList.snapshot`. It shares the cache with the list."""
+        return CompactList(self._line_parser, self.cache, self.delimiter, self._rows.snapshot())
+
+    def decoded(self, indices: Iterable[int]) -> Iterator[Transaction | None]:
+        """
+        Iterate over the transactions at the given indices without adding them to the cache (see `__iter__`),
+        e.g. to filter and sort all of them, which would otherwise evict the whole cache.
+        """
+        cached = self.cache.peek
+        rows = self._rows
+        for i in indices:
+            row = rows[i]
+            if row is None:
+                yield None
+            else:
+                entry = cached(row)
+                yield self._decode(row) if entry is None else entry
+
+    def rows(self) -> Iterator[bytes | None]:
+        """Iterate over the encoded rows, without materializing them."""
+        return iter(self._rows)
+
+    def _encode(self, value: Transaction | bytes | None) -> bytes | None:
+        # Encoded rows (see `rows`) are stored as they are
+        if value is None or isinstance(value, bytes):
+            return value
+        return value.csv_line(self.delimiter)
+
+    def _decode(self, row: bytes) -> Transaction:
+        line = row.decode("utf-8")
+        if '"' in line:
+            return self._line_parser(next(csv.reader([line], delimiter=self.delimiter)))
+        return self._line_parser(line.rstrip("\r\n").split(self.delimiter))  # Nothing quoted, no need for a reader
+
+    def _materialize(self, row: bytes | None) -> Transaction | None:
+        if row is None:
+            return None
+        entry = self.cache.get(row)
+        if entry is None:
+            entry = self._decode(row)
+            self.cache.put(row, entry)
+        return entry
@@ -0,0 +1,193 @@
+import bz2
+import gzip
+import io
+import lzma
+import os
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import BinaryIO, Callable
+
+# The formats a ledger can be stored in, by their extension
+FORMATS = (".csv", ".json", ".jsonl")
+
+# The codecs a ledger can be compressed with, by their extension
+CODECS = {
+    ".gz": "gzip",
+    ".bz2": "bz2",
+    ".xz": "xz",
+}
+
+# The bytes every file compressed by a codec starts with
+MAGIC = {
+    "gzip": b"\x1f\x8b",
+    "bz2": b"BZh",
+    "xz": b"\xfd7zXZ\x00",
+}
+
+# The amount of uncompressed data compressed at once by a worker thread. Every chunk is compressed into
+# a separate stream (a gzip member, a bz2 or xz stream), and the decompressors read concatenated streams
+# as a single one, so the chunks can be compressed independently
+CHUNK_SIZE = 4 * 1024 * 1024
+
+
+def ledger_format(filename: str | Path) -> tuple[str | None, str | None]:
+    """
+    Find out the format and the codec of a ledger from its extensions, e.g. `.csv` and `gzip` for `ledger.csv.gz`.
+
+    :return: The format's extension (`None` if the file has no extension besides the codec's)
+        and the codec (`None` for an uncompressed file).
+    :raises ValueError: If the file has an extension of an unsupported format.
+    """
+    path = Path(filename)
+    codec = CODECS.get(path.suffix.lower())
+    if codec is not None:
+        path = path.with_suffix("")
+
+    fmt = path.suffix.lower() or None
+    if fmt is not None and fmt not in FORMATS:
+        raise ValueError(f"Unsupported file type: {fmt[1:]}")
+    return fmt, codec
+
+
+def ledger_suffix(filename: str | Path) -> str:
+    """Return the extensions of the ledger's format and codec, e.g. `.csv.gz` for `ledger.csv.gz`."""
+    path = Path(filename)
+    suffix = ""
+    if path.suffix.lower() in CODECS:
+        suffix = path.suffix
+        path = path.with_suffix("")
+    if path.suffix.lower() in FORMATS:
+        suffix = path.suffix + suffix
+    return suffix
+
+
+def detect_codec(filename: str | Path) -> str | None:
+    """
+    Find out the codec a file is compressed with from the bytes it starts with, so that e.g. a compressed
+    ledger without the codec's extension can be read. A file that does not exist is judged by its extension.
+
+    :return: The codec, or `None` for an uncompressed file.
+    """
+    try:
+        with open(filename, 'rb') as f:
+            start = f.read(max(len(magic) for magic in MAGIC.values()))
+    except FileNotFoundError:
+        return ledger_format(filename)[1]
+
+    for codec, magic in MAGIC.items():
+        if start.startswith(magic):
+            return codec
+    return None
+
+
+def compressor(codec: str) -> Callable[[bytes], bytes]:
+    """Return the function compressing a chunk of data into a single complete stream of the codec."""
+    match codec:
+        case "gzip":
+            return lambda data: gzip.compress(data, compresslevel=6, mtime=0)
+        case "bz2":
+            return bz2.compress
+        case "xz":
+            return lzma.compress
+        case _:
+            raise ValueError(f"Unsupported codec: {codec}")
+
+
+def open_ledger(filename: str | Path, mode: str = 'r', threads: int = None) -> BinaryIO:
+    """
+    Open a ledger file as a binary stream, compressing or decompressing it on the fly.
+    The data is streamed through buffers of a bounded size, so even large ledgers never have to fit in memory.
+
+    A file being read is decompressed by the codec it starts with (see `detect_codec`),
+    a file being written is compressed by the codec of its extension.
+
+    :param filename: The path to the file.
+    :param mode: `r` to read the file, `w` to write it.
+    :param threads: The number of threads compressing a written file, in chunks of `CHUNK_SIZE`.
+        By default one per CPU, at most 4. With a single thread, the file is compressed as a single stream.
+    """
+    match mode:
+        case 'r':
+            codec = detect_codec(filename)
+        case 'w':
+            codec = CODECS.get(Path(filename).suffix.lower())
+        case _:
+            raise ValueError(f"Unsupported mode: {mode}")
+
+    if threads is None:
+        threads = min(4, os.cpu_count() or 1)
+
+    match codec:
+        case None:
+            return open(filename, mode + 'b')
+        case _ if mode == 'w' and threads > 1:
+            return ParallelCompressor(open(filename, 'wb'), compressor(codec), threads)
+        case "gzip":
+            return gzip.open(filename, mode + 'b', compresslevel=6)
+        case "bz2":
+            return bz2.open(filename, mode + 'b')
+        case "xz":
+            return lzma.open(filename, mode + 'b')
+
+
+def open_text(filename: str | Path, mode: str = 'r', threads: int = None) -> io.TextIOWrapper:
+    """Open a ledger file as a UTF-8 text stream, see `open_ledger`. Line endings are left untranslated for CSV."""
+    return io.TextIOWrapper(open_ledger(filename, mode, threads), encoding="utf-8", newline='')
+
+
+class ParallelCompressor(io.BufferedIOBase):
+    """
+    A writable stream compressing the written data in chunks, each on its own worker thread.
+    The compressors release the GIL, so the chunks are compressed in parallel, while the compressed chunks
+    are written in their original order. At most two chunks per thread are kept in memory at a time.
+    """
+    def __init__(self, raw: BinaryIO, compress: Callable[[bytes], bytes], threads: int,
+                 chunk_size: int = CHUNK_SIZE):
+        """
+        :param raw: The stream to write the compressed data to, closed along with this one.
+        :param compress: Compresses a chunk into a complete stream, see `compressor`.
+        :param threads: The number of worker threads.
+        :param chunk_size: The amount of uncompressed data in a chunk.
+        """
+        super().__init__()
+        self._raw = raw
+        self._compress = compress
+        self._chunk_size = chunk_size
+        self._buffer = bytearray()
+        self._pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="compress")
+        self._pending: deque[Future] = deque()
+        self._limit = 2 * threads
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        if self.closed:
+            raise ValueError("I/O operation on closed file.")
+
+        self._buffer += data
+        while len(self._buffer) >= self._chunk_size:
+            self._submit(bytes(self._buffer[:self._chunk_size]))
+            del self._buffer[:self._chunk_size]
+        return len(data)
+
+    def _submit(self, chunk: bytes) -> None:
+        while len(self._pending) >= self._limit:
+            self._raw.write(self._pending.popleft().result())
+        self._pending.append(self._pool.submit(self._compress, chunk))
+
+    def close(self) -> None:
+        if self.closed:
+            return
+
+        try:
+            if self._buffer or not self._pending:
+                self._submit(bytes(self._buffer))  # Even an empty file has to be a valid stream
+                self._buffer.clear()
+            while self._pending:
+                self._raw.write(self._pending.popleft().result())
+        finally:
+            self._pool.shutdown(cancel_futures=True)
+            self._raw.close()
+            super().close()
@@ -1,26 +1,167 @@
 import csv
+import io
 import json
+import shutil
+import threading
 from collections import deque
-from typing import Callable
+from itertools import chain, islice
+from typing import Any, BinaryIO, Callable, Iterable
 from pathlib import Path
 
+from mamlambo.Database.chunked_list import ChunkedList
+from mamlambo.Database.compact import CompactList, RowCache
+from mamlambo.Database.compression import detect_codec, ledger_format, open_ledger, open_text
+from mamlambo.Database.partition import PARTITION_SCHEMES, Partition, PartitionSummary, partition_key
+from mamlambo.Database.query import SortKey, as_composite, date_bounds
+from mamlambo.Database.readers import iter_parsed, merge_sorted, parse_rows, read_rows
+from mamlambo.Database.file_mark import FileMark
+from mamlambo.Database.file_watcher import LedgerDiff, diff_entries
+from mamlambo.Database.duplicates import DuplicateIndex, ImportReport, schedule_import
+from mamlambo.Diagnostics import instruments
+from mamlambo.Enums.enums import Action, DuplicatePolicy
 from mamlambo.Transactions import Transaction
 
+# The name of the file describing the segments of a partitioned database
+MANIFEST_NAME = "manifest.json"
+
+# The number of CSV lines joined into a single write
+WRITE_BATCH = 16384
+
+
+def write_csv_lines(entries: Iterable[Transaction], f: BinaryIO, /, delimiter: str = ',') -> None:
+    """
+    Write the transactions into a binary stream as CSV lines, in large blocks.
+    The lines cached by the transactions are reused, see `Transaction.csv_line`.
+    """
+    if isinstance(entries, CompactList) and entries.delimiter == delimiter:
+        lines = entries.rows()  # Already encoded, so they do not have to be materialized
+    else:
+        lines = (entry.csv_line(delimiter) for entry in entries)
+
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= WRITE_BATCH:
+            f.write(b"".join(batch))
+            batch.clear()
+    f.write(b"".join(batch))
+
+
+def write_entries(entries: Iterable[Transaction], filename: Path, /, delimiter: str = ',') -> None:
+    """
+    Write the transactions into a CSV, JSON or JSON Lines file, depending on the file's extension.
+    A further `.gz`, `.bz2` or `.xz` extension compresses the file, see `open_ledger`.
+
+    :param entries: The transactions to write.
+    :param filename: The path to the file to write to.
+    :param delimiter: The delimiter to use in the CSV file.
+    """
+    # If no filetype seems to be supplied, default to csv
+    fmt = ledger_format(filename)[0] or ".csv"
+
+    with instruments.probe(f"database.dump.{fmt[1:]}") as probe:
+        if fmt == ".csv":
+            with open_ledger(filename, 'w') as f:
+                write_csv_lines(entries, f, delimiter)
+        else:
+            with open_text(filename, 'w') as f:
+                if fmt == ".json":
+                    json.dump([trn.to_dict() for trn in entries], f, indent=4)
+                else:
+                    f.writelines(json.dumps(trn.to_dict()) + "\n" for trn in entries)
+        probe.rows = len(entries)
+
+
+class DatabaseSnapshot[T]:
+    """
+    A read-only, consistent copy of a database's entries at a single version.
+    It shares the unchanged chunks of entries with the database, so it is cheap to take,
+    and it can be read from any thread while the database keeps changing.
+    """
+    def __init__(self, version: int, entries: ChunkedList[T]):
+        self.version = version
+        self._entries = entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def __getitem__(self, item):
+        return self._entries[item]
+
+    def dump(self, filename: Path, /, delimiter: str = ',') -> None:
+        """Dump the snapshot's transactions into a file, see `Database.dump`."""
+        write_entries(self._entries, filename, delimiter)
+
 
 class Database[T]:
-    def __init__(self):
-        """Initialize the Database with empty lists for entries and commits, and an empty deque for free indices."""
-        self._entries: list[Transaction] = []
+    """
+    Stores the entries along with their pending changes and the history of commits.
+
+    Any number of views can share a single database. They learn about its changes by subscribing
+    to its change stream, which reports every load, scheduled change, commit and revert.
+
+    The entries are stored in chunks, so that `snapshot` can hand a consistent copy of them
+    to background readers (such as the autosave) without copying the whole database.
+    """
+    def __init__(self, partition_by: str | None = None, cache_budget: int | None = None):
+        """
+        Initialize the Database with empty lists for entries and commits, and an empty deque for free indices.
+
+        :param partition_by: If set to `month` or `year`, the entries are split into time partitions,
+            which are stored as separate segments on disk and let date filters skip whole partitions.
+        :param cache_budget: If set, the entries are stored encoded (see `CompactList`) and only materialized
+            when accessed, keeping at most this many bytes of materialized entries in a cache.
+        """
+        if partition_by is not None and partition_by not in PARTITION_SCHEMES:
+            raise ValueError(f"Unsupported partitioning: {partition_by}")
+        if cache_budget is not None and cache_budget <= 0:
+            raise ValueError("The cache budget must be positive.")
+
+        self._cache = RowCache(cache_budget) if cache_budget is not None else None
+        self._line_parser: Callable[[list[str]], T] | None = None
+        self._entries: ChunkedList[Transaction] | CompactList = self._new_entries()
         self._commits = []
         self._history = deque(maxlen=10)
-        self._saved = True
+        self._version = 0  # Increased by every change of the entries
+        self._saved_version = -1  # The version that was last saved or loaded
+        self._lock = threading.RLock()  # Guards the entries against snapshots taken from other threads
+        self._subscribers: list[Callable[[Action, list[dict]], None]] = []
+        self._duplicates: DuplicateIndex | None = None  # Created by the first import
+        self._partition_by = partition_by
+        self._partitions: dict[str, Partition] = dict()
+        self._partitions_dirty = False  # Whether the partitions' indices and summaries have to be rebuilt
+        self._delimiter = ','
+        self._source: Path | None = None  # The CSV file the database was loaded from
+        self._mark: FileMark | None = None  # How far the source was read, see `import_tail`
+        self._sorted_by: str | None = None  # The property the entries are known to be sorted by, ascending
+
+    def _new_entries(self) -> ChunkedList[Transaction] | CompactList:
+        """Return an empty list of entries, compact if the database has a cache budget."""
+        if self._cache is None:
+            return ChunkedList()
+        return CompactList(self._line_parser or Transaction.parse, self._cache)
+
+    def _stored(self) -> Iterable:
+        """Iterate over the entries as they are stored, i.e. without materializing them in the compact mode."""
+        return self._entries.rows() if isinstance(self._entries, CompactList) else iter(self._entries)
+
+    def cache_stats(self) -> dict | None:
+        """
+        Return the hits and misses of the cache of materialized entries, along with the number of cached
+        entries and the number of entries that fit in the budget, or `None` if the entries are not compact.
+        """
+        return None if self._cache is None else self._cache.stats()
 
     def __len__(self):
         """Return the number of entries in the database."""
         return len(self._entries)
 
     def __iter__(self):
-        """Return an iterator over the entries in the database."""
+        """Return an iterator over the entries in the database. Loads all partitions that were not loaded yet."""
+        self.load_partitions()
         return iter(self._entries)
 
     def __getitem__(self, item):
@@ -29,73 +170,473 @@ class Database[T]:
 
     def load(self, filename: str, line_parser: Callable[[list[str]], T], /, delimiter: str = ',') -> None:
         """
-        Loads transactions from a CSV file into the database. Overwrites any existing entries.
+        Loads transactions from a CSV, JSON or JSON Lines file into the database, possibly compressed
+        (see `open_ledger`). Overwrites any existing entries.
+
+        A partitioned database is loaded from its directory (or its manifest file), but its partitions
+        are only read once their entries are needed.
 
-        :param filename: The path to the CSV file to load.
-        :param line_parser: Parses the CSV to the database representation.
+        :param filename: The path to the file to load.
+        :param line_parser: Parses the rows of the file to the database representation.
         :param delimiter: The delimiter used in the CSV file.
         """
-        if filename.split(".")[-1] != "csv":
-            raise ValueError("Only CSV files are supported.")
+        path = Path(filename)
+        if path.name == MANIFEST_NAME:
+            path = path.parent
+        if not path.is_dir() and ledger_format(path)[0] is None:
+            raise ValueError("Only CSV, JSON and JSON Lines files are supported.")
+
+        with self._lock:
+            self._reset(line_parser, delimiter)  # In case we load an already loaded database
+            if path.is_dir():
+                self._load_manifest(path)
+            else:
+                with instruments.probe("database.load") as probe:
+                    # The entries are parsed straight into the storage, so that compact entries
+                    # never have to be all materialized at once
+                    self._mark = self.read_ledger(path, self._entries)
+                    self._source = path
+                    probe.rows = len(self._entries)
+                self._partitions_dirty = True
+
+            self._version += 1
+            self._saved_version = self._version
 
-        # In case we load an already loaded database
-        self._entries = []
+        self._notify(Action.LOAD, [])
+
+    def begin_load(self, filename: str, line_parser: Callable[[list[str]], T], /, delimiter: str = ',') -> Path:
+        """
+        Start loading a ledger progressively, see `ProgressiveLoad`: the database is emptied, and its entries
+        are then appended chunk by chunk by `append_loaded`, as they are parsed (see `read_ledger`),
+        until `end_load`. Overwrites any existing entries.
+
+        :param filename: The path to the file to load, a single file (not a partitioned database).
+        :param line_parser: Parses the rows of the file to the database representation.
+        :param delimiter: The delimiter used in the CSV file.
+        :return: The path to the file.
+        """
+        path = Path(filename)
+        if path.name == MANIFEST_NAME or path.is_dir():
+            raise ValueError("A partitioned database cannot be loaded progressively.")
+        if ledger_format(path)[0] is None:
+            raise ValueError("Only CSV, JSON and JSON Lines files are supported.")
+
+        with self._lock:
+            self._reset(line_parser, delimiter)
+            self._version += 1
+        self._notify(Action.LOAD, [])
+        return path
+
+    def append_loaded(self, entries: list[T]) -> None:
+        """
+        Append a chunk of the entries of a progressive load, see `begin_load`.
+        The subscribers are notified by an `APPEND`, with a change adding every entry.
+        """
+        with self._lock:
+            start = len(self._entries)
+            self._entries.extend(entries)
+            self._partitions_dirty = True
+            self._version += 1
+        self._notify(Action.APPEND, [{"action": "add", "index": start + i, "value": entry}
+                                     for i, entry in enumerate(entries)])
+
+    def end_load(self, path: Path, mark: FileMark | None) -> None:
+        """
+        Finish a progressive load, see `begin_load`: the database is then saved in the loaded file.
+
+        :param path: The loaded file.
+        :param mark: How far the file was read, as returned by `read_ledger`.
+        """
+        with self._lock:
+            self._source, self._mark = path, mark
+            self._saved_version = self._version
+
+    def _reset(self, line_parser: Callable[[list[str]], T], delimiter: str) -> None:
+        """Drop the entries, along with their history, before loading others."""
+        self._line_parser = line_parser
+        self._entries = self._new_entries()
         self._commits = []
         self._history = deque(maxlen=10)
+        self._partitions = dict()
+        self._delimiter = delimiter
+        self._source, self._mark = None, None
+        self._sorted_by = None
+
+    def read_ledger(self, path: Path, into) -> FileMark | None:
+        """
+        Parse a ledger file with the line parser and the delimiter of the last load, see `load`.
+        Reads only the file, so it can be called from another thread while loading progressively.
+
+        :param path: The file to parse, in any supported format.
+        :param into: Extended by the entries as they are parsed, e.g. a list.
+        :return: How far the file was read if it is an uncompressed CSV file, `None` otherwise.
+        """
+        if ledger_format(path)[0] == ".csv" and detect_codec(path) is None:
+            return self._read_csv(path, into=into)[1]
+        into.extend(iter_parsed(read_rows(str(path), self._delimiter), self._line_parser))
+        return None
+
+    def load_many(self, filenames: Iterable[str], line_parser: Callable[[list[str]], T], /, delimiter: str = ',',
+                  workers: int = None) -> None:
+        """
+        Load several ledgers (e.g. monthly exports) into the database, sorted by date.
+        Overwrites any existing entries.
+
+        The ledgers are parsed and sorted in parallel worker processes and merged into a single ledger.
+        As the entries end up sorted, the views sorted by date do not have to sort them again.
+
+        :param filenames: The paths to the ledgers.
+        :param line_parser: Parses the ledgers to the database representation. Must be picklable.
+        :param delimiter: The delimiter used in the CSV files.
+        :param workers: The number of worker processes, the number of CPUs by default.
+        """
+        sort_key = SortKey("Date")
+        with self._lock:
+            self._reset(line_parser, delimiter)
+            with instruments.probe("database.load_many") as probe:
+                self._entries.extend(merge_sorted(filenames, line_parser, sort_key, delimiter, workers))
+                probe.rows = len(self._entries)
+            self._sorted_by = sort_key.prop
+            self._partitions_dirty = True
+            self._version += 1  # The merged ledger is not saved anywhere yet
+
+        self._notify(Action.LOAD, [])
+
+    def _read_csv(self, filename: Path, offset: int = 0, into=None) -> tuple[list[T], FileMark]:
+        """
+        Parse the CSV file from the given byte offset to its end into a list of entries.
+        Invalid lines are skipped, empty ones are ignored.
+
+        :param into: Extended by the entries as they are parsed, a new list by default.
+        :return: The entries and the mark of how far the file was read.
+        """
+        entries = [] if into is None else into
+        with open(filename, 'rb') as raw:
+            raw.seek(offset)
+            f = io.TextIOWrapper(raw, encoding="utf-8", newline='')
+            entries.extend(iter_parsed(csv.reader(f, delimiter=self._delimiter), self._line_parser))
+            f.detach()  # Keeps the file open for the mark, the whole file was read
+            mark = FileMark.of(raw, raw.tell())
+        return entries, mark
+
+    def import_tail(self) -> int | None:
+        """
+        Schedule the transactions appended to the CSV file the database was loaded from, since it was loaded
+        (or since the last call). Only the appended bytes are read, so a file that keeps growing
+        (e.g. a bank export) can be followed cheaply however large it is. The transactions are added by
+        the next commit.
+
+        If the already read part of the file changed instead, nothing is scheduled. The file has to be loaded
+        again (see `load`), which is left to the caller, as it discards the changes that were not saved.
+
+        :return: The number of scheduled transactions, or `None` if the read part of the file changed.
+        :raises ValueError: If the database was not loaded from an uncompressed CSV file.
+        """
+        if self._mark is None:
+            raise ValueError("The database was not loaded from an uncompressed CSV file.")
+
+        with open(self._source, 'rb') as f:
+            unchanged = self._mark.matches(f)
+            if unchanged and not self._mark.terminated:
+                # The last read line is complete only if nothing but a line break was appended to it
+                f.seek(self._mark.offset)
+                unchanged = f.read(1) in (b"", b"\n", b"\r")
+
+        if not unchanged:
+            instruments.count("database.import_tail.changed")
+            return None
+
+        with instruments.probe("database.import_tail") as probe:
+            entries, self._mark = self._read_csv(self._source, self._mark.offset)
+            for entry in entries:
+                self.add(entry)
+            probe.rows = len(entries)
+        return len(entries)
+
+    def diff_file(self, filename: str | Path) -> LedgerDiff[T]:
+        """
+        Compare the database with a file, e.g. the one it was loaded from after another program changed it.
+        The file is compared with a snapshot of the entries, so this can run in a background thread;
+        see `apply_diff` to apply the result.
+
+        :param filename: The CSV, JSON or JSON Lines file, possibly compressed.
+        :raises ValueError: If the database is partitioned or the file type is not supported.
+        """
+        if self._partition_by is not None:
+            raise ValueError("A partitioned database cannot be compared with a file.")
+
+        path = Path(filename)
+        if ledger_format(path)[0] is None:
+            raise ValueError("Only CSV, JSON and JSON Lines files are supported.")
+
+        snapshot = self.snapshot()
+        with instruments.probe("database.diff_file") as probe:
+            mark = None
+            if ledger_format(path)[0] == ".csv" and detect_codec(path) is None:
+                entries, mark = self._read_csv(path)
+            else:
+                entries = parse_rows(read_rows(str(path), self._delimiter), self._line_parser)
+            updated, removed, added = diff_entries(snapshot, entries)
+            probe.rows = len(entries)
+        return LedgerDiff(path, snapshot.version, updated, removed, added, mark)
+
+    def apply_diff(self, diff: LedgerDiff[T]) -> int:
+        """
+        Apply the changes found by `diff_file` as a single commit, so that the views update incrementally.
+        Afterwards, the database holds the same entries as the file, which becomes its source (see `import_tail`).
+
+        :return: The number of applied changes.
+        :raises ValueError: If the database changed since it was compared, or has uncommitted changes.
+        """
+        if diff.version != self._version:
+            raise ValueError("The database changed since it was compared with the file.")
+        if self._commits:
+            raise ValueError("The database has changes that are not committed.")
+
+        for index, entry in diff.updated:
+            self.edit(index, entry)
+        for index in diff.removed:
+            self.remove(index)
+        for entry in diff.added:
+            self.add(entry)
+        if len(diff) > 0:
+            self.commit()
+
+        self._source, self._mark = diff.filename, diff.mark
+        self._saved_version = self._version  # The same as the file
+        return len(diff)
+
+    def _load_manifest(self, directory: Path) -> None:
+        """Read the partitions of a partitioned database from its manifest, without loading them."""
+        try:
+            with open(directory / MANIFEST_NAME, 'r', encoding="utf-8") as f:
+                manifest = json.load(f)
+            self._partition_by = manifest["partition_by"]
+            for key, data in manifest["partitions"].items():
+                summary = PartitionSummary.from_dict(data["summary"])
+                self._partitions[key] = Partition(key, directory / data["file"], summary)
+        except (IOError, KeyError, json.JSONDecodeError) as e:
+            raise ValueError(f"Not a valid partitioned database: {str(e)}")
+
+        self._partitions_dirty = False
+
+    def is_partitioned(self) -> bool:
+        """Return whether the database is split into time partitions."""
+        return self._partition_by is not None
+
+    def partitions(self) -> list[Partition]:
+        """Return the partitions of the database in chronological order. Empty for a database without partitions."""
+        self._rebuild_partitions()
+        return [self._partitions[key] for key in sorted(self._partitions)]
+
+    def load_partitions(self, partitions: Iterable[Partition] = None) -> None:
+        """
+        Read the given partitions from their segments, if they were not loaded yet.
+        Safe to call from several threads at once (e.g. the concurrent reads of `LedgerServer`),
+        every partition is read only once.
+
+        :param partitions: The partitions to load, all of them by default.
+        """
+        with self._lock:
+            # The partitions are chosen under the lock, or concurrent callers would all read the same ones
+            if partitions is None:
+                partitions = list(self._partitions.values())
+            pending = [p for p in partitions if not p.loaded]
+            if not pending:
+                return
+
+            self._rebuild_partitions()
+            with instruments.probe("database.load_partition") as probe:
+                for partition in pending:
+                    if partition.loaded:
+                        continue  # Given more than once
+                    start = len(self._entries)
+                    self._read_csv(partition.path, into=self._entries)
+                    partition.indices = list(range(start, len(self._entries)))
+                    partition.loaded = True
+                    probe.rows += len(partition.indices)
+
+    def candidate_indices(self, filters: list[Callable[[T], bool]]) -> Iterable[int]:
+        """
+        Return the indices of all entries that can pass the filters. For a partitioned database,
+        the partitions outside the date range of the filters are skipped without being loaded.
+        """
+        if self._partition_by is None:
+            return range(len(self._entries))
 
-        linecount = 1
-        with open(filename, 'r', encoding="utf-8") as f:
-            reader = csv.reader(f, delimiter=delimiter)
-            for row in reader:
-                linecount += 1
-                try:
-                    self._entries.append(line_parser(row))
-                except ValueError as e:
-                    print(f"Entry at line {linecount} will not be loaded, as it is not in a valid state:\n" +
-                          f"{str(e)}")
+        start, end = date_bounds(filters)
+        selected = [p for p in self.partitions() if p.summary.overlaps(start, end)]
+        instruments.count("database.partitions.pruned", len(self._partitions) - len(selected))
+        self.load_partitions(selected)
+        return chain.from_iterable(p.indices for p in selected)
+
+    def read_entries(self, filters: list[Callable[[T], bool]], sort_key: Callable[[T], Any] = None,
+                     reverse: bool = False) -> list[T]:
+        """
+        Return the entries passing the filters, sorted by the key or in the order of their indices,
+        see `Storage.read_entries`. The removed entries are skipped.
+        """
+        entries = [self._entries[i] for i in self.candidate_indices(filters)]
+        entries = [entry for entry in entries if entry is not None and all(fil(entry) for fil in filters)]
+        if sort_key is not None:
+            entries.sort(key=sort_key, reverse=reverse)
+        return entries
+
+    def query(self, filters: list[Callable[[T], bool]], sort_key: Callable[[T], Any],
+              reverse: bool) -> list[int] | None:
+        """
+        Skip the sorting of a view if the entries are already sorted by its sort key (see `load_many`),
+        see `Storage.query`. Compact entries are filtered and sorted in a single pass that decodes every entry
+        once, instead of materializing it for every comparison. Otherwise, the views filter and sort
+        the entries on their own. In descending order, entries with equal keys are in the reverse order
+        of the database when they are presorted, and in their order otherwise, as in a view.
+        """
+        presorted = self._sorted_by is not None and isinstance(sort_key, SortKey) and sort_key.prop == self._sorted_by
+        if not presorted and not isinstance(self._entries, CompactList):
+            return None
+
+        with instruments.probe("database.query.presorted" if presorted else "database.query.compact") as probe:
+            candidates = list(self.candidate_indices(filters))
+            if isinstance(self._entries, CompactList):
+                entries = self._entries.decoded(candidates)
+            else:
+                entries = (self._entries[i] for i in candidates)
+
+            composite = None if presorted else as_composite(sort_key)
+            functions = [sort_key] if composite is None else [key.getter for key, _ in composite.keys]
+            indices, columns = [], [[] for _ in functions]
+            for i, entry in zip(candidates, entries):
+                if entry is not None and all(fil(entry) for fil in filters):
+                    indices.append(i)
+                    if not presorted:
+                        for column, function in zip(columns, functions):
+                            column.append(function(entry))
+
+            if presorted:
+                if reverse:
+                    indices.reverse()
+            elif composite is not None:
+                indices = composite.order(indices, columns, reverse)
+            else:
+                keys = columns[0]
+                order = sorted(range(len(indices)), key=keys.__getitem__, reverse=reverse)
+                indices = [indices[j] for j in order]
+            probe.rows = len(indices)
+        return indices
+
+    def _rebuild_partitions(self) -> None:
+        """Reassign the loaded entries to their partitions and recompute their summaries, if anything changed."""
+        if self._partition_by is None or not self._partitions_dirty:
+            return
+
+        with self._lock, instruments.probe("database.partition") as probe:
+            if not self._partitions_dirty:
+                return  # Rebuilt by another thread while this one waited for the lock
+            for partition in self._partitions.values():
+                if partition.loaded:
+                    partition.indices = []
+                    partition.summary = PartitionSummary()
+
+            for index, entry in enumerate(self._entries):
+                if entry is None:
+                    continue
+                key = partition_key(entry.date, self._partition_by)
+                partition = self._partitions.get(key)
+                if partition is None:
+                    partition = self._partitions[key] = Partition(key)
+                partition.indices.append(index)
+                partition.summary.add(entry)
+
+            # Drop the partitions emptied by removals, unless they still have to be loaded
+            for key in [key for key, p in self._partitions.items() if p.loaded and not p.indices]:
+                self._partitions.pop(key)
+
+            self._partitions_dirty = False
+            probe.rows = len(self._entries)
 
     def dump(self, filename: Path, /, delimiter: str = ',') -> None:
         """
-        Dump the database transactions into a CSV or JSON file.
+        Dump the database transactions into a CSV, JSON or JSON Lines file, possibly compressed
+        (see `write_entries`).
+
+        A partitioned database given a path without an extension is dumped as a directory with one segment per
+        partition, see `dump_partitioned`.
 
         :param filename: The path to the file to write to.
         :param delimiter: The delimiter to use in the CSV file.
         """
-        filetype = "csv"
-        try:
-            filetype = filename.name.split(".")[1].lower()
-        except:
-            # If no filetype seems to be supplied, default to csv
-            pass
-
-        match filetype:
-            case "csv":
-                with open(filename, 'w', encoding="utf-8", newline='') as f:
-                    writer = csv.writer(f, delimiter=delimiter)
-                    writer.writerows(map(lambda e: e.dump(), self._entries))
-            case "json":
-                data = [trn.to_dict() for trn in self._entries]
-
-                with open(filename, 'w') as file:
-                    json.dump(data, file, indent=4)
-            case _:
-                raise ValueError(f"Unsupported file type: {filetype}")
+        if self._partition_by is not None and "." not in filename.name:
+            self.dump_partitioned(filename, delimiter)
+            return
+
+        self.load_partitions()
+        write_entries(self._entries, filename, delimiter)
+        self._saved_version = self._version
+        self._saved_into(filename)
+
+    def dump_partitioned(self, directory: Path, /, delimiter: str = ',') -> None:
+        """
+        Dump the database into a directory, with one CSV segment per partition and a manifest
+        with the partitions' summaries. Partitions that were never loaded are copied without being parsed.
+
+        :param directory: The directory to write to, created if it does not exist.
+        :param delimiter: The delimiter to use in the CSV files.
+        """
+        if self._partition_by is None:
+            raise ValueError("The database is not partitioned.")
+
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        manifest = {"partition_by": self._partition_by, "partitions": dict()}
+
+        with instruments.probe("database.dump.partitioned") as probe:
+            for partition in self.partitions():
+                segment = directory / f"{partition.key}.csv"
+                if not partition.loaded:
+                    if partition.path.resolve() != segment.resolve():
+                        shutil.copyfile(partition.path, segment)
+                else:
+                    with open(segment, 'wb') as f:
+                        write_csv_lines((self._entries[i] for i in partition.indices), f, delimiter)
+                    probe.rows += len(partition.indices)
+
+                manifest["partitions"][partition.key] = {
+                    "file": segment.name,
+                    "summary": partition.summary.to_dict()
+                }
+
+            with open(directory / MANIFEST_NAME, 'w', encoding="utf-8") as f:
+                json.dump(manifest, f, indent=4)
+
+        self._saved_version = self._version
 
     def commit(self):
         """Process all pending commits to the database and store them in history."""
         commit_data = []
         consolidate = False
-        for commit in self._commits:
-            if commit["action"] == "remove":
-                consolidate = True
+        if self._partition_by is not None:
+            # The partitions the new values fall into must be loaded, or their summaries would be incomplete
+            keys = {partition_key(c["value"].date, self._partition_by) for c in self._commits if "value" in c}
+            self.load_partitions(self._partitions[key] for key in keys if key in self._partitions)
+
+        with self._lock, instruments.probe("database.commit") as probe:
+            for commit in self._commits:
+                if commit["action"] == "remove":
+                    consolidate = True
+
+                commit_data.append(self._handle_commit(commit))
 
-            commit_data.append(self._handle_commit(commit))
+            self._history.appendleft(commit_data)  # Store the commit data in history
+            self._commits = []  # Clear the commits after processing
+            self._partitions_dirty = True
+            probe.rows = len(commit_data)
 
-        self._history.appendleft(commit_data)  # Store the commit data in history
-        self._commits = []  # Clear the commits after processing
+            if consolidate:  # If there was any transaction removed, consolidate the database
+                self._consolidate()
+            self._version += 1
+            self._sorted_by = None
 
-        if consolidate:  # If there was any transaction removed, consolidate the database
-            self._consolidate()
+        self._notify(Action.COMMIT, commit_data)
 
     def revert(self):
         """Revert the last commit."""
@@ -104,13 +645,27 @@ class Database[T]:
         last_commit_data = self._history.popleft()
 
         consolidate = False
-        for commit in reversed(last_commit_data):
-            if commit["action"] == "add":
+        with self._lock, instruments.probe("database.revert") as probe:
+            # The indices in the commit data refer to the entries before the consolidation,
+            # so the removed entries' places have to be reopened first
+            removed = sorted({commit["index"] for commit in last_commit_data if commit["action"] == "remove"})
+            if removed:
+                self._reopen(removed)
                 consolidate = True
-            self._undo_commit(commit)
 
-        if consolidate:
-            self._consolidate()
+            for commit in reversed(last_commit_data):
+                if commit["action"] == "add":
+                    consolidate = True
+                self._undo_commit(commit)
+            self._partitions_dirty = True
+            probe.rows = len(last_commit_data)
+
+            if consolidate:
+                self._consolidate()
+            self._version += 1
+            self._sorted_by = None
+
+        self._notify(Action.REVERT, last_commit_data)
 
     def get_history(self):
         """Return the history of commits."""
@@ -120,6 +675,92 @@ class Database[T]:
         """Return the list of pending commits."""
         return self._commits
 
+    def is_saved(self) -> bool:
+        """Return whether the database was saved (or loaded) since its last commit or revert."""
+        return self._saved_version == self._version
+
+    def mark_saved(self, version: int, filename: Path | None = None) -> None:
+        """
+        Record that the given version of the database was saved, e.g. from a snapshot in the background.
+        If the database changed since then, it stays unsaved.
+
+        :param version: The saved version, see `DatabaseSnapshot.version`.
+        :param filename: The file the version was saved into, if known.
+        """
+        self._saved_version = version
+        if filename is not None:
+            self._saved_into(filename)
+
+    def _saved_into(self, filename: Path) -> None:
+        """
+        Keep following the source (see `import_tail`) after the database was written into it. The file then ends
+        with the database's own entries, so it is marked as read to its end, or not marked at all if it is
+        no longer an uncompressed CSV file.
+        """
+        if self._source is None or Path(filename).resolve() != self._source.resolve():
+            return
+
+        self._mark = None
+        if ledger_format(self._source)[0] == ".csv" and detect_codec(self._source) is None:
+            with open(self._source, 'rb') as f:
+                f.seek(0, 2)
+                self._mark = FileMark.of(f, f.tell())
+
+    @property
+    def source(self) -> Path | None:
+        """The file the database was loaded from, `None` if it was not loaded from a single file."""
+        return self._source
+
+    def get_version(self) -> int:
+        """Return the version of the entries, increased by every load, commit and revert."""
+        return self._version
+
+    def snapshot(self) -> DatabaseSnapshot[T]:
+        """
+        Take a consistent, read-only snapshot of the committed entries. Safe to call from any thread.
+        All partitions are loaded first, so that the snapshot is complete.
+        """
+        self.load_partitions()
+        with self._lock:
+            return DatabaseSnapshot(self._version, self._entries.snapshot())
+
+    def subscribe(self, callback: Callable[[Action, list[dict]], None]) -> None:
+        """
+        Subscribe a callback to the database's change stream. It is called with the action
+        (`LOAD`, `APPEND`, `PUSH`, `COMMIT` or `REVERT`) and the list of the affected commits: the appended
+        entries for `APPEND`, the scheduled one for `PUSH`, the processed ones for `COMMIT`
+        and the undone ones for `REVERT`.
+
+        :param callback: A callable function to be called on every change.
+        """
+        if callback not in self._subscribers:
+            self._subscribers.append(callback)
+
+    def unsubscribe(self, callback: Callable[[Action, list[dict]], None]) -> None:
+        """Remove a callback from the change stream."""
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+
+    def _notify(self, action: Action, changes: list[dict]) -> None:
+        """Call all subscribers of the change stream."""
+        for callback in list(self._subscribers):
+            callback(action, changes)
+
+    def import_entries(self, entries: Iterable[T],
+                       policy: DuplicatePolicy = DuplicatePolicy.SKIP_EXACT) -> ImportReport:
+        """
+        Schedule the transactions to be added, detecting the duplicates of the committed ones, e.g. when
+        importing a bank export that overlaps with the database. After the first import, which indexes
+        the database, an import takes time proportional to the number of the imported transactions.
+
+        :param entries: The transactions to import.
+        :param policy: Which duplicates to skip, see `DuplicatePolicy`.
+        :return: The report of the scheduled transactions and the detected duplicates.
+        """
+        if self._duplicates is None:
+            self._duplicates = DuplicateIndex(self)
+        return schedule_import(self, self._duplicates, entries, policy)
+
     def add(self, transaction: Transaction):
         """
         Schedule a transaction to be added to the database.
@@ -131,6 +772,7 @@ class Database[T]:
             "value": transaction
         }
         self._commits.append(commit)
+        self._notify(Action.PUSH, [commit])
 
     def edit(self, index: int, transaction: Transaction):
         """
@@ -145,6 +787,7 @@ class Database[T]:
             "value": transaction
         }
         self._commits.append(commit)
+        self._notify(Action.PUSH, [commit])
 
     def remove(self, index: int):
         """
@@ -157,6 +800,7 @@ class Database[T]:
             "index": index
         }
         self._commits.append(commit)
+        self._notify(Action.PUSH, [commit])
 
     def _handle_commit(self, commit: dict) -> dict:
         """
@@ -184,23 +828,23 @@ class Database[T]:
 
     def _consolidate(self):
         """
-        Consolidates the database, first moving all None values to the end and then popping them to save space.
+        Consolidates the database, dropping all None values while keeping the order of the other entries.
         """
-        l, r = 0, 1
-        while l < len(self._entries) and r < len(self._entries):
-            if self._entries[l] is not None:
-                l += 1
-            else:
-                if self._entries[r] is not None:
-                    self._entries[l], self._entries[r] = self._entries[r], self._entries[l]
-                    l += 1
-            r += 1
+        with instruments.probe("database.consolidate") as probe:
+            probe.rows = len(self._entries)
+            self._entries[:] = [entry for entry in self._stored() if entry is not None]
 
-        if l < len(self._entries) and self._entries[l] is not None:
-            l += 1
-
-        while l < len(self._entries):
-            self._entries.pop()
+    def _reopen(self, indices: list[int]) -> None:
+        """
+        Inverse of `_consolidate`: inserts None values, so that they end up at the given (sorted) indices.
+        """
+        entries = []
+        remaining = self._stored()
+        for index in indices:
+            entries.extend(islice(remaining, index - len(entries)))
+            entries.append(None)
+        entries.extend(remaining)
+        self._entries[:] = entries
 
     def _undo_commit(self, commit: dict) -> None:
         """
@@ -218,9 +862,10 @@ class Database[T]:
                     self._entries[index] = None
 
             case "remove":
-                # Restore the removed transaction
+                # Restore the removed transaction at its original place, reopened by `_reopen`
+                index = commit["index"]
                 transaction = commit["old_value"]
-                self._entries.append(transaction)
+                self._entries[index] = transaction
 
             case "update":
                 # Revert to the previous transaction
@@ -1,7 +1,10 @@
 from pathlib import Path
-from typing import Callable, Union, Any
+from typing import Callable, Union, Any, Sequence
 
 from mamlambo.Database import Database
+from mamlambo.Database.query import order_indices
+from mamlambo.Database.storage import Storage
+from mamlambo.Diagnostics import instruments
 from mamlambo.Enums.enums import Action
 
 
@@ -14,27 +17,62 @@ class DatabaseView[T]:
 
     It also employs reactive programming, as classes that depend on the database's data
     can add their own callback that is called every time the database changes state.
+
+    Several views (each with its own order and filters) can share one database. All of them are kept
+    up to date from the database's change stream, whichever of them the changes were made through.
+
+    A storage able to filter and sort on its own (see `Storage.query`) does so in place of the view,
+    and the view then only reads the entries it is asked for.
     """
-    def __init__(self, sort_key: Callable[[T], Any], reverse_sort: bool):
+
+    # Commits of at most this many changes are merged into the view instead of sorting it again
+    incremental_limit = 256
+
+    def __init__(self, sort_key: Callable[[T], Any], reverse_sort: bool, database: Storage[T] = None,
+                 filters: list[Callable[[T], bool]] = None):
         """
         Initialize the DatabaseView with sorting and filtering capabilities.
 
         :param sort_key: The key function to sort the database entries.
         :param reverse_sort: Boolean indicating whether to sort in reverse order.
+        :param database: The database to view. If not given, the view creates its own, in-memory one.
+        :param filters: The filters to apply to the view from the start.
         """
-        self._view: list[int] = []
-        self._database = Database[T]()
+        self._view: list[int] | Sequence[int] = []
+        self._database = Database[T]() if database is None else database
         self._subscribers: list[Callable[[], None]] = []
         self._prev_action = Action.NONE
-        self._saved = False
         self._sort_key = sort_key
         self._reverse = reverse_sort
-        self._filters = []
+        self._filters = [] if filters is None else filters
+        self._storage_sorted = False  # Whether the view was last filtered and sorted by the storage
+        self._database.subscribe(self._on_change)
+        if database is not None:
+            self.sort_by()
+
+    @property
+    def database(self) -> Storage[T]:
+        """The database this view is over."""
+        return self._database
+
+    @property
+    def filters(self) -> list[Callable[[T], bool]]:
+        """The filters currently applied to the view."""
+        return self._filters
+
+    def close(self) -> None:
+        """Stop following the changes of the database. The view should not be used afterwards."""
+        self._database.unsubscribe(self._on_change)
+        self._subscribers = []
 
     def __len__(self):
         """Return the number of entries in the view."""
         return len(self._view)
 
+    def __iter__(self):
+        """Return an iterator over the entries in the view's order."""
+        return (self._database[i] for i in self._view)
+
     def __getitem__(self, item) -> Union[T, list[T]]:
         """
         Get a database entry by index or slice.
@@ -47,6 +85,18 @@ class DatabaseView[T]:
 
         return [self._database[i] for i in self._view[item]]
 
+    def database_index(self, position: int) -> int:
+        """
+        Return the index in the database of the entry at the given position of the view.
+
+        :raises IndexError: If the view has no such position.
+        """
+        return self._view[position]
+
+    def database_indices(self) -> list[int]:
+        """Return a copy of the database indices of the entries in the view's order, e.g. to read a snapshot."""
+        return list(self._view)
+
     def sort_by(self, /, sort_key: Callable = None, reverse: bool = None, filters: list[Callable] = None) -> None:
         """
         Sorts the entries in the database according to the given arguments.
@@ -68,29 +118,43 @@ class DatabaseView[T]:
             self._reverse = reverse
 
         if filters is not None:
-            indices = [i for i in range(len(self._database)) if self._check_filters(self._database[i], filters)]
             self._filters = filters
-        else:
-            indices = [i for i in range(len(self._database)) if self._check_filters(self._database[i], self._filters)]
 
-        self._view = sorted(
-            indices,
-            key=lambda i: sort_key(self._database[i]),
-            reverse=reverse
-        )
+        with instruments.probe("view.query"):
+            rows = self._database.query(self._filters, sort_key, reverse)
+        if rows is not None:
+            # Already filtered and sorted by the storage, the entries are read only once needed
+            self._view = rows
+            self._storage_sorted = True
+            self._prev_action = Action.STATE_CHANGE
+            self._call_all()
+            return
+
+        with instruments.probe("view.filter") as probe:
+            probe.rows = len(self._database)
+            indices, entries = [], []
+            for i in self._database.candidate_indices(self._filters):
+                entry = self._database[i]
+                if self._check_filters(entry, self._filters):
+                    indices.append(i)
+                    entries.append(entry)
+
+        with instruments.probe("view.sort_by") as probe:
+            probe.rows = len(indices)
+            self._view = order_indices(indices, entries, sort_key, reverse)
+        self._storage_sorted = False
         self._prev_action = Action.STATE_CHANGE
         self._call_all()
 
     def dump(self, filename: Path, /, delimiter: str = ',') -> None:
         """
-        Dump the database transactions into a CSV or JSON file.
+        Dump the database transactions into a CSV, JSON or JSON Lines file, possibly compressed.
 
         :param filename: The path to the file to write to.
         :param delimiter: The delimiter to use in the CSV file.
         :return: None
         """
         self._database.dump(filename, delimiter)
-        self._saved = True
 
     def load(self, filename: Path | str, line_parser: Callable[[list[str]], T], /, delimiter=",") -> None:
         """
@@ -101,10 +165,20 @@ class DatabaseView[T]:
         :param delimiter: The delimiter used in the file.
         :return: None
         """
-        self._database.load(filename, line_parser, delimiter)
-        self._prev_action = Action.LOAD
-        self._saved = True
-        self.sort_by()
+        self._database.load(filename, line_parser, delimiter)  # Updates the view through `_on_change`
+
+    def load_many(self, filenames: list[str], line_parser: Callable[[list[str]], T], /, delimiter=",",
+                  workers: int = None) -> None:
+        """
+        Load several ledgers into the database, merged and sorted by date, see `Database.load_many`.
+
+        :param filenames: The paths to the ledgers to load.
+        :param line_parser: Parses the files to the database representation.
+        :param delimiter: The delimiter used in the CSV files.
+        :param workers: The number of worker processes, the number of CPUs by default.
+        :return: None
+        """
+        self._database.load_many(filenames, line_parser, delimiter, workers)  # Updates the view through `_on_change`
 
     def commit(self) -> None:
         """
@@ -112,10 +186,7 @@ class DatabaseView[T]:
 
         :return: None
         """
-        self._database.commit()
-        self._prev_action = Action.STATE_CHANGE
-        self._saved = False
-        self.sort_by()
+        self._database.commit()  # Updates the view through `_on_change`
 
     def revert(self) -> None:
         """
@@ -123,10 +194,7 @@ class DatabaseView[T]:
 
         :return: None
         """
-        self._database.revert()
-        self._prev_action = Action.STATE_CHANGE
-        self._saved = False
-        self.sort_by()
+        self._database.revert()  # Updates the view through `_on_change`
 
     def add(self, transaction) -> None:
         """
@@ -136,9 +204,6 @@ class DatabaseView[T]:
         :return: None
         """
         self._database.add(transaction)
-        if self._prev_action != Action.PUSH:
-            self._prev_action = Action.PUSH
-            self._call_all()
 
     def remove(self, index) -> None:
         """
@@ -150,9 +215,6 @@ class DatabaseView[T]:
         if len(self._view) > 0:
             index = self._view[index]
         self._database.remove(index)
-        if self._prev_action != Action.PUSH:
-            self._prev_action = Action.PUSH
-            self._call_all()
 
     def edit(self, index, transaction) -> None:
         """
@@ -165,9 +227,6 @@ class DatabaseView[T]:
         if len(self._view) > 0:
             index = self._view[index]
         self._database.edit(index, transaction)
-        if self._prev_action != Action.PUSH:
-            self._prev_action = Action.PUSH
-            self._call_all()
 
     def subscribe(self, callback: Callable[[], None]) -> None:
         """
@@ -180,13 +239,23 @@ class DatabaseView[T]:
             self._subscribers.append(callback)
             callback()  # To let the new subscriber know the current state
 
+    def unsubscribe(self, callback: Callable[[], None]) -> None:
+        """
+        Stop calling a callback subscribed before, see `subscribe`.
+
+        :param callback: The subscribed callback.
+        :return: None
+        """
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+
     def is_saved(self) -> bool:
         """
         Check if the current state of the database is saved.
 
         :return: True if the database is saved, False otherwise.
         """
-        return self._saved
+        return self._database.is_saved()
 
     def all_committed(self) -> bool:
         """
@@ -204,10 +273,103 @@ class DatabaseView[T]:
         """
         return len(self._database.get_history()) > 0
 
+    def _on_change(self, action: Action, changes: list[dict]) -> None:
+        """Follow a change of the database, made through this or any other view."""
+        match action:
+            case Action.PUSH:
+                if self._prev_action != Action.PUSH:
+                    self._prev_action = Action.PUSH
+                    self._call_all()
+            case Action.LOAD:
+                self._prev_action = Action.LOAD
+                self.sort_by()
+            case Action.COMMIT:
+                self._prev_action = Action.STATE_CHANGE
+                if self._merge_changes(changes):
+                    self._call_all()
+                else:
+                    self.sort_by()
+            case Action.APPEND:
+                self._prev_action = Action.STATE_CHANGE
+                if self._merge_changes(changes) or self._merge_appended(changes):
+                    self._call_all()
+                else:
+                    self.sort_by()
+            case _:
+                self._prev_action = Action.STATE_CHANGE
+                self.sort_by()
+
+    def _merge_changes(self, changes: list[dict]) -> bool:
+        """
+        Merge a small commit of additions and updates into the view, without filtering and sorting
+        the whole database again. Removals shift the indices of the entries, so they are not merged.
+
+        :return: Whether the changes were merged.
+        """
+        if len(changes) > self.incremental_limit or any(c["action"] == "remove" for c in changes):
+            return False
+        if not isinstance(self._view, list):
+            return False  # Sorted by the storage, which will simply run its query again
+
+        with instruments.probe("view.merge") as probe:
+            probe.rows = len(changes)
+            changed = {c["index"] for c in changes}
+            updated = {c["index"] for c in changes if c["action"] == "update"}
+            if updated:
+                self._view = [i for i in self._view if i not in updated]
+
+            for index in sorted(changed):
+                entry = self._database[index]
+                if entry is not None and self._check_filters(entry, self._filters):
+                    self._view.insert(self._insertion_point(self._sort_key(entry)), index)
+
+        return True
+
+    def _merge_appended(self, changes: list[dict]) -> bool:
+        """
+        Merge a large chunk of entries appended by a progressive load into the view (see `ProgressiveLoad`).
+        The new entries are sorted along with the view, which is sorted already, so the sort merely merges
+        the two. Entries with equal keys keep the order of their indices, as if the whole view was sorted again.
+
+        :return: Whether the entries were merged.
+        """
+        if self._storage_sorted:
+            return False  # Sorted by the storage, which will simply run its query again
+
+        with instruments.probe("view.append") as probe:
+            indices, entries = list(self._view), [self._database[i] for i in self._view]
+            for change in changes:
+                entry = change["value"]
+                if self._check_filters(entry, self._filters):
+                    indices.append(change["index"])
+                    entries.append(entry)
+            probe.rows = len(indices) - len(self._view)
+            self._view = order_indices(indices, entries, self._sort_key, self._reverse)
+
+        return True
+
+    def _insertion_point(self, key: Any) -> int:
+        """Find where an entry with the given sort key belongs in the view, after all entries with an equal key."""
+        low, high = 0, len(self._view)
+        while low < high:
+            middle = (low + high) // 2
+            other = self._sort_key(self._database[self._view[middle]])
+            if (other < key) if self._reverse else (key < other):
+                high = middle
+            else:
+                low = middle + 1
+        return low
+
     def _call_all(self) -> None:
         """Call all subscriber callbacks to notify them of a state change."""
+        if not instruments.enabled:
+            for callback in self._subscribers:
+                callback()
+            return
+
         for callback in self._subscribers:
-            callback()
+            with instruments.probe(f"view.subscriber.{getattr(callback, '__qualname__', repr(callback))}"):
+                callback()
 
     @staticmethod
     def _check_filters(entry: T, filters: list[Callable[[T], bool]]) -> bool:
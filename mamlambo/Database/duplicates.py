@@ -0,0 +1,172 @@
+from collections import Counter
+from difflib import SequenceMatcher
+from typing import Iterable
+
+from mamlambo.Diagnostics import instruments
+from mamlambo.Enums.enums import Action, DuplicatePolicy
+from mamlambo.Transactions import Transaction
+
+
+def normalize_title(title: str) -> str:
+    """Return the title as compared for near duplicates: case-insensitive and with collapsed whitespace."""
+    return " ".join(title.casefold().split())
+
+
+class ImportReport:
+    """The outcome of an import: the scheduled transactions and the detected duplicates."""
+    def __init__(self):
+        self.added: list[Transaction] = []
+        self.exact: list[Transaction] = []  # Exact duplicates of existing transactions
+        self.near: list[tuple[Transaction, str]] = []  # Near duplicates, along with the similar existing title
+        self.skipped = 0
+
+    def __repr__(self):
+        return (f"ImportReport(added={len(self.added)}, exact={len(self.exact)}, near={len(self.near)}, "
+                f"skipped={self.skipped})")
+
+
+class DuplicateIndex:
+    """
+    A hash index of the committed transactions of a database, used to find duplicates of imported ones
+    in constant time per transaction, instead of comparing them with the whole database.
+
+    Exact duplicates have the same content hash (see `Transaction.content_hash`). Near duplicates have
+    the same date, amount and currency, and a similar title. The index is built on first use and then kept
+    up to date from the database's change stream.
+    """
+    def __init__(self, database, similarity: float = 0.8):
+        """
+        :param database: The database to index, see `Storage`.
+        :param similarity: The minimal similarity of two titles (from 0 to 1) for a near duplicate.
+        """
+        self.similarity = similarity
+        self._database = database
+        self._exact: Counter[str] | None = None
+        self._near: dict[tuple, Counter[str]] = dict()  # The titles by date, amount and currency
+        database.subscribe(self._on_change)
+
+    def close(self) -> None:
+        """Stop following the changes of the database."""
+        self._database.unsubscribe(self._on_change)
+
+    def find(self, entry: Transaction, claimed: Counter[str] = None) -> tuple[str | None, str | None]:
+        """
+        Find out whether the transaction duplicates an indexed one.
+
+        Each indexed transaction is a duplicate of at most one imported transaction: once it has been
+        matched (recorded in `claimed`), another identical transaction is imported as a new one.
+        This keeps e.g. two equal payments on the same day that are both in the imported file.
+
+        :param entry: The transaction to look up.
+        :param claimed: The content hashes of the indexed transactions matched so far, updated by the call.
+        :return: The kind of the duplicate (`exact`, `near` or `None`) and the title of the similar
+            indexed transaction, for a near duplicate.
+        """
+        self._build()
+        digest = entry.content_hash()
+        if claimed is None:
+            claimed = Counter()
+        if digest in self._exact:
+            if self._exact[digest] > claimed[digest]:
+                claimed[digest] += 1
+                return "exact", None
+            return None, None  # All its exact duplicates are matched already, so it is a new one
+
+        titles = self._near.get(self._near_key(entry))
+        if titles:
+            title = normalize_title(entry.title)
+            matcher = SequenceMatcher(None, b=title)  # The second sequence is the one the matcher caches
+            for other in titles:
+                matcher.set_seq1(other)
+                if matcher.real_quick_ratio() >= self.similarity and matcher.ratio() >= self.similarity:
+                    return "near", other
+        return None, None
+
+    def _build(self) -> None:
+        if self._exact is not None:
+            return
+
+        self._exact = Counter()
+        self._near = dict()
+        with instruments.probe("database.duplicates.build") as probe:
+            for entry in self._database:
+                self._add(entry)
+                probe.rows += 1
+
+    def _add(self, entry: Transaction) -> None:
+        self._exact[entry.content_hash()] += 1
+        self._near.setdefault(self._near_key(entry), Counter())[normalize_title(entry.title)] += 1
+
+    def _discard(self, entry: Transaction) -> None:
+        digest = entry.content_hash()
+        self._exact[digest] -= 1
+        if self._exact[digest] <= 0:
+            del self._exact[digest]
+
+        key = self._near_key(entry)
+        title = normalize_title(entry.title)
+        titles = self._near[key]
+        titles[title] -= 1
+        if titles[title] <= 0:
+            del titles[title]
+        if not titles:
+            del self._near[key]
+
+    @staticmethod
+    def _near_key(entry: Transaction) -> tuple:
+        return entry.date, entry.amount, entry.currency
+
+    def _on_change(self, action: Action, changes: list[dict]) -> None:
+        if self._exact is None:
+            return  # Not built yet, nothing to update
+
+        match action:
+            case Action.LOAD:
+                self._exact = None  # Rebuilt on next use
+            case Action.COMMIT | Action.APPEND:
+                for change in changes:
+                    if "old_value" in change:
+                        self._discard(change["old_value"])
+                    if change["action"] != "remove":
+                        self._add(change["value"])
+            case Action.REVERT:
+                for change in reversed(changes):
+                    if change["action"] != "remove":
+                        self._discard(change["value"])
+                    if "old_value" in change:
+                        self._add(change["old_value"])
+
+
+def schedule_import(database, index: DuplicateIndex, entries: Iterable[Transaction],
+                    policy: DuplicatePolicy) -> ImportReport:
+    """
+    Schedule the transactions to be added to the database, detecting the duplicates of its committed
+    transactions. The scheduled transactions are added by the next commit.
+
+    :param database: The database to import into, see `Storage`.
+    :param index: The duplicate index of the database.
+    :param entries: The transactions to import.
+    :param policy: Which duplicates to skip.
+    :return: The report of the scheduled transactions and the detected duplicates.
+    """
+    report = ImportReport()
+    claimed = Counter()
+    with instruments.probe("database.import") as probe:
+        for entry in entries:
+            probe.rows += 1
+            kind, similar = index.find(entry, claimed)
+            if kind == "exact":
+                report.exact.append(entry)
+                if policy != DuplicatePolicy.KEEP:
+                    report.skipped += 1
+                    continue
+            elif kind == "near":
+                report.near.append((entry, similar))
+                if policy == DuplicatePolicy.SKIP_ALL:
+                    report.skipped += 1
+                    continue
+
+            database.add(entry)
+            report.added.append(entry)
+
+    return report
@@ -0,0 +1,51 @@
+import hashlib
+from typing import BinaryIO
+
+
+class FileMark:
+    """
+    Marks how far a growing file was read: the offset of the first unread byte and the digests of the first
+    and the last block before it. If the file still has the same blocks at the same places, it is assumed
+    that only new data was appended after the offset, which keeps the check in constant time however large
+    the file gets. (A change in the middle of the file is not detected.)
+    """
+    BLOCK_SIZE = 64 * 1024
+
+    def __init__(self, offset: int, head: str, tail: str, terminated: bool):
+        """
+        :param offset: The offset of the first unread byte.
+        :param head: The digest of the block at the start of the file.
+        :param tail: The digest of the block ending at the offset.
+        :param terminated: Whether the read data ended with a line break. If not, the last read line is
+            only complete if the data appended to it starts with a line break.
+        """
+        self.offset = offset
+        self.head = head
+        self.tail = tail
+        self.terminated = terminated
+
+    @staticmethod
+    def of(f: BinaryIO, offset: int) -> "FileMark":
+        """Mark the file as read up to the offset."""
+        head = FileMark._digest(f, 0, min(offset, FileMark.BLOCK_SIZE))
+        tail_start = max(0, offset - FileMark.BLOCK_SIZE)
+        tail = FileMark._digest(f, tail_start, offset - tail_start)
+        terminated = offset == 0
+        if offset > 0:
+            f.seek(offset - 1)
+            terminated = f.read(1) == b"\n"
+        return FileMark(offset, head, tail, terminated)
+
+    def matches(self, f: BinaryIO) -> bool:
+        """Return whether the file still starts with the data that was read."""
+        f.seek(0, 2)
+        if f.tell() < self.offset:
+            return False
+
+        other = FileMark.of(f, self.offset)
+        return other.head == self.head and other.tail == self.tail
+
+    @staticmethod
+    def _digest(f: BinaryIO, start: int, length: int) -> str:
+        f.seek(start)
+        return hashlib.blake2b(f.read(length), digest_size=16).hexdigest()
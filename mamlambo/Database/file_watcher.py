@@ -0,0 +1,102 @@
+import os
+from collections import Counter
+from pathlib import Path
+from typing import Hashable, Iterable
+
+from mamlambo.Database.file_mark import FileMark
+
+
+class FileWatcher:
+    """
+    Notices that a file was changed by another program, by polling its modification time and size.
+    A change is only reported once the file stayed the same for two polls in a row, so that a file
+    still being written is not read half-way.
+    """
+    def __init__(self, filename: str | Path):
+        """:param filename: The file to watch. It does not have to exist yet."""
+        self.path = Path(filename)
+        self._stamp = self._stat()  # The state of the file last acknowledged
+        self._candidate = None  # The changed state seen by the last poll
+
+    def poll(self) -> bool:
+        """Return whether the file changed since it was last acknowledged, see `acknowledge`."""
+        stamp = self._stat()
+        if stamp == self._stamp:
+            self._candidate = None
+            return False
+        if stamp != self._candidate:
+            self._candidate = stamp  # Still changing, or changed just now
+            return False
+        return True
+
+    def acknowledge(self) -> None:
+        """Take the current state of the file as seen, e.g. after reading it or after writing it ourselves."""
+        self._stamp = self._stat()
+        self._candidate = None
+
+    def _stat(self) -> tuple[int, int] | None:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+
+class LedgerDiff[T]:
+    """
+    The changes turning the entries of a database into those of a file, see `Database.diff_file`.
+    The indices refer to the entries of the database at the given version.
+    """
+    def __init__(self, filename: Path, version: int, updated: list[tuple[int, T]], removed: list[int],
+                 added: list[T], mark: FileMark | None):
+        """
+        :param filename: The file the entries were read from.
+        :param version: The version of the database the file was compared with.
+        :param updated: The indices of the entries replaced by another one, along with the replacements.
+        :param removed: The indices of the entries no longer in the file.
+        :param added: The entries of the file not in the database.
+        :param mark: How far the file was read, if it is an uncompressed CSV file (see `Database.import_tail`).
+        """
+        self.filename = filename
+        self.version = version
+        self.updated = updated
+        self.removed = removed
+        self.added = added
+        self.mark = mark
+
+    def __len__(self):
+        """Return the number of changes."""
+        return len(self.updated) + len(self.removed) + len(self.added)
+
+
+def diff_entries[T: Hashable](current: Iterable[T | None], new: list[T]
+                              ) -> tuple[list[tuple[int, T]], list[int], list[T]]:
+    """
+    Compare two lists of entries as multisets, by their contents (equal entries have equal hashes),
+    so that the entries present in both are left alone wherever they are.
+
+    The entries missing from the new list are paired with the new entries in their order and replaced by them,
+    so that an entry changed in place becomes a single update; the rest are removed or added.
+
+    :param current: The current entries, `None` for an empty slot.
+    :param new: The new entries.
+    :return: The updated indices with their new entries, the removed indices and the added entries.
+    """
+    wanted = Counter(new)
+    missing = []
+    for i, entry in enumerate(current):
+        if entry is None:
+            continue
+        if wanted[entry] > 0:
+            wanted[entry] -= 1
+        else:
+            missing.append(i)
+
+    extra = []
+    for entry in new:
+        if wanted[entry] > 0:
+            wanted[entry] -= 1
+            extra.append(entry)
+
+    paired = min(len(missing), len(extra))
+    return list(zip(missing[:paired], extra[:paired])), missing[paired:], extra[paired:]
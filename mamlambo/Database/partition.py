@@ -0,0 +1,194 @@
+import datetime
+import math
+from collections import Counter
+from pathlib import Path
+from typing import Any
+
+from mamlambo.Transactions import Money, Transaction
+from mamlambo.Transactions.money import MAX_SCALE, currency_scale
+
+# The supported partitioning schemes
+PARTITION_SCHEMES = ("month", "year")
+
+
+def partition_key(d: datetime.date, scheme: str) -> str:
+    """
+    Return the key of the partition the date belongs to, e.g. `2024-06` for months or `2024` for years.
+    The keys of one scheme sort chronologically.
+    """
+    match scheme:
+        case "month":
+            return f"{d.year:04d}-{d.month:02d}"
+        case "year":
+            return f"{d.year:04d}"
+        case _:
+            raise ValueError(f"Unsupported partitioning: {scheme}")
+
+
+class CurrencySummary:
+    """
+    Aggregates of the transactions in a single currency, the same ones the statistics window shows.
+    The total and the sums of the groups are exact, in units of `Money.exact`.
+    """
+    def __init__(self, currency: str | None = None):
+        """:param currency: The currency of the transactions, whose decimals the amounts are stored with."""
+        self.scale = currency_scale(currency)
+        self.count = 0
+        self.total = 0
+        self.max: tuple[Money | float, str | None] = (-math.inf, None)
+        self.min: tuple[Money | float, str | None] = (math.inf, None)
+        self.incomes = Counter()
+        self.expenses = Counter()
+
+    def add(self, transaction: Transaction) -> None:
+        amount = transaction.amount
+        exact = amount.exact
+        self.count += 1
+        self.total += exact
+        if amount > self.max[0]:
+            self.max = (amount, transaction.title)
+        if amount < self.min[0]:
+            self.min = (amount, transaction.title)
+        if exact > 0:
+            self.incomes[transaction.group.name] += exact
+        elif exact < 0:
+            self.expenses[transaction.group.name] -= exact
+
+    def merge(self, other: "CurrencySummary") -> None:
+        self.count += other.count
+        self.total += other.total
+        if other.max[0] > self.max[0]:
+            self.max = other.max
+        if other.min[0] < self.min[0]:
+            self.min = other.min
+        self.incomes.update(other.incomes)
+        self.expenses.update(other.expenses)
+
+    def to_dict(self) -> dict[str, Any]:
+        # The amounts are stored as decimal strings, so that they are read back exactly
+        return {
+            "count": self.count,
+            "total": _dump_exact(self.total, self.scale),
+            "max": [_dump_amount(self.max[0]), self.max[1]],
+            "min": [_dump_amount(self.min[0]), self.min[1]],
+            "incomes": {group: _dump_exact(value, self.scale) for group, value in self.incomes.items()},
+            "expenses": {group: _dump_exact(value, self.scale) for group, value in self.expenses.items()}
+        }
+
+    @staticmethod
+    def from_dict(data: dict[str, Any], currency: str | None = None) -> "CurrencySummary":
+        """
+        :param data: The summary, as returned by `to_dict`. Manifests written before the amounts were exact
+            store them as floats, whose rounding errors are dropped.
+        :param currency: The currency of the summary, whose decimals the amounts are read with.
+        """
+        summary = CurrencySummary(currency)
+        scale = summary.scale
+        summary.count = data["count"]
+        summary.total = _load_exact(data["total"], scale)
+        summary.max = (_load_amount(data["max"][0], scale), data["max"][1])
+        summary.min = (_load_amount(data["min"][0], scale), data["min"][1])
+        summary.incomes = Counter({group: _load_exact(value, scale) for group, value in data["incomes"].items()})
+        summary.expenses = Counter({group: _load_exact(value, scale) for group, value in data["expenses"].items()})
+        return summary
+
+
+def _dump_exact(exact: int, scale: int) -> str:
+    return str(Money.of_exact(exact, scale))
+
+
+def _load_exact(value: str | int | float, scale: int) -> int:
+    return _load_amount(value, scale).exact
+
+
+def _dump_amount(amount: Money | float) -> str | float:
+    """Dump an extreme, which is infinite in an empty summary."""
+    return str(amount) if isinstance(amount, Money) else amount
+
+
+def _load_amount(value: str | int | float, scale: int) -> Money | float:
+    if isinstance(value, float):
+        if math.isinf(value):
+            return value
+        value = round(value, MAX_SCALE)  # A float sum, e.g. 0.30000000000000004
+    return Money.parse(value, scale)
+
+
+class PartitionSummary:
+    """Aggregates of a single partition: its date range and the per-currency amount summaries."""
+    def __init__(self):
+        self.count = 0
+        self.min_date: datetime.date | None = None
+        self.max_date: datetime.date | None = None
+        self.currencies: dict[str, CurrencySummary] = dict()
+
+    def add(self, transaction: Transaction) -> None:
+        self.count += 1
+        if self.min_date is None or transaction.date < self.min_date:
+            self.min_date = transaction.date
+        if self.max_date is None or transaction.date > self.max_date:
+            self.max_date = transaction.date
+
+        currency = self.currencies.get(transaction.currency)
+        if currency is None:
+            currency = self.currencies[transaction.currency] = CurrencySummary(transaction.currency)
+        currency.add(transaction)
+
+    def merge(self, other: "PartitionSummary") -> None:
+        self.count += other.count
+        if other.min_date is not None and (self.min_date is None or other.min_date < self.min_date):
+            self.min_date = other.min_date
+        if other.max_date is not None and (self.max_date is None or other.max_date > self.max_date):
+            self.max_date = other.max_date
+
+        for name, summary in other.currencies.items():
+            if name not in self.currencies:
+                self.currencies[name] = CurrencySummary(name)
+            self.currencies[name].merge(summary)
+
+    def overlaps(self, start: datetime.date | None, end: datetime.date | None) -> bool:
+        """Whether any of the partition's dates can be in the closed interval [start, end] (`None` is unbounded)."""
+        if self.count == 0:
+            return False
+        if start is not None and self.max_date < start:
+            return False
+        if end is not None and self.min_date > end:
+            return False
+        return True
+
+    def within(self, start: datetime.date | None, end: datetime.date | None) -> bool:
+        """Whether all the partition's dates are in the closed interval [start, end] (`None` is unbounded)."""
+        return ((start is None or self.min_date >= start) and
+                (end is None or self.max_date <= end))
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "count": self.count,
+            "min_date": None if self.min_date is None else self.min_date.isoformat(),
+            "max_date": None if self.max_date is None else self.max_date.isoformat(),
+            "currencies": {name: summary.to_dict() for name, summary in self.currencies.items()}
+        }
+
+    @staticmethod
+    def from_dict(data: dict[str, Any]) -> "PartitionSummary":
+        summary = PartitionSummary()
+        summary.count = data["count"]
+        if data["min_date"] is not None:
+            summary.min_date = datetime.date.fromisoformat(data["min_date"])
+            summary.max_date = datetime.date.fromisoformat(data["max_date"])
+        summary.currencies = {name: CurrencySummary.from_dict(c, name) for name, c in data["currencies"].items()}
+        return summary
+
+
+class Partition:
+    """
+    A time segment of the database. Its entries are stored in the database's entries, the partition
+    only keeps their indices. A partition read from disk is not loaded until its entries are needed,
+    until then only its summary from the manifest is known.
+    """
+    def __init__(self, key: str, path: Path | None = None, summary: PartitionSummary | None = None):
+        self.key = key
+        self.path = path  # The segment file this partition is stored in, if any
+        self.loaded = path is None
+        self.indices: list[int] = []
+        self.summary = PartitionSummary() if summary is None else summary
@@ -0,0 +1,296 @@
+import csv
+import operator
+from datetime import date
+from typing import Any, Callable, Iterator, TextIO
+
+from mamlambo.Diagnostics import instruments
+from mamlambo.Enums.enums import Action
+from mamlambo.Transactions import Money, Transaction
+from mamlambo.Transactions.money import MAX_SCALE
+
+# The dimensions offered by the GUI and the command line, `group:N` works for any level
+PIVOT_DIMENSIONS = ("group", "group:1", "group:2", "group:3", "month", "week", "currency")
+PIVOT_MEASURES = ("sum", "count", "average")
+
+# The label of the totals of the rows and the columns
+TOTAL_LABEL = "Total"
+
+
+class Dimension:
+    """
+    Labels transactions by one of the properties they are summarized by in a `PivotTable`:
+
+    - `group`, the whole group, or `group:N`, its first N levels (`group:1` separates incomes from expenses)
+    - `month`, e.g. `2024-03`, or `week`, the ISO week, e.g. `2024-W09`
+    - `currency`
+
+    The labels sort in the natural order of the dimension. They are remembered per date and group,
+    so that the many transactions of a day or a group are labelled by a single lookup.
+    """
+    def __init__(self, name: str):
+        """:param name: The name of the dimension, e.g. `group:2`."""
+        kind, _, level = name.partition(":")
+        if kind == "group":
+            if level and (not level.isdigit() or int(level) < 1):
+                raise ValueError(f"Invalid group level: {level}")
+            depth = int(level) if level else None
+            self._getter = operator.attrgetter("group.name")
+            if depth is None:
+                self._label = lambda group: group
+            else:
+                self._label = lambda group: "::".join(group.split("::")[:depth])
+        elif level:
+            raise ValueError(f"Only the group dimension has levels: {name}")
+        elif kind == "month":
+            self._getter = operator.attrgetter("date")
+            self._label = lambda day: f"{day.year:04d}-{day.month:02d}"
+        elif kind == "week":
+            self._getter = operator.attrgetter("date")
+            self._label = _week_label
+        elif kind == "currency":
+            self._getter = operator.attrgetter("currency")
+            self._label = lambda currency: currency
+        else:
+            raise ValueError(f"Unknown dimension: {name}")
+
+        self.name = name
+        self._labels: dict[Any, str] = dict()
+
+    def parts(self) -> tuple[Callable[[Transaction], Any], dict[Any, str], Callable[[Any], str]]:
+        """Return the getter of the labelled property, the remembered labels and the labelling function."""
+        return self._getter, self._labels, self._label
+
+    def __call__(self, entry: Transaction) -> str:
+        value = self._getter(entry)
+        label = self._labels.get(value)
+        if label is None:
+            label = self._labels[value] = self._label(value)
+        return label
+
+    def __repr__(self):
+        return f"Dimension({self.name!r})"
+
+
+def _week_label(day: date) -> str:
+    year, week, _ = day.isocalendar()
+    return f"{year:04d}-W{week:02d}"
+
+
+class PivotTable:
+    """
+    The sums, counts and averages of the amounts of transactions by two dimensions (see `Dimension`),
+    e.g. by group in the rows and by month in the columns, along with the totals of every row and column.
+
+    The table is computed in a single pass over the transactions on first use, and then kept up to date
+    from the database's change stream (the same way as `BalanceIndex`), so a commit only updates the cells
+    of its changes. Amounts in different currencies are summed as they are, so either make the currency one
+    of the dimensions, or filter a single one. The amounts are summed exactly, as integers (see `Money.exact`).
+    """
+    def __init__(self, database, rows: str, columns: str, filters: list[Callable[[Transaction], bool]] = None):
+        """
+        :param database: The database to summarize, see `Storage`.
+        :param rows: The dimension of the rows, e.g. `group:2`.
+        :param columns: The dimension of the columns, e.g. `month`.
+        :param filters: Only the transactions passing all of the filters are summarized.
+        """
+        self._database = database
+        self.rows = Dimension(rows)
+        self.columns = Dimension(columns)
+        self._filters = [] if filters is None else filters
+        # The count and the exact sum of the amounts of every cell, row, and column, `None` until built
+        self._cells: dict[tuple[str, str], list] | None = None
+        self._row_sums: dict[str, list] = dict()
+        self._column_sums: dict[str, list] = dict()
+        self._total = [0, 0]
+        self._row_labels: list[str] | None = None  # Sorted on demand, reset whenever a label appears or vanishes
+        self._column_labels: list[str] | None = None
+        database.subscribe(self._on_change)
+
+    def close(self) -> None:
+        """Stop following the changes of the database."""
+        self._database.unsubscribe(self._on_change)
+
+    def __len__(self):
+        """Return the number of non-empty cells."""
+        self._build()
+        return len(self._cells)
+
+    def row_labels(self) -> list[str]:
+        """Return the labels of the rows, sorted."""
+        self._build()
+        if self._row_labels is None:
+            self._row_labels = sorted(self._row_sums)
+        return self._row_labels
+
+    def column_labels(self) -> list[str]:
+        """Return the labels of the columns, sorted."""
+        self._build()
+        if self._column_labels is None:
+            self._column_labels = sorted(self._column_sums)
+        return self._column_labels
+
+    def value(self, row: str | None, column: str | None, measure: str = "sum") -> Money | float | int | None:
+        """
+        Return the sum, the count or the average of the amounts in a cell.
+
+        :param row: The label of the row, or `None` for the totals of the column.
+        :param column: The label of the column, or `None` for the totals of the row.
+        :param measure: One of `PIVOT_MEASURES`.
+        :return: The value, or `None` if the cell has no transactions.
+        """
+        self._build()
+        if row is None and column is None:
+            cell = self._total
+        elif row is None:
+            cell = self._column_sums.get(column)
+        elif column is None:
+            cell = self._row_sums.get(row)
+        else:
+            cell = self._cells.get((row, column))
+        return _measure(cell, measure)
+
+    def iter_rows(self, measure: str = "sum") -> Iterator[list[str]]:
+        """
+        Yield the table as rows of text, one by one: the header with the labels of the columns,
+        then every row with its label, and the totals last. Sums and averages have two decimals,
+        empty cells are empty strings.
+        """
+        if measure not in PIVOT_MEASURES:
+            raise ValueError(f"Unknown measure: {measure}")
+
+        columns = self.column_labels()
+        yield [f"{self.rows.name} \\ {self.columns.name}"] + columns + [TOTAL_LABEL]
+        cells = self._cells
+        for row in self.row_labels():
+            values = [_measure(cells.get((row, column)), measure) for column in columns]
+            values.append(_measure(self._row_sums[row], measure))
+            yield [row] + [format_value(value, measure) for value in values]
+        values = [_measure(self._column_sums[column], measure) for column in columns]
+        values.append(_measure(self._total, measure))
+        yield [TOTAL_LABEL] + [format_value(value, measure) for value in values]
+
+    def write_csv(self, stream: TextIO, measure: str = "sum", delimiter: str = ",") -> int:
+        """
+        Stream the table into a CSV, row by row, see `iter_rows`.
+
+        :return: The number of written rows, without the header.
+        """
+        writer = csv.writer(stream, delimiter=delimiter)
+        count = -1
+        with instruments.probe("pivot.write_csv") as probe:
+            for row in self.iter_rows(measure):
+                writer.writerow(row)
+                count += 1
+            probe.rows = count
+        return count
+
+    def _build(self) -> None:
+        """Summarize the database, unless it is summarized already."""
+        if self._cells is not None:
+            return
+
+        with instruments.probe("pivot.build") as probe:
+            database, filters = self._database, self._filters
+            row_getter, row_labels, row_label = self.rows.parts()
+            column_getter, column_labels, column_label = self.columns.parts()
+            # Only the cells are summed per transaction, the rows and the columns are summed from the cells
+            cells = dict()
+            for i in database.candidate_indices(filters):
+                entry = database[i]
+                if filters and not all(fil(entry) for fil in filters):
+                    continue
+                value = row_getter(entry)
+                row = row_labels.get(value)
+                if row is None:
+                    row = row_labels[value] = row_label(value)
+                value = column_getter(entry)
+                column = column_labels.get(value)
+                if column is None:
+                    column = column_labels[value] = column_label(value)
+                cell = cells.get((row, column))
+                if cell is None:
+                    cells[(row, column)] = [1, entry.amount.exact]
+                else:
+                    cell[0] += 1
+                    cell[1] += entry.amount.exact
+
+            row_sums, column_sums, total = dict(), dict(), [0, 0]
+            for (row, column), (count, amount) in cells.items():
+                for sums in (row_sums.setdefault(row, [0, 0]), column_sums.setdefault(column, [0, 0]), total):
+                    sums[0] += count
+                    sums[1] += amount
+
+            self._cells, self._row_sums, self._column_sums, self._total = cells, row_sums, column_sums, total
+            self._row_labels, self._column_labels = None, None
+            probe.rows = total[0]
+
+    def _update(self, entry: Transaction, sign: int) -> None:
+        """Add the transaction to its cell, row and column (or remove it, with a negative sign)."""
+        if not all(fil(entry) for fil in self._filters):
+            return
+
+        amount = sign * entry.amount.exact
+        row, column = self.rows(entry), self.columns(entry)
+        for sums, key in ((self._cells, (row, column)), (self._row_sums, row), (self._column_sums, column)):
+            cell = sums.get(key)
+            if cell is None:
+                cell = sums[key] = [0, 0]
+                self._forget_labels(sums)
+            cell[0] += sign
+            cell[1] += amount
+            if cell[0] == 0:
+                del sums[key]
+                self._forget_labels(sums)
+        self._total[0] += sign
+        self._total[1] += amount
+
+    def _forget_labels(self, sums: dict) -> None:
+        """Sort the labels of the rows or the columns again, once a label appeared or vanished."""
+        if sums is self._row_sums:
+            self._row_labels = None
+        elif sums is self._column_sums:
+            self._column_labels = None
+
+    def _on_change(self, action: Action, changes: list[dict]) -> None:
+        if self._cells is None:
+            return  # Not built yet, nothing to update
+
+        with instruments.probe("pivot.update") as probe:
+            probe.rows = len(changes)
+            match action:
+                case Action.LOAD:
+                    self._cells = None  # Rebuilt on next use
+                case Action.COMMIT | Action.APPEND:
+                    for change in changes:
+                        if "old_value" in change:
+                            self._update(change["old_value"], -1)
+                        if change["action"] != "remove":
+                            self._update(change["value"], 1)
+                case Action.REVERT:
+                    for change in reversed(changes):
+                        if change["action"] != "remove":
+                            self._update(change["value"], -1)
+                        if "old_value" in change:
+                            self._update(change["old_value"], 1)
+
+
+def _measure(cell: list | None, measure: str) -> Money | float | int | None:
+    if cell is None or cell[0] == 0:
+        return None
+    match measure:
+        case "sum":
+            return Money.of_exact(cell[1])
+        case "count":
+            return cell[0]
+        case "average":
+            return cell[1] / cell[0] / 10 ** MAX_SCALE
+    raise ValueError(f"Unknown measure: {measure}")
+
+
+def format_value(value: Money | float | int | None, measure: str) -> str:
+    """Format a value of a pivot table: counts as integers, sums and averages with two decimals."""
+    if value is None:
+        return ""
+    if measure == "count":
+        return str(value)
+    return f"{value:.2f}"
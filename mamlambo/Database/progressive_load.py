@@ -0,0 +1,143 @@
+import queue
+import threading
+from typing import Callable, Iterable
+
+from mamlambo.Database.database import Database
+from mamlambo.Database.file_mark import FileMark
+from mamlambo.Diagnostics import instruments
+
+# The number of entries in the first chunk, enough to fill the first pages of a view
+FIRST_CHUNK = 2000
+
+# Every chunk is twice as large as the previous one, up to this many entries
+LARGEST_CHUNK = 262144
+
+
+class LoadCancelled(Exception):
+    """Raised in the parsing thread of a `ProgressiveLoad` that was cancelled, to stop reading the file."""
+
+
+class _ChunkQueue:
+    """Hands the parsed entries over to `ProgressiveLoad.poll` in growing chunks."""
+    def __init__(self, chunks: queue.Queue, cancelled: threading.Event, first: int, largest: int):
+        self._chunks = chunks
+        self._cancelled = cancelled
+        self._size = first
+        self._largest = largest
+        self._chunk = []
+
+    def extend(self, entries: Iterable) -> None:
+        for entry in entries:
+            self._chunk.append(entry)
+            if len(self._chunk) >= self._size:
+                self.flush()
+                self._size = min(2 * self._size, self._largest)
+
+    def flush(self) -> None:
+        if self._cancelled.is_set():
+            raise LoadCancelled()
+        if self._chunk:
+            self._chunks.put(("chunk", self._chunk))
+            self._chunk = []
+
+
+class ProgressiveLoad:
+    """
+    Loads a ledger into a `Database` chunk by chunk, so that its views can show the first pages
+    long before the whole file is parsed.
+
+    The file is parsed on a background thread, and the parsed chunks are appended to the database
+    by `poll`, on the thread that owns the database (e.g. the Tk main loop, which calls it periodically).
+    The views and the indices following the database merge every appended chunk (see `Action.APPEND`),
+    and sorting or filtering a view while it is loading applies to the entries loaded so far,
+    as well as to all the chunks still to come.
+
+    The chunks double in size, so that the first one arrives at once, while merging all of them into
+    a view costs about as much as sorting the whole ledger once.
+    """
+    def __init__(self, database: Database, filename: str, line_parser: Callable[[list[str]], object], /,
+                 delimiter: str = ',', first_chunk: int = FIRST_CHUNK, largest_chunk: int = LARGEST_CHUNK):
+        """
+        Empty the database and start parsing the file, see `Database.begin_load`.
+
+        :param database: The database to load the ledger into.
+        :param filename: The path to the ledger, a single file in any supported format.
+        :param line_parser: Parses the rows of the file to the database representation.
+        :param delimiter: The delimiter used in the CSV file.
+        :param first_chunk: The number of entries in the first chunk.
+        :param largest_chunk: The largest number of entries in a chunk.
+        :raises ValueError: If the file cannot be loaded progressively.
+        """
+        if first_chunk <= 0 or largest_chunk < first_chunk:
+            raise ValueError("The chunks must be positive and the largest one at least as large as the first one.")
+
+        self.database = database
+        self.path = database.begin_load(filename, line_parser, delimiter)
+        self.finished = False
+        self._chunks: queue.Queue = queue.Queue()
+        self._cancelled = threading.Event()
+        self._thread = threading.Thread(target=self._parse, args=(first_chunk, largest_chunk),
+                                        name="progressive-load", daemon=True)
+        self._thread.start()
+
+    def __len__(self):
+        """Return the number of entries loaded so far."""
+        return len(self.database)
+
+    def poll(self) -> bool:
+        """
+        Append the chunks parsed since the last poll to the database, at once.
+
+        :return: Whether the whole file was loaded.
+        :raises IOError: If the file could not be read; the entries loaded until then are kept.
+        :raises ValueError: If the file could not be parsed, e.g. a broken JSON file.
+        """
+        if self.finished:
+            return True
+
+        entries, outcome = [], None
+        while outcome is None:
+            try:
+                kind, payload = self._chunks.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "chunk":
+                entries.extend(payload)
+            else:
+                outcome = (kind, payload)
+
+        if entries:
+            with instruments.probe("database.load.append") as probe:
+                probe.rows = len(entries)
+                self.database.append_loaded(entries)
+        if outcome is None:
+            return False
+
+        self.finished = True
+        kind, payload = outcome
+        if kind == "error":
+            raise payload
+        self.database.end_load(self.path, payload)
+        return True
+
+    def cancel(self) -> None:
+        """Stop parsing the file, e.g. when another ledger is opened. The entries loaded until then are kept."""
+        self.finished = True
+        self._cancelled.set()
+
+    def _parse(self, first_chunk: int, largest_chunk: int) -> None:
+        sink = _ChunkQueue(self._chunks, self._cancelled, first_chunk, largest_chunk)
+        try:
+            mark: FileMark | None = self.database.read_ledger(self.path, sink)
+            sink.flush()
+        except LoadCancelled:
+            return
+        except (IOError, ValueError) as e:
+            self._chunks.put(("error", e))
+            return
+        except Exception as e:  # E.g. a JSON ledger that is not a list of objects, `poll` has to report it too
+            error = ValueError(f"The ledger {self.path} is malformed: {str(e)}")
+            error.__cause__ = e
+            self._chunks.put(("error", error))
+            return
+        self._chunks.put(("done", mark))
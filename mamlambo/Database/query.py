@@ -0,0 +1,264 @@
+import datetime
+import functools
+import operator
+from typing import Any, Callable, Iterable, Sequence
+
+from mamlambo.Transactions import Money, Transaction
+from mamlambo.Transactions.group import Group
+
+
+class Filter:
+    """
+    A structured filter over transactions, comparing a single property against a value.
+    Unlike a plain lambda, it can be inspected (e.g. to find out which dates it can match).
+    """
+    comparators: dict[str, Callable[[Any, Any], bool]] = {
+        ">": operator.gt,
+        "<": operator.lt,
+        "==": operator.eq,
+        ">=": operator.ge,
+        "<=": operator.le,
+        "!=": operator.ne,
+    }
+
+    # Maps the property names (as in `Transaction.value_names`) to the transaction's attributes
+    attributes: dict[str, str] = {
+        "Date": "date",
+        "Title": "title",
+        "Group": "group",
+        "Amount": "amount",
+        "Currency": "currency",
+        "Description": "description",
+    }
+
+    def __init__(self, prop: str, comparator: str, value: Any):
+        """
+        :param prop: The name of the compared property, one of `Transaction.value_names`.
+        :param comparator: One of the `Filter.comparators`.
+        :param value: The already parsed value to compare with.
+        """
+        if prop not in self.attributes:
+            raise ValueError("Unknown property!")
+        if comparator not in self.comparators:
+            raise ValueError(f"Unknown comparator: {comparator}")
+
+        self.prop = prop
+        self.comparator = comparator
+        self.value = value
+        self._getter = operator.attrgetter(self.attributes[prop])
+        self._operand = value
+        if prop == "Amount":
+            # Amounts are compared as integers, see `Money.exact`
+            self.value = value if isinstance(value, Money) else Money.parse(value)
+            self._getter = operator.attrgetter("amount.exact")
+            self._operand = self.value.exact
+        self._compare = self.comparators[comparator]
+
+    def __call__(self, entry: Transaction) -> bool:
+        return self._compare(self._getter(entry), self._operand)
+
+    def __repr__(self):
+        return f"Filter({self.prop!r}, {self.comparator!r}, {self.value!r})"
+
+
+class SortKey:
+    """
+    A sort key returning a single property of transactions. Unlike a plain lambda, it can be inspected,
+    so that a storage able to sort on its own (such as `SQLiteDatabase`) can do so instead of the view.
+    """
+    def __init__(self, prop: str):
+        """
+        :param prop: The name of the property to sort by, one of `Transaction.value_names`.
+        """
+        if prop not in Filter.attributes:
+            raise ValueError("Unknown property!")
+
+        self.prop = prop
+        # Groups are sorted by their names, compared as plain strings instead of by `Group.__lt__`,
+        # and amounts as plain integers instead of by `Money.__lt__`
+        attribute = {"Group": "group.name", "Amount": "amount.exact"}.get(prop, Filter.attributes[prop])
+        self.getter = operator.attrgetter(attribute)
+
+    def __call__(self, entry: Transaction) -> Any:
+        return self.getter(entry)
+
+    def __repr__(self):
+        return f"SortKey({self.prop!r})"
+
+
+@functools.total_ordering
+class _Descending:
+    """Wraps a value so that it compares in the reverse order, see `CompositeKey.__call__`."""
+    __slots__ = ("value",)
+
+    def __init__(self, value: Any):
+        self.value = value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+
+class CompositeKey:
+    """
+    A sort key of several properties, each in ascending or descending order, e.g. the group, then the date
+    from the newest, then the amount. Like `SortKey`, it can be inspected, so that a storage able to sort
+    on its own can do so instead of the view.
+
+    Sorting many entries at once (see `order`) never compares the entries through Python code: the values
+    of a descending property are negated if they are numbers, or replaced by their ranks among its distinct
+    values otherwise, so that the keys are tuples of values compared natively in ascending order.
+    """
+    def __init__(self, keys: Sequence[tuple[SortKey | str, bool]]):
+        """
+        :param keys: The properties (or their sort keys), most significant first, each with whether
+            it is sorted in descending order.
+        """
+        if not keys:
+            raise ValueError("A composite key needs at least one property.")
+        self.keys = [(SortKey(key) if isinstance(key, str) else key, bool(descending)) for key, descending in keys]
+
+    def __call__(self, entry: Transaction) -> tuple:
+        return tuple(_Descending(key(entry)) if descending else key(entry) for key, descending in self.keys)
+
+    def __repr__(self):
+        return f"CompositeKey({[(key.prop, descending) for key, descending in self.keys]!r})"
+
+    def order(self, indices: Sequence[int], columns: Sequence[list], reverse: bool = False) -> list[int]:
+        """
+        Sort the indices by the values of their entries, the same as `sorted(indices, key=..., reverse=reverse)`
+        would: entries with equal keys keep their order.
+
+        :param indices: The indices to sort.
+        :param columns: The values of every property of the key (in the order of `keys`), each in the order
+            of the indices.
+        :param reverse: Whether to reverse the order of every property.
+        """
+        if len(columns) == 1:
+            keys = columns[0]
+            descending = self.keys[0][1] != reverse
+            return [indices[j] for j in sorted(range(len(keys)), key=keys.__getitem__, reverse=descending)]
+
+        ascending = [_ascending(values) if descending != reverse else values
+                     for (_, descending), values in zip(self.keys, columns)]
+        keys = list(zip(*ascending))
+        return [indices[j] for j in sorted(range(len(keys)), key=keys.__getitem__)]
+
+
+def _ascending(values: list) -> list:
+    """Map the values to ones sorted in the opposite order: negated numbers, or descending ranks."""
+    if set(map(type, values)) <= {int, float}:
+        return list(map(operator.neg, values))
+    distinct = sorted(set(values), reverse=True)
+    ranks = dict(zip(distinct, range(len(distinct))))
+    return list(map(ranks.__getitem__, values))
+
+
+def as_composite(sort_key: Callable[[Transaction], Any]) -> CompositeKey | None:
+    """Return a structured sort key as a `CompositeKey`, or `None` for a plain function."""
+    if isinstance(sort_key, SortKey):
+        return CompositeKey([(sort_key, False)])
+    if isinstance(sort_key, CompositeKey):
+        return sort_key
+    return None
+
+
+def order_indices(indices: Sequence[int], entries: Sequence[Transaction], sort_key: Callable[[Transaction], Any],
+                  reverse: bool) -> list[int]:
+    """
+    Sort the indices by the keys of their entries (the entry of every index in the same order),
+    the same way as `sorted` would, see `CompositeKey.order`.
+    """
+    composite = as_composite(sort_key)
+    if composite is None:
+        keys = list(map(sort_key, entries))
+        return [indices[j] for j in sorted(range(len(keys)), key=keys.__getitem__, reverse=reverse)]
+    return composite.order(indices, [list(map(key.getter, entries)) for key, _ in composite.keys], reverse)
+
+
+def parse_filter(prop: str, expression: str) -> Filter:
+    """
+    Parse a filter as entered by the user, e.g. `prop="Amount", expression="> 50"`.
+
+    :param prop: The name of the filtered property, one of `Transaction.value_names`.
+    :param expression: The comparator and the compared value, separated by a space.
+    :return: The parsed filter.
+    :raises ValueError: If the expression or the value is not valid.
+    """
+    # Split the entered data by " ", first should be the comparator, second
+    # the compared value
+    entry_split = expression.split(" ", 1)
+    if len(entry_split) == 2:
+        comp = entry_split[0]
+        value = entry_split[1]
+    else:
+        raise ValueError("The entry field should only contain two items: comparator and value.")
+
+    # Depending on the property, validate the expected value
+    match prop:
+        case "Date":
+            parsed_value = Transaction.validate_date(value)
+        case "Title":
+            parsed_value = value
+        case "Group":
+            parsed_value = Group(value)
+        case "Amount":
+            parsed_value = Transaction.validate_amount(value)
+        case "Currency":
+            parsed_value = Transaction.validate_currency(value)
+        case "Description":
+            parsed_value = value
+        case _:
+            raise ValueError("Unknown property!")
+
+    return Filter(prop, comp, parsed_value)
+
+
+def parse_filter_text(text: str) -> Filter:
+    """
+    Parse a filter prefixed with its property, e.g. `Amount > 50`, as given on the command line or by a client.
+    The property name is case-insensitive, the rest follows the syntax of `parse_filter`.
+
+    :raises ValueError: If the text is not a valid filter.
+    """
+    parts = text.strip().split(" ", 1)
+    if len(parts) != 2:
+        raise ValueError(f"expected \"<Property> <comparator> <value>\", got \"{text}\"")
+    return parse_filter(parts[0].capitalize(), parts[1].strip())
+
+
+def date_bounds(filters: Iterable[Callable]) -> tuple[datetime.date | None, datetime.date | None]:
+    """
+    Find the closed date interval the filters can match, from the `Date` filters among them.
+    Filters of other kinds (including plain callables) do not restrict the interval.
+
+    :return: The first and the last date that can pass the filters, `None` if unbounded.
+    """
+    start, end = None, None
+    one_day = datetime.timedelta(days=1)
+
+    for fil in filters:
+        if not isinstance(fil, Filter) or fil.prop != "Date":
+            continue
+
+        low, high = None, None
+        match fil.comparator:
+            case ">":
+                low = fil.value + one_day
+            case ">=":
+                low = fil.value
+            case "<":
+                high = fil.value - one_day
+            case "<=":
+                high = fil.value
+            case "==":
+                low, high = fil.value, fil.value
+
+        if low is not None and (start is None or low > start):
+            start = low
+        if high is not None and (end is None or high < end):
+            end = high
+
+    return start, end
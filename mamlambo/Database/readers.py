@@ -0,0 +1,102 @@
+import csv
+import heapq
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Iterable, Iterator
+
+from mamlambo.Database.compression import ledger_format, open_text
+from mamlambo.Diagnostics import instruments
+
+
+def parse_rows[T](rows: Iterable[list[str]], line_parser: Callable[[list[str]], T]) -> list[T]:
+    """
+    Parse the rows of a ledger into a list of entries. Invalid rows are skipped, empty ones are ignored.
+
+    :param rows: The rows, e.g. from a CSV reader.
+    :param line_parser: Parses a row to the database representation.
+    """
+    return list(iter_parsed(rows, line_parser))
+
+
+def iter_parsed[T](rows: Iterable[list[str]], line_parser: Callable[[list[str]], T]) -> Iterator[T]:
+    """Parse the rows of a ledger one by one, see `parse_rows`. The parsed entries do not have to fit in memory."""
+    linecount = 1
+    for row in rows:
+        linecount += 1
+        if not row:
+            continue
+        try:
+            yield line_parser(row)
+        except ValueError as e:
+            instruments.count("database.load.invalid_rows")
+            print(f"Entry at line {linecount} will not be loaded, as it is not in a valid state:\n" +
+                  f"{str(e)}")
+
+
+def read_rows(filename: str, delimiter: str = ',') -> Iterator[list[str]]:
+    """
+    Read the rows of a CSV, JSON or JSON Lines ledger, each possibly compressed (see `open_ledger`).
+    CSV and JSON Lines ledgers are streamed row by row, a JSON ledger is read as a whole.
+
+    :param filename: The path to the ledger. A ledger without the format's extension is read as CSV.
+    :param delimiter: The delimiter used in a CSV file.
+    """
+    fmt = ledger_format(filename)[0] or ".csv"
+    with open_text(filename) as f:
+        match fmt:
+            case ".csv":
+                yield from csv.reader(f, delimiter=delimiter)
+            case ".json":
+                yield from (list(item.values()) for item in json.load(f))
+            case ".jsonl":
+                yield from (list(json.loads(line).values()) if line.strip() else [] for line in f)
+
+
+def read_sorted(filename: str, line_parser: Callable[[list[str]], Any], delimiter: str,
+                sort_key: Callable[[Any], Any]) -> list:
+    """
+    Parse a whole ledger and sort its entries. Runs in a worker process,
+    so all of the arguments have to be picklable (e.g. `Transaction.parse` and a `SortKey`).
+
+    :param filename: The path to the ledger, in any format supported by `read_rows`.
+    :param line_parser: Parses a row of the ledger to the database representation.
+    :param delimiter: The delimiter used in a CSV file.
+    :param sort_key: The key to sort the entries by.
+    :return: The sorted entries.
+    """
+    entries = parse_rows(read_rows(filename, delimiter), line_parser)
+    entries.sort(key=sort_key)  # Exported ledgers are usually sorted already, which makes this linear
+    return entries
+
+
+def merge_sorted(filenames: Iterable[str], line_parser: Callable[[list[str]], Any], sort_key: Callable[[Any], Any],
+                 delimiter: str = ',', workers: int = None) -> Iterator:
+    """
+    Parse several ledgers in parallel worker processes, each sorted on its own, and merge them
+    into a single sorted stream of entries. Entries with equal keys keep the order of the files.
+
+    :param filenames: The paths to the ledgers, in any format supported by `read_rows`.
+    :param line_parser: Parses a row of the ledgers to the database representation.
+    :param sort_key: The key to sort the entries by.
+    :param delimiter: The delimiter used in the CSV files.
+    :param workers: The number of worker processes, the number of CPUs by default.
+        With a single worker (or file), the ledgers are parsed in this process.
+    :return: An iterator over the entries of all ledgers, in sorted order.
+    """
+    filenames = [str(filename) for filename in filenames]
+    workers = min(len(filenames), workers or os.cpu_count() or 1)
+
+    with instruments.probe("database.merge.parse") as probe:
+        if workers <= 1:
+            parts = [read_sorted(filename, line_parser, delimiter, sort_key) for filename in filenames]
+        else:
+            # Spawned rather than forked, as the ledgers may be loaded from a thread (see `run_in_background`)
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+                count = len(filenames)
+                parts = list(pool.map(read_sorted, filenames, [line_parser] * count, [delimiter] * count,
+                                      [sort_key] * count))
+        probe.rows = sum(len(part) for part in parts)
+
+    return heapq.merge(*parts, key=sort_key)
@@ -0,0 +1,496 @@
+import sqlite3
+from collections import deque
+from itertools import islice
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator
+
+from mamlambo.Database.compression import ledger_format
+from mamlambo.Database.database import write_entries
+from mamlambo.Database.query import Filter, as_composite
+from mamlambo.Database.duplicates import DuplicateIndex, ImportReport, schedule_import
+from mamlambo.Database.readers import read_rows
+from mamlambo.Diagnostics import instruments
+from mamlambo.Enums.enums import Action, DuplicatePolicy
+from mamlambo.Transactions import Money, Transaction
+from mamlambo.Transactions.money import currency_scale
+
+# The extensions of the files opened as SQLite databases
+SQLITE_SUFFIXES = (".sqlite", ".sqlite3", ".db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transactions (
+    id INTEGER PRIMARY KEY,
+    date TEXT NOT NULL,
+    title TEXT NOT NULL,
+    group_name TEXT NOT NULL,
+    amount INTEGER NOT NULL,
+    currency TEXT NOT NULL,
+    description TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS transactions_date ON transactions (date);
+CREATE INDEX IF NOT EXISTS transactions_group ON transactions (group_name);
+CREATE INDEX IF NOT EXISTS transactions_currency ON transactions (currency);
+CREATE INDEX IF NOT EXISTS transactions_amount ON transactions (amount);
+CREATE INDEX IF NOT EXISTS transactions_title ON transactions (title);
+"""
+
+
+class QueryResult:
+    """
+    The indices of the entries passing a query, in the query's order. Nothing is fetched up front:
+    the length is counted once, and the indices are read page by page with LIMIT and OFFSET.
+    """
+    def __init__(self, connection: sqlite3.Connection, where: str, params: list[Any], order: str):
+        self._connection = connection
+        self._where = where
+        self._params = params
+        self._order = order
+        self._length: int | None = None
+
+    def __len__(self):
+        if self._length is None:
+            self._length = self._connection.execute(
+                f"SELECT COUNT(*) FROM transactions{self._where}", self._params).fetchone()[0]
+        return self._length
+
+    def __iter__(self) -> Iterator[int]:
+        cursor = self._connection.execute(f"SELECT id FROM transactions{self._where}{self._order}", self._params)
+        return (row[0] for row in cursor)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            start, stop, step = item.indices(len(self))
+            if step != 1:
+                return list(islice(self[start:stop], None, None, step))
+            return self._page(start, max(stop - start, 0))
+
+        index = item + len(self) if item < 0 else item
+        if not 0 <= index < len(self):
+            raise IndexError("query result index out of range")
+        return self._page(index, 1)[0]
+
+    def _page(self, offset: int, limit: int) -> list[int]:
+        with instruments.probe("database.sqlite.page") as probe:
+            cursor = self._connection.execute(
+                f"SELECT id FROM transactions{self._where}{self._order} LIMIT ? OFFSET ?",
+                self._params + [limit, offset])
+            page = [row[0] for row in cursor]
+            probe.rows = len(page)
+        return page
+
+
+class SQLiteDatabase[T]:
+    """
+    A storage engine keeping the entries in an SQLite database instead of memory, with the same
+    interface as `Database`. Opening a ledger reads nothing up front, so even ledgers larger than memory
+    open instantly: the views let the database filter and sort by the structured filters and sort keys
+    (`Filter` and `SortKey`) in SQL, and read only the page of entries they show.
+
+    An entry's index is its row id, which never changes. Scheduled changes are applied in a single SQL
+    transaction by `commit` and undone in another one by `revert`, so the file always contains whole commits.
+    A database that was not opened from a file keeps its entries in an in-memory SQLite database.
+    """
+    columns = ("date", "title", "group_name", "amount", "currency", "description")
+
+    # Maps the properties of `Filter` and `SortKey` to the columns
+    properties = dict(zip(Transaction.value_names, columns))
+
+    comparators = {">": ">", "<": "<", "==": "=", ">=": ">=", "<=": "<=", "!=": "!="}
+
+    def __init__(self, line_parser: Callable[[list[str]], T] = Transaction.parse):
+        """
+        :param line_parser: Parses a row of the database to the database representation, see `Transaction.parse`.
+        """
+        self._connection: sqlite3.Connection | None = None
+        self._filename: Path | None = None  # The file the database is stored in, None if in memory
+        self._line_parser = line_parser
+        self._commits = []
+        self._history = deque(maxlen=10)
+        self._length: int | None = None  # The cached number of entries
+        self._version = 0  # Increased by every change of the entries
+        self._saved_version = -1  # The version that was last saved or loaded
+        self._subscribers: list[Callable[[Action, list[dict]], None]] = []
+        self._duplicates: DuplicateIndex | None = None  # Created by the first import
+
+    def __len__(self):
+        """Return the number of entries in the database."""
+        if self._length is None:
+            self._length = self._connect().execute("SELECT COUNT(*) FROM transactions").fetchone()[0]
+        return self._length
+
+    def __iter__(self) -> Iterator[T]:
+        """Return an iterator over the entries in the database, in the order they were added."""
+        cursor = self._connect().execute(f"SELECT {', '.join(self.columns)} FROM transactions ORDER BY id")
+        return (self._parse_row(row) for row in cursor)
+
+    def __getitem__(self, index: int) -> T:
+        """Return the entry with the specified index (row id)."""
+        row = self._connect().execute(
+            f"SELECT {', '.join(self.columns)} FROM transactions WHERE id = ?", (index,)).fetchone()
+        if row is None:
+            raise IndexError(f"No entry with index {index}.")
+        return self._parse_row(row)
+
+    def _parse_row(self, row: tuple) -> T:
+        """Parse a row of the table, whose amount is stored exactly, as its units of `MAX_SCALE` (see `Money.exact`)."""
+        values = list(row)
+        values[3] = str(Money.of_exact(values[3], currency_scale(values[4])))
+        return self._line_parser(values)
+
+    @staticmethod
+    def _row(entry: T) -> list:
+        """Return the values of the entry's columns, see `_parse_row`."""
+        values = entry.dump()
+        values[3] = entry.amount.exact
+        return values
+
+    def load(self, filename: str, line_parser: Callable[[list[str]], T], /, delimiter: str = ',') -> None:
+        """
+        Open an SQLite database, creating it if it does not exist, or import a CSV, JSON or JSON Lines file
+        (possibly compressed, see `open_ledger`) into the database, replacing all of its entries.
+        Opening a database does not read any entries.
+
+        :param filename: The path to the SQLite database or the imported file.
+        :param line_parser: Parses a row of the file to the database representation.
+        :param delimiter: The delimiter used in the CSV file.
+        """
+        path = Path(filename)
+        suffix = path.suffix.lower()
+        if suffix not in SQLITE_SUFFIXES and ledger_format(path)[0] is None:
+            raise ValueError("Only SQLite databases and CSV, JSON and JSON Lines files are supported.")
+
+        self._line_parser = line_parser
+        self._commits = []
+        self._history = deque(maxlen=10)
+        self._length = None
+
+        if suffix in SQLITE_SUFFIXES:
+            self._open(path)
+        else:
+            connection = self._connect()
+            with instruments.probe("database.sqlite.import") as probe, connection:
+                connection.execute("DELETE FROM transactions")
+                cursor = connection.executemany(self._insert_sql(), self._read_rows(path, delimiter))
+                probe.rows = cursor.rowcount
+
+        self._version += 1
+        self._saved_version = self._version
+        self._notify(Action.LOAD, [])
+
+    def _read_rows(self, filename: Path, delimiter: str) -> Iterator[list[str]]:
+        """Parse the file row by row, yielding the validated rows. Invalid lines are skipped, empty ones ignored."""
+        linecount = 1
+        for row in read_rows(str(filename), delimiter):
+            linecount += 1
+            if not row:
+                continue
+            try:
+                yield self._row(self._line_parser(row))
+            except ValueError as e:
+                instruments.count("database.load.invalid_rows")
+                print(f"Entry at line {linecount} will not be loaded, as it is not in a valid state:\n" +
+                      f"{str(e)}")
+
+    def _open(self, path: Path) -> None:
+        """Open the SQLite database in the file, closing the current one."""
+        self.close()
+        with instruments.probe("database.sqlite.open"):
+            # The database may be loaded in a background thread and used in the Tk thread afterwards
+            self._connection = sqlite3.connect(path, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode = WAL")
+            self._connection.executescript(SCHEMA)
+            types = {column[1]: column[2] for column in self._connection.execute("PRAGMA table_info(transactions)")}
+            if types.get("amount") != "INTEGER":
+                self.close()
+                raise ValueError(f"The amounts in {path.name} are not stored exactly, export the ledger to CSV "
+                                 f"with the version that created it and import it again.")
+        self._filename = path
+
+    def _connect(self) -> sqlite3.Connection:
+        """Return the connection to the database, creating an in-memory database if none was opened."""
+        if self._connection is None:
+            self._connection = sqlite3.connect(":memory:", check_same_thread=False)
+            self._connection.executescript(SCHEMA)
+        return self._connection
+
+    def close(self) -> None:
+        """Close the connection to the database. Committed changes are already stored in its file."""
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+            self._filename = None
+
+    def dump(self, filename: Path, /, delimiter: str = ',') -> None:
+        """
+        Dump the database into another SQLite database, or export it into a CSV, JSON or JSON Lines file
+        (possibly compressed, see `write_entries`).
+        Dumping into the database's own file does nothing, as every commit is already stored there.
+
+        :param filename: The path to the file to write to.
+        :param delimiter: The delimiter to use in the CSV file.
+        """
+        path = Path(filename)
+        if path.suffix.lower() in SQLITE_SUFFIXES:
+            if self._filename is None or path.resolve() != self._filename.resolve():
+                with instruments.probe("database.sqlite.backup") as probe:
+                    target = sqlite3.connect(path)
+                    try:
+                        self._connect().backup(target)
+                    finally:
+                        target.close()
+                    probe.rows = len(self)
+        else:
+            write_entries(self, path, delimiter)
+        self._saved_version = self._version
+
+    def candidate_indices(self, filters: list[Callable[[T], bool]]) -> Iterable[int]:
+        """
+        Return the indices of all entries that can pass the filters. The structured filters are
+        evaluated by SQL, any other filters are left to the caller.
+        """
+        where, params = self._where(filters)
+        return [row[0] for row in self._connect().execute(f"SELECT id FROM transactions{where} ORDER BY id", params)]
+
+    def query(self, filters: list[Callable[[T], bool]], sort_key: Callable[[T], Any],
+              reverse: bool) -> QueryResult | None:
+        """
+        Filter and sort the entries in SQL, if all the filters are `Filter`s and the sort key is a `SortKey`
+        or a `CompositeKey`.
+        Entries with equal keys keep the order they were added in, the same as when sorted by the view.
+
+        :return: The lazily fetched indices of the entries in the sorted order, or `None` if the view
+            has to filter and sort the entries itself.
+        """
+        order = self._order(sort_key, reverse)
+        if order is None or not all(isinstance(fil, Filter) for fil in filters):
+            return None
+
+        where, params = self._where(filters)
+        return QueryResult(self._connect(), where, params, order)
+
+    def read_entries(self, filters: list[Callable[[T], bool]], sort_key: Callable[[T], Any] = None,
+                     reverse: bool = False) -> list[T]:
+        """
+        Read the entries passing the filters with a single query, e.g. to compute statistics in the background.
+        A database stored in a file is read on a connection of its own, so that a background thread can read it
+        while the database keeps being used, and a commit made meanwhile is either seen whole or not at all.
+
+        :param sort_key: Sorts the entries, in SQL if it is a `SortKey` or a `CompositeKey`, see `query`.
+            The entries are in the order they were added without one.
+        """
+        where, params = self._where(filters)
+        order = " ORDER BY id" if sort_key is None else self._order(sort_key, reverse)
+        others = [fil for fil in filters if not isinstance(fil, Filter)]
+        if self._filename is None:
+            connection = self._connect()
+        else:
+            connection = sqlite3.connect(f"{self._filename.resolve().as_uri()}?mode=ro", uri=True)
+        try:
+            with instruments.probe("database.sqlite.read") as probe:
+                cursor = connection.execute(
+                    f"SELECT {', '.join(self.columns)} FROM transactions{where}{order or ' ORDER BY id'}", params)
+                entries = [entry for entry in map(self._parse_row, cursor) if all(fil(entry) for fil in others)]
+                probe.rows = len(entries)
+        finally:
+            if connection is not self._connection:
+                connection.close()
+
+        if order is None:
+            entries.sort(key=sort_key, reverse=reverse)
+        return entries
+
+    def _order(self, sort_key: Callable[[T], Any], reverse: bool) -> str | None:
+        """Translate a `SortKey` or a `CompositeKey` to an SQL ORDER BY clause, `None` for any other key."""
+        composite = as_composite(sort_key)
+        if composite is None:
+            return None
+        columns = [f"{self.properties[key.prop]}{' DESC' if descending != reverse else ''}"
+                   for key, descending in composite.keys]
+        return f" ORDER BY {', '.join(columns)}, id"
+
+    def _where(self, filters: list[Callable[[T], bool]]) -> tuple[str, list[Any]]:
+        """Translate the structured filters among the given ones to an SQL WHERE clause and its parameters."""
+        clauses = []
+        params = []
+        for fil in filters:
+            if not isinstance(fil, Filter):
+                continue
+            clauses.append(f"{self.properties[fil.prop]} {self.comparators[fil.comparator]} ?")
+            # Dates and groups are stored as their text, the same as in CSV, and amounts exactly, see `_row`
+            if isinstance(fil.value, Money):
+                params.append(fil.value.exact)
+            else:
+                params.append(fil.value if isinstance(fil.value, (int, float)) else str(fil.value))
+
+        if not clauses:
+            return "", params
+        return " WHERE " + " AND ".join(clauses), params
+
+    def commit(self):
+        """Apply all pending commits in a single SQL transaction and store them in history."""
+        commit_data = []
+        connection = self._connect()
+        with instruments.probe("database.commit") as probe, connection:
+            for commit in self._commits:
+                commit_data.append(self._handle_commit(connection, commit))
+            probe.rows = len(commit_data)
+
+        self._history.appendleft(commit_data)
+        self._commits = []
+        self._changed()
+        self._notify(Action.COMMIT, commit_data)
+
+    def revert(self):
+        """Revert the last commit in a single SQL transaction."""
+        if not self._history:
+            raise Exception("No commit to revert.")
+        last_commit_data = self._history[0]
+
+        connection = self._connect()
+        with instruments.probe("database.revert") as probe, connection:
+            for commit in reversed(last_commit_data):
+                self._undo_commit(connection, commit)
+            probe.rows = len(last_commit_data)
+
+        self._history.popleft()
+        self._changed()
+        self._notify(Action.REVERT, last_commit_data)
+
+    def _handle_commit(self, connection: sqlite3.Connection, commit: dict) -> dict:
+        """
+        Handle a single commit action.
+
+        :param commit: A dictionary representing the commit to handle.
+        :return: The processed commit dictionary with additional information.
+        """
+        match commit["action"]:
+            case "add":
+                commit["index"] = connection.execute(self._insert_sql(), self._row(commit["value"])).lastrowid
+
+            case "remove":
+                commit["old_value"] = self[commit["index"]]
+                connection.execute("DELETE FROM transactions WHERE id = ?", (commit["index"],))
+
+            case "update":
+                commit["old_value"] = self[commit["index"]]
+                connection.execute(self._update_sql(), self._row(commit["value"]) + [commit["index"]])
+
+        return commit
+
+    def _undo_commit(self, connection: sqlite3.Connection, commit: dict) -> None:
+        """
+        Undo a single commit action. A removed entry gets its original index back.
+
+        :param commit: A dictionary representing the commit to undo.
+        """
+        match commit["action"]:
+            case "add":
+                connection.execute("DELETE FROM transactions WHERE id = ?", (commit["index"],))
+
+            case "remove":
+                connection.execute(f"INSERT INTO transactions (id, {', '.join(self.columns)}) "
+                                   f"VALUES (?, {', '.join('?' * len(self.columns))})",
+                                   [commit["index"]] + self._row(commit["old_value"]))
+
+            case "update":
+                connection.execute(self._update_sql(), self._row(commit["old_value"]) + [commit["index"]])
+
+    def _insert_sql(self) -> str:
+        return f"INSERT INTO transactions ({', '.join(self.columns)}) VALUES ({', '.join('?' * len(self.columns))})"
+
+    def _update_sql(self) -> str:
+        return f"UPDATE transactions SET {', '.join(c + ' = ?' for c in self.columns)} WHERE id = ?"
+
+    def _changed(self) -> None:
+        """Record a change of the entries. A database stored in a file is saved by every commit."""
+        self._length = None
+        self._version += 1
+        if self._filename is not None:
+            self._saved_version = self._version
+
+    def get_history(self):
+        """Return the history of commits."""
+        return self._history
+
+    def get_commits(self):
+        """Return the list of pending commits."""
+        return self._commits
+
+    def is_saved(self) -> bool:
+        """Return whether the database was saved (or loaded) since its last commit or revert."""
+        return self._saved_version == self._version
+
+    def get_version(self) -> int:
+        """Return the version of the entries, increased by every load, commit and revert."""
+        return self._version
+
+    def subscribe(self, callback: Callable[[Action, list[dict]], None]) -> None:
+        """Subscribe a callback to the database's change stream, see `Database.subscribe`."""
+        if callback not in self._subscribers:
+            self._subscribers.append(callback)
+
+    def unsubscribe(self, callback: Callable[[Action, list[dict]], None]) -> None:
+        """Remove a callback from the change stream."""
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+
+    def _notify(self, action: Action, changes: list[dict]) -> None:
+        """Call all subscribers of the change stream."""
+        for callback in list(self._subscribers):
+            callback(action, changes)
+
+    def import_entries(self, entries: Iterable[T],
+                       policy: DuplicatePolicy = DuplicatePolicy.SKIP_EXACT) -> ImportReport:
+        """
+        Schedule the transactions to be added, detecting the duplicates of the committed ones, e.g. when
+        importing a bank export that overlaps with the database. After the first import, which indexes
+        the database, an import takes time proportional to the number of the imported transactions.
+
+        :param entries: The transactions to import.
+        :param policy: Which duplicates to skip, see `DuplicatePolicy`.
+        :return: The report of the scheduled transactions and the detected duplicates.
+        """
+        if self._duplicates is None:
+            self._duplicates = DuplicateIndex(self)
+        return schedule_import(self, self._duplicates, entries, policy)
+
+    def add(self, transaction: T):
+        """
+        Schedule a transaction to be added to the database.
+
+        :param transaction: The Transaction object to add.
+        """
+        commit = {
+            "action": "add",
+            "value": transaction
+        }
+        self._commits.append(commit)
+        self._notify(Action.PUSH, [commit])
+
+    def edit(self, index: int, transaction: T):
+        """
+        Schedule a transaction to be updated in the database.
+
+        :param index: The index of the transaction to update.
+        :param transaction: The new Transaction object to replace the old one.
+        """
+        commit = {
+            "action": "update",
+            "index": index,
+            "value": transaction
+        }
+        self._commits.append(commit)
+        self._notify(Action.PUSH, [commit])
+
+    def remove(self, index: int):
+        """
+        Schedule a transaction to be removed from the database by index.
+
+        :param index: The index of the transaction to remove.
+        """
+        commit = {
+            "action": "remove",
+            "index": index
+        }
+        self._commits.append(commit)
+        self._notify(Action.PUSH, [commit])
@@ -0,0 +1,323 @@
+import datetime
+import math
+import random
+from collections import Counter
+from typing import Callable, Iterable, Sequence
+
+from mamlambo.Database.database import Database
+from mamlambo.Database.partition import PartitionSummary
+from mamlambo.Database.query import Filter, date_bounds
+from mamlambo.Database.storage import Storage
+from mamlambo.Diagnostics import instruments
+from mamlambo.Transactions import Money, Transaction
+from mamlambo.Transactions.money import MAX_SCALE, currency_scale
+
+# The number of transactions sampled for a preview of the statistics, and the number of date ranges (strata)
+# the sample is spread over, see `sample_statistics`
+SAMPLE_SIZE = 5000
+SAMPLE_STRATA = 50
+
+# The z-score of the error bounds of the sampled statistics, for a 95 % confidence interval
+CONFIDENCE_Z = 1.96
+
+# The comparators of the date filters that bound the date range, so that `partition_statistics` can use
+# the summaries of the partitions within the range
+DATE_BOUNDS = ("<", "<=", ">", ">=", "==")
+
+
+def unzip(l: list):
+    """Unzips the list of tuples to two lists."""
+    if len(l) == 0:
+        return [], []
+
+    unzipped = list(zip(*l))
+    return list(unzipped[0]), list(unzipped[1])
+
+
+def init_dicts():
+    data = {
+        "max": (-math.inf, None),
+        "min": (math.inf, None),
+        "avg": 0.0,
+        "min_date": None,
+        "max_date": None,
+        "currency": None,
+        "currencies": set(),
+        "approximate": False,  # Whether the statistics were estimated from a sample, see `sample_statistics`
+        "margins": dict(),
+    }
+    group_data = {
+        "incomes": Counter(),
+        "expenses": Counter()
+    }
+    return data, group_data
+
+
+def compute_statistics(transactions: Iterable[Transaction]):
+    """
+    Runs through the transactions, collecting the statistics shown in the statistics window.
+    The transactions should be in a single currency and sorted by date, ascending, for the balance to make sense.
+
+    The amounts are summed exactly, as integers (see `Money.exact`), so the sums of the groups are `Money`
+    as well, while the average and the balance in time (which is plotted) are floats.
+
+    :return: A tuple of the overall data (extremes, average, date range and currencies), the sums of incomes
+        and expenses by group, and the balance in time.
+    """
+    data, group_data = init_dicts()
+    dates_totals: list[tuple[datetime.date, int]] = []
+    total_balance = 0
+    count = 0
+    highest, lowest = -math.inf, math.inf
+
+    with instruments.probe("statistics.compute") as probe:
+        for curr_transaction in transactions:
+            amount = curr_transaction.amount.exact
+            count += 1
+
+            if amount > highest:
+                highest = amount
+                data["max"] = (curr_transaction.amount, curr_transaction.title)
+            elif amount < lowest:
+                lowest = amount
+                data["min"] = (curr_transaction.amount, curr_transaction.title)
+
+            if amount > 0:
+                group_data["incomes"][curr_transaction.group.name] += amount
+            elif amount < 0:
+                # Subtracting so that the Counter returns the group with the biggest expenses first
+                group_data["expenses"][curr_transaction.group.name] -= amount
+
+            if data["min_date"] is None or data["min_date"] > curr_transaction.date:
+                data["min_date"] = curr_transaction.date
+            if data["max_date"] is None or data["max_date"] < curr_transaction.date:
+                data["max_date"] = curr_transaction.date
+
+            if data["currency"] is None:
+                data["currency"] = curr_transaction.currency
+            data["currencies"].add(curr_transaction.currency)
+
+            total_balance += amount
+            dates_totals.append((curr_transaction.date, total_balance))
+
+        if count != 0:
+            data["avg"] = total_balance / count / 10 ** MAX_SCALE
+        probe.rows = count
+
+    scale = currency_scale(data["currency"])
+    for kind in ("incomes", "expenses"):
+        group_data[kind] = Counter({group: Money.of_exact(value, scale) for group, value in group_data[kind].items()})
+    # Convert the data in time to the required representation
+    time_data = get_time_data([(day, total / 10 ** MAX_SCALE) for day, total in dates_totals])
+
+    return data, group_data, time_data
+
+
+def sample_statistics(transactions: Sequence[Transaction], size: int = SAMPLE_SIZE, strata: int = SAMPLE_STRATA,
+                      seed: int | None = None):
+    """
+    Estimate the statistics of `compute_statistics` from a stratified sample of the transactions,
+    reading only a few thousand of them however many there are.
+
+    The transactions (sorted by date, as for `compute_statistics`) are split into strata of consecutive
+    positions, i.e. date ranges, and the same share of every stratum is sampled at random. The sums are
+    estimated by weighting every sampled amount by the size of its stratum over the size of its sample,
+    so the balance over time follows the whole date range. Their error bounds (a 95 % confidence interval)
+    come from the variance of the amounts within every stratum.
+
+    :param transactions: The transactions, with random access by position (e.g. a `DatabaseView`).
+    :param size: The number of transactions to sample. Fewer transactions are not sampled, but computed exactly.
+    :param strata: The number of date ranges to sample from.
+    :param seed: The seed of the random choice of the sampled transactions.
+    :return: The same data as `compute_statistics`, with `data["approximate"]` set. `data["margins"]` holds
+        the error bounds of the `balance` and the `avg`, and the `incomes` and `expenses` Counters in
+        `group_data["margins"]` hold the bounds of every group. The extremes are those of the sample.
+    """
+    count = len(transactions)
+    if count <= size:
+        return compute_statistics(transactions)
+
+    rng = random.Random(seed)
+    data, group_data = init_dicts()
+    group_margins = {"incomes": Counter(), "expenses": Counter()}  # The variances, until the end
+    dates_totals: list[tuple[datetime.date, float]] = []
+    total_balance = 0.0
+    total_variance = 0.0
+    strata = max(1, min(strata, size // 2))
+    bounds = [count * stratum // strata for stratum in range(strata + 1)]
+
+    with instruments.probe("statistics.sample") as probe:
+        for start, end in zip(bounds, bounds[1:]):
+            population = end - start
+            sampled = max(2, min(population, round(size * population / count)))
+            weight = population / sampled
+            # The variance of a sum of the stratum, the finite population correction included
+            scale = population * population * (1 - sampled / population) / sampled
+
+            sample = [transactions[i] for i in sorted(rng.sample(range(start, end), sampled))]
+            sums = {"incomes": Counter(), "expenses": Counter()}  # The sums and the sums of squares of every group
+            squares = {"incomes": Counter(), "expenses": Counter()}
+            amounts_sum = amounts_squares = 0.0
+            for transaction in sample:
+                amount = float(transaction.amount)  # The estimates are weighted, so they are not exact anyway
+                amounts_sum += amount
+                amounts_squares += amount * amount
+                if amount > data["max"][0]:
+                    data["max"] = (transaction.amount, transaction.title)
+                if amount < data["min"][0]:
+                    data["min"] = (transaction.amount, transaction.title)
+                if amount != 0:
+                    kind = "incomes" if amount > 0 else "expenses"
+                    sums[kind][transaction.group.name] += abs(amount)
+                    squares[kind][transaction.group.name] += amount * amount
+
+                if data["currency"] is None:
+                    data["currency"] = transaction.currency
+                data["currencies"].add(transaction.currency)
+                total_balance += weight * amount
+                dates_totals.append((transaction.date, total_balance))
+
+            total_variance += scale * _variance(amounts_sum, amounts_squares, sampled)
+            for kind in ("incomes", "expenses"):
+                for group, value in sums[kind].items():
+                    group_data[kind][group] += weight * value
+                    group_margins[kind][group] += scale * _variance(value, squares[kind][group], sampled)
+        probe.rows = len(dates_totals)
+
+    # The dates span the whole range, so they are read exactly
+    data["min_date"], data["max_date"] = transactions[0].date, transactions[count - 1].date
+    data["avg"] = total_balance / count
+    data["approximate"] = True
+    balance_margin = CONFIDENCE_Z * math.sqrt(total_variance)
+    data["margins"] = {"balance": balance_margin, "avg": balance_margin / count}
+    group_data["margins"] = {kind: Counter({group: CONFIDENCE_Z * math.sqrt(variance)
+                                            for group, variance in variances.items()})
+                             for kind, variances in group_margins.items()}
+    return data, group_data, get_time_data(dates_totals)
+
+
+def _variance(total: float, squares: float, count: int) -> float:
+    """Return the sample variance of values given by their count, sum and sum of squares."""
+    if count < 2:
+        return 0.0
+    return max(0.0, (squares - total * total / count) / (count - 1))
+
+
+def get_time_data(totals_dates: list[tuple[datetime.date, float]]):
+    # Converts the list of tuples to a dictionary
+    time_data = {
+        "totals": [],
+        "dates": []
+    }
+
+    dates, totals = unzip(totals_dates)
+    time_data["dates"] = dates
+    time_data["totals"] = totals
+    return time_data
+
+
+def prepare_pie_data(data: Counter, n=4):
+    # Selects up to `n` largest groups from the data, putting the rest in a category called "Rest"
+    rest_sum = None
+
+    if len(data) > n:
+        n_largest_incomes = data.most_common()[:n]
+        rest_sum = sum(map(lambda x: x[1], data.most_common()[n:]))
+    else:
+        n_largest_incomes = data.most_common()
+
+    group_name, group_value = unzip(n_largest_incomes)
+    if rest_sum is not None:
+        group_value.append(rest_sum)
+        group_name.append("Rest")
+
+    return group_value, group_name
+
+
+def partition_statistics(database: Storage, filters: list[Callable[[Transaction], bool]]) -> PartitionSummary:
+    """
+    Compute the summary of the transactions passing the filters, per currency.
+
+    For a partitioned database, the precomputed summaries of the partitions that lie completely within
+    the filtered date range are combined without touching their entries (or loading them at all).
+    Only the partitions at the boundaries of the range are scanned. This works as long as the filters
+    only bound the date (`!=` does not, see `date_bounds`) and choose the currency; with any other filter,
+    all candidate entries are scanned.
+    """
+    start, end = date_bounds(filters)
+    currencies = {fil.value for fil in filters
+                  if isinstance(fil, Filter) and fil.prop == "Currency" and fil.comparator == "=="}
+    summarizable = all(isinstance(fil, Filter) and
+                       ((fil.prop == "Date" and fil.comparator in DATE_BOUNDS) or
+                        (fil.prop == "Currency" and fil.comparator == "=="))
+                       for fil in filters)
+
+    result = PartitionSummary()
+    if len(currencies) > 1:
+        return result  # All the filters have to pass, and a transaction has a single currency
+    with instruments.probe("statistics.partitions") as probe:
+        if isinstance(database, Database) and database.is_partitioned() and summarizable:
+            scanned = []
+            for partition in database.partitions():
+                if not partition.summary.overlaps(start, end):
+                    continue
+                if partition.summary.within(start, end):
+                    result.merge(_restrict(partition.summary, currencies))
+                else:
+                    scanned.append(partition)
+
+            database.load_partitions(scanned)
+            candidates = (i for partition in scanned for i in partition.indices)
+        else:
+            candidates = database.candidate_indices(filters)
+
+        for i in candidates:
+            entry = database[i]
+            if all(fil(entry) for fil in filters):
+                result.add(entry)
+                probe.rows += 1
+
+    return result
+
+
+def statistics_report(summary: PartitionSummary) -> dict:
+    """
+    Convert the summary of the transactions into a report of statistics for every currency.
+
+    :return: A dictionary keyed by currency, JSON-serializable with `default=str`, which writes the dates
+        and the exact amounts (`Money`) as text.
+    """
+    report = dict()
+    for name, currency in sorted(summary.currencies.items()):
+        scale = currency_scale(name)
+        report[name] = {
+            "count": currency.count,
+            "balance": Money.of_exact(currency.total, scale),
+            "average": currency.total / currency.count / 10 ** MAX_SCALE,
+            "maximum": {"amount": currency.max[0], "title": currency.max[1]},
+            "minimum": {"amount": currency.min[0], "title": currency.min[1]},
+            "incomes": {group: Money.of_exact(value, scale) for group, value in currency.incomes.most_common()},
+            "expenses": {group: Money.of_exact(value, scale) for group, value in currency.expenses.most_common()},
+        }
+
+    return {
+        "from": summary.min_date,
+        "to": summary.max_date,
+        "currencies": report
+    }
+
+
+def _restrict(summary: PartitionSummary, currencies: set[str]) -> PartitionSummary:
+    """Return the summary limited to the given currency (all of them if empty)."""
+    if not currencies:
+        return summary
+
+    restricted = PartitionSummary()
+    for name, currency in summary.currencies.items():
+        if name in currencies:
+            restricted.currencies[name] = currency
+            restricted.count += currency.count
+    if restricted.count > 0:
+        # The exact dates of the currency's transactions are not known, the partition's range is used instead
+        restricted.min_date, restricted.max_date = summary.min_date, summary.max_date
+    return restricted
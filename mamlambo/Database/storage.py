@@ -0,0 +1,91 @@
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator, Protocol, Sequence
+
+from mamlambo.Database.database import Database
+from mamlambo.Database.duplicates import ImportReport
+from mamlambo.Database.sqlite_database import SQLITE_SUFFIXES, SQLiteDatabase
+from mamlambo.Enums.enums import Action, DuplicatePolicy
+
+
+class Storage[T](Protocol):
+    """
+    The interface a storage engine provides to the views over it. `Database` keeps the entries in memory
+    and persists them as whole files, `SQLiteDatabase` keeps them in an SQLite file.
+
+    Every entry is identified by an index, which the views keep and pass back to `__getitem__`, `edit`
+    and `remove`. Changes are scheduled by `add`, `edit` and `remove` and applied all at once by `commit`,
+    and every change is reported to the subscribers of the change stream, see `Database.subscribe`.
+    """
+    def __len__(self) -> int: ...
+
+    def __iter__(self) -> Iterator[T]: ...
+
+    def __getitem__(self, index: int) -> T: ...
+
+    def load(self, filename: str, line_parser: Callable[[list[str]], T], /, delimiter: str = ',') -> None: ...
+
+    def dump(self, filename: Path, /, delimiter: str = ',') -> None: ...
+
+    def add(self, transaction: T) -> None: ...
+
+    def edit(self, index: int, transaction: T) -> None: ...
+
+    def remove(self, index: int) -> None: ...
+
+    def import_entries(self, entries: Iterable[T],
+                       policy: DuplicatePolicy = DuplicatePolicy.SKIP_EXACT) -> ImportReport:
+        """Schedule the transactions to be added, detecting the duplicates of the committed ones."""
+        ...
+
+    def commit(self) -> None: ...
+
+    def revert(self) -> None: ...
+
+    def get_commits(self) -> list[dict]: ...
+
+    def get_history(self) -> Sequence[list[dict]]: ...
+
+    def is_saved(self) -> bool: ...
+
+    def get_version(self) -> int: ...
+
+    def subscribe(self, callback: Callable[[Action, list[dict]], None]) -> None: ...
+
+    def unsubscribe(self, callback: Callable[[Action, list[dict]], None]) -> None: ...
+
+    def candidate_indices(self, filters: list[Callable[[T], bool]]) -> Iterable[int]:
+        """Return the indices of all entries that can pass the filters, in the order of the storage."""
+        ...
+
+    def read_entries(self, filters: list[Callable[[T], bool]], sort_key: Callable[[T], Any] = None,
+                     reverse: bool = False) -> list[T]:
+        """
+        Read the entries passing the filters at once, sorted by the key or in the order of the storage.
+        Reads as few times as the storage can, e.g. a single query, so that a background thread
+        can read a large ledger.
+        """
+        ...
+
+    def query(self, filters: list[Callable[[T], bool]], sort_key: Callable[[T], Any],
+              reverse: bool) -> Sequence[int] | None:
+        """
+        Filter and sort the entries on the storage's side, if it can.
+
+        :return: The indices of the entries passing the filters in the sorted order, or `None` if the view
+            has to filter and sort the entries itself.
+        """
+        ...
+
+
+def create_database(filename: str | Path | None = None, cache_budget: int | None = None) -> Storage:
+    """
+    Create the storage engine suited for the given ledger: an `SQLiteDatabase` for an SQLite file,
+    the in-memory `Database` otherwise. The ledger still has to be loaded.
+
+    :param filename: The path to the ledger.
+    :param cache_budget: If set, the in-memory database stores its entries compactly and caches
+        at most this many bytes of materialized ones, see `Database`.
+    """
+    if filename is not None and Path(filename).suffix.lower() in SQLITE_SUFFIXES:
+        return SQLiteDatabase()
+    return Database(cache_budget=cache_budget)
@@ -0,0 +1,152 @@
+import json
+import os
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+
+
+class Probe:
+    """
+    Measures a single execution of an instrumented block. Used as a context manager,
+    the block can report how many rows it processed by setting `rows`.
+    """
+    __slots__ = ("_owner", "_name", "_start", "_memory", "rows")
+
+    def __init__(self, owner: "Instrumentation", name: str):
+        self._owner = owner
+        self._name = name
+        self._start = 0.0
+        self._memory = None
+        self.rows = 0
+
+    def __enter__(self):
+        if self._owner.trace_allocations and tracemalloc.is_tracing():
+            self._memory = tracemalloc.get_traced_memory()[0]
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        elapsed = time.perf_counter() - self._start
+        allocated = 0
+        if self._memory is not None and tracemalloc.is_tracing():
+            allocated = tracemalloc.get_traced_memory()[0] - self._memory
+        self._owner.record(self._name, elapsed, self.rows, allocated)
+        return False
+
+
+class _NullProbe:
+    """Returned instead of a `Probe` when the instrumentation is disabled. Does nothing."""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+    @property
+    def rows(self):
+        return 0
+
+    @rows.setter
+    def rows(self, value):
+        pass
+
+
+_NULL_PROBE = _NullProbe()
+
+
+class Instrumentation:
+    """
+    Collects timers and counters from the hot paths of the data layer.
+
+    The instrumentation is opt-in: while disabled, `probe` returns a shared object that does nothing,
+    so an instrumented block costs a single attribute lookup and a method call.
+    It can be enabled with `enable` or by setting the `MAMLAMBO_PROFILE` environment variable.
+    """
+    def __init__(self):
+        self.enabled = False
+        self.trace_allocations = False
+        self._lock = threading.Lock()
+        self._timers: dict[str, dict[str, float]] = dict()
+        self._counters: dict[str, int] = dict()
+
+        if os.environ.get("MAMLAMBO_PROFILE", "") not in ("", "0"):
+            self.enable(trace_allocations=os.environ["MAMLAMBO_PROFILE"] == "memory")
+
+    def enable(self, trace_allocations: bool = False) -> None:
+        """
+        Start collecting measurements.
+
+        :param trace_allocations: Whether to also measure the memory allocated by the instrumented blocks.
+            This uses `tracemalloc`, which slows the whole program down considerably.
+        """
+        self.enabled = True
+        self.trace_allocations = trace_allocations
+        if trace_allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def disable(self) -> None:
+        """Stop collecting measurements. The already collected ones are kept."""
+        self.enabled = False
+        if self.trace_allocations and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.trace_allocations = False
+
+    def probe(self, name: str) -> Probe | _NullProbe:
+        """
+        Create a probe measuring a block of code, to be used as a context manager.
+
+        :param name: The name under which the measurements are aggregated.
+        """
+        if not self.enabled:
+            return _NULL_PROBE
+        return Probe(self, name)
+
+    def count(self, name: str, amount: int = 1) -> None:
+        """Increase the counter `name` by `amount`."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def record(self, name: str, elapsed: float, rows: int = 0, allocated: int = 0) -> None:
+        """Add a single measurement to the timer `name`."""
+        with self._lock:
+            timer = self._timers.get(name)
+            if timer is None:
+                timer = self._timers[name] = {"calls": 0, "total": 0.0, "max": 0.0, "rows": 0, "allocated": 0}
+            timer["calls"] += 1
+            timer["total"] += elapsed
+            timer["max"] = max(timer["max"], elapsed)
+            timer["rows"] += rows
+            timer["allocated"] += allocated
+
+    def reset(self) -> None:
+        """Forget all measurements."""
+        with self._lock:
+            self._timers = dict()
+            self._counters = dict()
+
+    def report(self) -> dict:
+        """
+        Return a copy of all measurements.
+
+        :return: A dictionary with the timers (calls, total and maximal time in seconds, rows processed
+            and bytes allocated) and the counters.
+        """
+        with self._lock:
+            return {
+                "timers": {name: dict(timer) for name, timer in self._timers.items()},
+                "counters": dict(self._counters)
+            }
+
+    def dump(self, filename: Path | str) -> None:
+        """Export all measurements into a JSON file."""
+        with open(filename, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, indent=4)
+
+
+# The instrumentation shared by the whole application
+instruments = Instrumentation()
@@ -22,3 +22,13 @@ class Action(Enum):
     LOAD = 1  # Database was loaded
     PUSH = 2  # Pushing changes (i.e. calling add, remove, edit)
     STATE_CHANGE = 3  # Commiting / reverting changes
+    COMMIT = 4  # Pending changes were committed
+    REVERT = 5  # The last commit was reverted
+    APPEND = 6  # Entries were appended by a progressive load
+
+
+# What to do with duplicates of the existing transactions when importing
+class DuplicatePolicy(Enum):
+    KEEP = 0  # Import them anyway, only report them
+    SKIP_EXACT = 1  # Skip the exact duplicates, import (and report) the near ones
+    SKIP_ALL = 2  # Skip both the exact and the near duplicates
@@ -3,6 +3,7 @@ from tkinter import ttk
 from typing import Callable
 
 from mamlambo.Database.database_view import DatabaseView
+from mamlambo.Database.query import CompositeKey, SortKey
 from mamlambo.Transactions import Transaction
 from mamlambo.Enums.enums import Order, Property
 from collections import namedtuple
@@ -11,6 +12,15 @@ from collections import namedtuple
 # A named tuple that holds the information about the current sorting.
 OrderState = namedtuple("OrderState", ["property", "order"])
 
+# The names of the sortable properties, as used by `SortKey`
+SORT_PROPERTIES = {
+    Property.DATE: "Date",
+    Property.TITLE: "Title",
+    Property.GROUP: "Group",
+    Property.AMOUNT: "Amount",
+    Property.CURRENCY: "Currency",
+}
+
 
 class TransactionPagesFrame(tk.Frame):
     """
@@ -31,13 +41,21 @@ class TransactionPagesFrame(tk.Frame):
         self.prev_btn = None
         self.curr_page = 0
         self.items_per_page = 10
-        self.order_state: OrderState = OrderState(Property.DATE, Order.DESC)
+        # The columns the transactions are sorted by, the most significant first
+        self.order_states: list[OrderState] = [OrderState(Property.DATE, Order.DESC)]
         self._setup_treeview()
         self._setup_buttons()
+        self.treeview.show_order(self.order_states)
 
     def set_database(self, database):
-        """Set the database and subscribe to its changes."""
+        """Set the database and subscribe to its changes, or show no transactions without a database."""
         self.database = database
+        if self.database is None:
+            self.curr_page = 0
+            self.treeview.populate_tree([])
+            self.prev_btn["state"] = "disabled"
+            self.next_btn["state"] = "disabled"
+            return
         self.database.subscribe(self.refresh)
 
     def refresh(self):
@@ -52,16 +70,25 @@ class TransactionPagesFrame(tk.Frame):
         offset = self.curr_page * self.items_per_page
         return [offset + int(x) for x in self.treeview.selection()]
 
-    def sort_by(self, prop: Property):
-        """Sort the transactions by the given property."""
-        if prop == self.order_state.property:
-            # If the properties are the same, simply switch the order
-            new_order = (self.order_state.order.value + 1) % 2
-            self.order_state = self.order_state._replace(order=Order(new_order))
+    def sort_by(self, prop: Property, add: bool = False):
+        """
+        Sort the transactions by the given property.
+
+        :param prop: The property to sort by.
+        :param add: Whether to sort by the property after the current ones, instead of by it alone.
+        """
+        positions = [i for i, state in enumerate(self.order_states) if state.property == prop]
+        if positions and (add or len(self.order_states) == 1):
+            # If the property is already sorted by, simply switch its order
+            state = self.order_states[positions[0]]
+            self.order_states[positions[0]] = state._replace(order=Order((state.order.value + 1) % 2))
+        elif add:
+            self.order_states.append(OrderState(property=prop, order=Order.DESC))
         else:
             # Otherwise change the order to `descending`
-            self.order_state = OrderState(property=prop, order=Order.DESC)
+            self.order_states = [OrderState(property=prop, order=Order.DESC)]
 
+        self.treeview.show_order(self.order_states)
         self._order_columns()
 
     def _setup_treeview(self):
@@ -120,24 +147,15 @@ class TransactionPagesFrame(tk.Frame):
         if self.database is None:
             return
 
-        # Orders data according to `self.order_state`
-        reverse = True if self.order_state.order == Order.DESC else False
-
-        match self.order_state.property:
-            case Property.DATE:
-                key = lambda x: x.date
-            case Property.TITLE:
-                key = lambda x: x.title
-            case Property.GROUP:
-                key = lambda x: x.group
-            case Property.AMOUNT:
-                key = lambda x: x.amount
-            case Property.CURRENCY:
-                key = lambda x: x.currency
-            case _:
-                return
-
-        self.database.sort_by(sort_key=key, reverse=reverse)
+        # Sort keys (unlike lambdas) let an SQLite database sort the pages itself
+        if len(self.order_states) == 1:
+            state = self.order_states[0]
+            self.database.sort_by(sort_key=SortKey(SORT_PROPERTIES[state.property]),
+                                  reverse=state.order == Order.DESC)
+        else:
+            key = CompositeKey([(SORT_PROPERTIES[state.property], state.order == Order.DESC)
+                                for state in self.order_states])
+            self.database.sort_by(sort_key=key, reverse=False)
         # Go to the beginning when changing entry order
         self.curr_page = 0
         self.treeview.populate_tree(self._get_page(self.curr_page))
@@ -148,6 +166,7 @@ class TransactionTreeView(ttk.Treeview):
         """Initialize the treeview for displaying transaction details."""
         super().__init__(parent, show="headings")
         self["columns"] = ("Date", "Title", "Group", "Amount", "Currency", "Description")
+        self._press_function: Callable[[Property, bool], None] | None = None
 
         self.heading("#1", text="Date")
         self.column("#1", width=80)
@@ -180,13 +199,36 @@ class TransactionTreeView(ttk.Treeview):
 
             counter += 1
 
-    def bind_column_press(self, function: Callable[[Property], None]):
+    def bind_column_press(self, function: Callable[[Property, bool], None]):
         """
-        Binds the columns to the given function, giving the selected property as an argument.
-        The Description property is never bound.
+        Binds the columns to the given function, giving the selected property as an argument, along with
+        whether the column was Shift-clicked (to sort by it after the others). The Description property
+        is never bound.
         """
-        self.heading(f"#1", command=lambda: function(Property.DATE))
-        self.heading(f"#2", command=lambda: function(Property.TITLE))
-        self.heading(f"#3", command=lambda: function(Property.GROUP))
-        self.heading(f"#4", command=lambda: function(Property.AMOUNT))
-        self.heading(f"#5", command=lambda: function(Property.CURRENCY))
+        self._press_function = function
+        self.heading(f"#1", command=lambda: function(Property.DATE, False))
+        self.heading(f"#2", command=lambda: function(Property.TITLE, False))
+        self.heading(f"#3", command=lambda: function(Property.GROUP, False))
+        self.heading(f"#4", command=lambda: function(Property.AMOUNT, False))
+        self.heading(f"#5", command=lambda: function(Property.CURRENCY, False))
+        self.bind("<Shift-ButtonPress-1>", self._shift_press)
+
+    def show_order(self, states: list[OrderState]):
+        """Mark the headings of the sorted columns with their order, and their rank if there are several."""
+        for i, name in enumerate(self["columns"], start=1):
+            self.heading(f"#{i}", text=name)
+        for rank, state in enumerate(states, start=1):
+            arrow = "\u25bc" if state.order == Order.DESC else "\u25b2"
+            number = f"{rank}" if len(states) > 1 else ""
+            column = state.property.value
+            self.heading(f"#{column + 1}", text=f"{self['columns'][column]} {arrow}{number}")
+
+    def _shift_press(self, event):
+        """Sort by the Shift-clicked column after the others, instead of running the heading's command."""
+        if self._press_function is None or self.identify_region(event.x, event.y) != "heading":
+            return None
+
+        column = int(self.identify_column(event.x).lstrip("#")) - 1
+        if column < len(Property):  # The Description column is not sortable
+            self._press_function(Property(column), True)
+        return "break"
@@ -1,4 +1,14 @@
-from .statistics_window import StatisticsWindow
 from .about_window import AboutWindow
 from .filters_window import FiltersWindow
 from .transaction_window import TransactionWindow
+from .diagnostics_window import DiagnosticsWindow
+from .pivot_window import PivotWindow
+
+
+def __getattr__(name):
+    # The statistics window imports matplotlib, which takes longer than starting the rest of the application,
+    # so it is only imported once it is first needed.
+    if name == "StatisticsWindow":
+        from .statistics_window import StatisticsWindow
+        return StatisticsWindow
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
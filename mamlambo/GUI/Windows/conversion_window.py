@@ -2,6 +2,7 @@ import tkinter as tk
 from tkinter import ttk
 from typing import Any
 
+from mamlambo.Transactions import Transaction
 from mamlambo.Transactions.converter import Converter
 
 
@@ -18,6 +19,7 @@ class ConversionWindow(tk.Toplevel):
         self._to_box = None
         self._result_var = tk.StringVar()
         self._amount_var = tk.StringVar()
+        self._date_var = tk.StringVar(value="YYYY-MM-DD")  # Today, see `Transaction.validate_date`
         self._setup_all()
 
     def _setup_all(self) -> None:
@@ -38,10 +40,15 @@ class ConversionWindow(tk.Toplevel):
         except ValueError:
             self._result_var.set("Invalid amount.")
             return
+        try:
+            on = Transaction.validate_date(self._date_var.get())
+        except ValueError:
+            self._result_var.set("Invalid date.")
+            return
 
         from_currency = self._from_box.get()
         to_currency = self._to_box.get()
-        self._result_var.set(self._converter.convert(from_currency, to_currency, amount_float))
+        self._result_var.set(self._converter.convert(from_currency, to_currency, amount_float, on))
 
     def _setup_labels(self) -> None:
         ttk.Label(self, text="Currency converter", font="bold"
@@ -49,7 +56,8 @@ class ConversionWindow(tk.Toplevel):
         ttk.Label(self, text="From:").grid(row=1, column=0, sticky="nsw", padx=5, pady=5)
         ttk.Label(self, text="To:").grid(row=1, column=2, sticky="nsw", padx=5, pady=5)
         ttk.Label(self, text="Amount:").grid(row=2, column=0, sticky="nsw", padx=5, pady=5)
-        ttk.Label(self, text="Result:").grid(row=3, column=0, sticky="nsw", padx=5, pady=5)
+        ttk.Label(self, text="Date:").grid(row=3, column=0, sticky="nsw", padx=5, pady=5)
+        ttk.Label(self, text="Result:").grid(row=4, column=0, sticky="nsw", padx=5, pady=5)
 
     def _setup_comboboxes(self) -> None:
         self._from_box = ttk.Combobox(self, values=self._converter.get_all_currencies())
@@ -60,9 +68,10 @@ class ConversionWindow(tk.Toplevel):
 
     def _setup_entries_button(self) -> None:
         ttk.Entry(self, textvariable=self._amount_var).grid(row=2, column=1, sticky="nsw", padx=5, pady=5)
+        ttk.Entry(self, textvariable=self._date_var).grid(row=3, column=1, sticky="nsw", padx=5, pady=5)
         tk.Entry(self, textvariable=self._result_var, fg="black", bg="white", bd=0, state="readonly"
-                 ).grid(row=3, column=1, columnspan=5, sticky="nswe", padx=5, pady=5)
+                 ).grid(row=4, column=1, columnspan=5, sticky="nswe", padx=5, pady=5)
 
         ttk.Button(self, text="Convert", command=self._convert
-                   ).grid(row=4, column=3, sticky="nse", padx=5, pady=5)
+                   ).grid(row=5, column=3, sticky="nse", padx=5, pady=5)
 
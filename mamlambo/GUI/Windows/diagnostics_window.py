@@ -0,0 +1,87 @@
+import tkinter as tk
+from tkinter import ttk
+from tkinter import filedialog as fd
+import tkinter.messagebox as mb
+
+from mamlambo.Diagnostics import instruments
+
+
+class DiagnosticsWindow(tk.Toplevel):
+    """Shows the measurements collected by the instrumentation of the data layer."""
+
+    columns = ("Calls", "Total [ms]", "Average [ms]", "Maximum [ms]", "Rows", "Allocated [KiB]")
+
+    def __init__(self, master):
+        super().__init__(master)
+        self.title("Diagnostics")
+        self.columnconfigure(0, weight=1)
+        self.rowconfigure(1, weight=1)
+
+        self._enabled_var = tk.BooleanVar(value=instruments.enabled)
+        self._memory_var = tk.BooleanVar(value=instruments.trace_allocations)
+        self._treeview = None
+        self._setup_controls()
+        self._setup_treeview()
+        self.refresh()
+
+    def refresh(self) -> None:
+        """Show the current measurements."""
+        self._treeview.delete(*self._treeview.get_children())
+        report = instruments.report()
+
+        for name, timer in sorted(report["timers"].items()):
+            self._treeview.insert("", "end", text=name, values=(
+                timer["calls"],
+                "{:.2f}".format(timer["total"] * 1000),
+                "{:.2f}".format(timer["total"] * 1000 / timer["calls"]),
+                "{:.2f}".format(timer["max"] * 1000),
+                timer["rows"],
+                "{:.1f}".format(timer["allocated"] / 1024)
+            ))
+
+        for name, value in sorted(report["counters"].items()):
+            self._treeview.insert("", "end", text=name, values=(value, "", "", "", "", ""))
+
+    def _setup_controls(self) -> None:
+        controls = tk.Frame(self)
+        controls.grid(row=0, column=0, sticky="nsew", padx=5, pady=5)
+
+        ttk.Checkbutton(controls, text="Enabled", variable=self._enabled_var, command=self._toggle
+                        ).pack(side="left")
+        ttk.Checkbutton(controls, text="Trace allocations", variable=self._memory_var, command=self._toggle
+                        ).pack(side="left", padx=(5, 0))
+        ttk.Button(controls, text="Export", command=self._export).pack(side="right")
+        ttk.Button(controls, text="Reset", command=self._reset).pack(side="right", padx=5)
+        ttk.Button(controls, text="Refresh", command=self.refresh).pack(side="right")
+
+    def _setup_treeview(self) -> None:
+        self._treeview = ttk.Treeview(self, columns=self.columns)
+        self._treeview.heading("#0", text="Name")
+        self._treeview.column("#0", width=250)
+        for i, column in enumerate(self.columns, start=1):
+            self._treeview.heading(f"#{i}", text=column)
+            self._treeview.column(f"#{i}", width=90, anchor="e")
+        self._treeview.grid(row=1, column=0, sticky="nsew", padx=5, pady=(0, 5))
+
+    def _toggle(self) -> None:
+        """Enable or disable the instrumentation according to the checkbuttons."""
+        if self._enabled_var.get():
+            instruments.disable()
+            instruments.enable(trace_allocations=self._memory_var.get())
+        else:
+            instruments.disable()
+            self._memory_var.set(False)
+
+    def _reset(self) -> None:
+        instruments.reset()
+        self.refresh()
+
+    def _export(self) -> None:
+        filename = fd.asksaveasfilename(parent=self, confirmoverwrite=True, defaultextension=".json",
+                                        filetypes=[("JavaScript Object Notation", "*.json")])
+        if filename == "":
+            return
+        try:
+            instruments.dump(filename)
+        except IOError as e:
+            mb.showerror("Export error", f"Could not export the diagnostics:\n{str(e)}", parent=self)
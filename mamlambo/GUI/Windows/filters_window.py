@@ -3,8 +3,8 @@ from tkinter import ttk
 import tkinter.messagebox as mb
 from typing import Callable
 
+from mamlambo.Database.query import parse_filter
 from mamlambo.Transactions import Transaction
-from mamlambo.Transactions.group import Group
 
 
 class FiltersWindow(tk.Toplevel):
@@ -94,55 +94,6 @@ class FiltersWindow(tk.Toplevel):
 
         return result
 
-    def _parse_filter(self, fil: dict) -> Callable[[Transaction], bool]:
-        # This part uses a lot of functional programming, as it makes these kinds of
-        # comparisons easier.
-
-        # Split the entered data by " ", first should be the comparator, second
-        # the compared value
-        entry_split = fil["Entry"].get().split(" ", 1)
-        if len(entry_split) == 2:
-            comp = entry_split[0]
-            value = entry_split[1]
-        else:
-            raise ValueError("The entry field should only contain two items: comparator and value.")
-
-        # Depending on the property, validate the expected value and create a getter for said property
-        match fil["Combobox"].get():
-            case "Date":
-                getter = lambda x: x.date
-                parsed_value = Transaction.validate_date(value)
-            case "Title":
-                getter = lambda x: x.title
-                parsed_value = value
-            case "Group":
-                getter = lambda x: x.group
-                parsed_value = Group(value)
-            case "Amount":
-                getter = lambda x: x.amount
-                parsed_value = Transaction.validate_amount(value)
-            case "Currency":
-                getter = lambda x: x.currency
-                parsed_value = Transaction.validate_currency(value)
-            case "Description":
-                getter = lambda x: x.note
-                parsed_value = value
-            case _:
-                raise ValueError("Unknown property!")
-
-        # Depending on the comparator, return the complete filtering function
-        match comp:
-            case ">":
-                return lambda x: getter(x) > parsed_value
-            case "<":
-                return lambda x: getter(x) < parsed_value
-            case "==":
-                return lambda x: getter(x) == parsed_value
-            case ">=":
-                return lambda x: getter(x) >= parsed_value
-            case "<=":
-                return lambda x: getter(x) <= parsed_value
-            case "!=":
-                return lambda x: getter(x) != parsed_value
-            case _:
-                raise ValueError(f"Unknown comparator: {comp}")
+    @staticmethod
+    def _parse_filter(fil: dict) -> Callable[[Transaction], bool]:
+        return parse_filter(fil["Combobox"].get(), fil["Entry"].get())
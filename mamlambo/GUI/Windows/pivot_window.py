@@ -0,0 +1,251 @@
+import tkinter as tk
+from tkinter import ttk
+from tkinter import filedialog as fd
+import tkinter.messagebox as mb
+from typing import Callable
+
+from mamlambo.Database.compression import open_text
+from mamlambo.Database.database_view import DatabaseView
+from mamlambo.Database.pivot import PIVOT_DIMENSIONS, PIVOT_MEASURES, TOTAL_LABEL, PivotTable, format_value
+
+
+class PivotGrid(tk.Frame):
+    """
+    A table of text drawn on a canvas, with its first row and column kept in place while scrolling.
+    Only the cells in sight are drawn, each time the table is scrolled or resized, so the number
+    of cells does not matter.
+    """
+    row_height = 22
+    cell_width = 100
+    label_width = 220
+
+    def __init__(self, master):
+        super().__init__(master)
+        self.rowconfigure(0, weight=1)
+        self.columnconfigure(0, weight=1)
+
+        self._canvas = tk.Canvas(self, width=800, height=400, background="white", highlightthickness=0)
+        self._canvas.grid(row=0, column=0, sticky="nsew")
+        self._vbar = ttk.Scrollbar(self, orient="vertical", command=self._yview)
+        self._vbar.grid(row=0, column=1, sticky="ns")
+        self._hbar = ttk.Scrollbar(self, orient="horizontal", command=self._xview)
+        self._hbar.grid(row=1, column=0, sticky="ew")
+
+        self._corner = ""
+        self._rows: list[str] = []
+        self._columns: list[str] = []
+        self._text: Callable[[int, int], str] = lambda row, column: ""
+        self._first_row = 0  # The first row and column in sight, after the fixed ones
+        self._first_column = 0
+
+        self._canvas.bind("<Configure>", lambda event: self.redraw())
+        self._canvas.bind("<MouseWheel>", lambda event: self._scroll_rows(-1 if event.delta > 0 else 1) or "break")
+        self._canvas.bind("<Shift-MouseWheel>",
+                          lambda event: self._scroll_columns(-1 if event.delta > 0 else 1) or "break")
+        self._canvas.bind("<Button-4>", lambda event: self._scroll_rows(-3))
+        self._canvas.bind("<Button-5>", lambda event: self._scroll_rows(3))
+        self._canvas.bind("<Shift-Button-4>", lambda event: self._scroll_columns(-1))
+        self._canvas.bind("<Shift-Button-5>", lambda event: self._scroll_columns(1))
+
+    def set_data(self, corner: str, rows: list[str], columns: list[str], text: Callable[[int, int], str]) -> None:
+        """
+        Show another table, keeping the scrolled position as far as it fits.
+
+        :param corner: The text of the top left cell.
+        :param rows: The labels of the rows.
+        :param columns: The labels of the columns.
+        :param text: Returns the text of the cell in the given row and column.
+        """
+        self._corner, self._rows, self._columns, self._text = corner, rows, columns, text
+        self._first_row = max(0, min(self._first_row, len(rows) - 1))
+        self._first_column = max(0, min(self._first_column, len(columns) - 1))
+        self.redraw()
+
+    def redraw(self) -> None:
+        """Draw the cells in sight."""
+        canvas = self._canvas
+        canvas.delete("all")
+        visible_rows, visible_columns = self._visible()
+        rows = range(self._first_row, min(len(self._rows), self._first_row + visible_rows))
+        columns = range(self._first_column, min(len(self._columns), self._first_column + visible_columns))
+        width = self.label_width + len(columns) * self.cell_width
+        height = (len(rows) + 1) * self.row_height
+
+        canvas.create_rectangle(0, 0, width, self.row_height, fill="#e8e8e8", outline="")
+        canvas.create_rectangle(0, 0, self.label_width, height, fill="#e8e8e8", outline="")
+        canvas.create_text(5, self.row_height / 2, text=self._corner, anchor="w")
+        for x, column in enumerate(columns):
+            right = self.label_width + (x + 1) * self.cell_width
+            canvas.create_text(right - 5, self.row_height / 2, text=self._columns[column], anchor="e")
+            canvas.create_line(right, 0, right, height, fill="#d0d0d0")
+
+        for y, row in enumerate(rows, start=1):
+            middle = y * self.row_height + self.row_height / 2
+            canvas.create_text(5, middle, text=self._rows[row], anchor="w")
+            for x, column in enumerate(columns):
+                right = self.label_width + (x + 1) * self.cell_width
+                canvas.create_text(right - 5, middle, text=self._text(row, column), anchor="e")
+            canvas.create_line(0, (y + 1) * self.row_height, width, (y + 1) * self.row_height, fill="#d0d0d0")
+        canvas.create_line(self.label_width, 0, self.label_width, height, fill="#a0a0a0")
+        canvas.create_line(0, self.row_height, width, self.row_height, fill="#a0a0a0")
+
+        self._vbar.set(*self._fractions(self._first_row, visible_rows, len(self._rows)))
+        self._hbar.set(*self._fractions(self._first_column, visible_columns, len(self._columns)))
+
+    def _visible(self) -> tuple[int, int]:
+        """Return the number of rows and columns that fit in the canvas, without the fixed ones."""
+        rows = max(1, self._canvas.winfo_height() // self.row_height - 1)
+        columns = max(1, (self._canvas.winfo_width() - self.label_width) // self.cell_width)
+        return rows, columns
+
+    @staticmethod
+    def _fractions(first: int, visible: int, count: int) -> tuple[float, float]:
+        if count == 0:
+            return 0.0, 1.0
+        return first / count, min(1.0, (first + visible) / count)
+
+    def _scroll_rows(self, amount: int) -> None:
+        visible = self._visible()[0]
+        self._first_row = max(0, min(self._first_row + amount, len(self._rows) - visible))
+        self.redraw()
+
+    def _scroll_columns(self, amount: int) -> None:
+        visible = self._visible()[1]
+        self._first_column = max(0, min(self._first_column + amount, len(self._columns) - visible))
+        self.redraw()
+
+    def _yview(self, *args) -> None:
+        self._first_row = self._scrolled(args, self._first_row, self._visible()[0], len(self._rows))
+        self.redraw()
+
+    def _xview(self, *args) -> None:
+        self._first_column = self._scrolled(args, self._first_column, self._visible()[1], len(self._columns))
+        self.redraw()
+
+    @staticmethod
+    def _scrolled(args: tuple, first: int, visible: int, count: int) -> int:
+        """Return the first item in sight after a command of a scrollbar, `moveto` or `scroll`."""
+        if args[0] == "moveto":
+            first = round(float(args[1]) * count)
+        elif args[0] == "scroll":
+            step = visible if args[2] == "pages" else 1
+            first += int(args[1]) * step
+        return max(0, min(first, count - visible))
+
+
+class PivotWindow(tk.Toplevel):
+    """
+    Shows a pivot table of the transactions of a view, e.g. the sums of the groups by month.
+
+    Like the statistics window, it follows the view it was opened for: commits and reverts update the cells
+    of their changes, and a change of the filters summarizes the transactions again.
+    """
+    def __init__(self, master, source: DatabaseView):
+        """
+        :param master: The parent widget.
+        :param source: The view to summarize, usually the one of the main table.
+        """
+        super().__init__(master)
+        self.title("Pivot table")
+        self.rowconfigure(1, weight=1)
+        self.columnconfigure(0, weight=1)
+
+        self._source: DatabaseView | None = None
+        self._filters = None  # The filters the table was computed with
+        self._table: PivotTable | None = None
+        self._pending = None  # The scheduled refresh, so that a burst of changes is shown only once
+
+        self._rows_var = tk.StringVar(value="group:2")
+        self._columns_var = tk.StringVar(value="month")
+        self._measure_var = tk.StringVar(value="sum")
+        self._setup_controls()
+        self._grid = PivotGrid(self)
+        self._grid.grid(row=1, column=0, sticky="nsew", padx=5, pady=(0, 5))
+
+        self.set_source(source)
+        self.bind("<Destroy>", self._on_destroy)
+
+    def set_source(self, source: DatabaseView) -> None:
+        """Summarize another view, e.g. after a different session was opened."""
+        if source is self._source:
+            return
+
+        self._release()
+        self._source = source
+        self._rebuild_table()
+        source.subscribe(self._on_source_change)
+
+    def _setup_controls(self) -> None:
+        controls = tk.Frame(self)
+        controls.grid(row=0, column=0, sticky="nsew", padx=5, pady=5)
+
+        for label, variable, values in (("Rows", self._rows_var, PIVOT_DIMENSIONS),
+                                        ("Columns", self._columns_var, PIVOT_DIMENSIONS),
+                                        ("Measure", self._measure_var, PIVOT_MEASURES)):
+            ttk.Label(controls, text=label).pack(side="left", padx=(0, 5))
+            combobox = ttk.Combobox(controls, textvariable=variable, values=values, state="readonly", width=10)
+            combobox.pack(side="left", padx=(0, 10))
+            combobox.bind("<<ComboboxSelected>>", self._on_layout_change)
+        ttk.Button(controls, text="Export", command=self._export).pack(side="right")
+
+    def _release(self) -> None:
+        """Stop following the current view."""
+        if self._source is not None:
+            self._source.unsubscribe(self._on_source_change)
+        if self._table is not None:
+            self._table.close()
+        self._source, self._table = None, None
+
+    def _on_destroy(self, event):
+        if event.widget is self:
+            if self._pending is not None:
+                self.after_cancel(self._pending)
+                self._pending = None
+            self._release()
+
+    def _on_layout_change(self, event=None):
+        # Another measure is computed from the same cells, only other dimensions need a new table
+        if (self._table.rows.name, self._table.columns.name) != (self._rows_var.get(), self._columns_var.get()):
+            self._rebuild_table()
+        self._schedule_refresh()
+
+    def _on_source_change(self):
+        # The source is sorted by the user as well, only a change of its filters needs a new table
+        if self._source.filters is not self._filters:
+            self._rebuild_table()
+        self._schedule_refresh()
+
+    def _rebuild_table(self) -> None:
+        if self._table is not None:
+            self._table.close()
+        self._filters = self._source.filters
+        self._table = PivotTable(self._source.database, self._rows_var.get(), self._columns_var.get(),
+                                 list(self._filters))
+
+    def _schedule_refresh(self):
+        if self._pending is None:
+            self._pending = self.after_idle(self._refresh)
+
+    def _refresh(self):
+        self._pending = None
+        table, measure = self._table, self._measure_var.get()
+        rows = table.row_labels() + [TOTAL_LABEL]
+        columns = table.column_labels() + [TOTAL_LABEL]
+
+        def text(row: int, column: int) -> str:
+            row_label = rows[row] if row < len(rows) - 1 else None
+            column_label = columns[column] if column < len(columns) - 1 else None
+            return format_value(table.value(row_label, column_label, measure), measure)
+
+        self._grid.set_data(f"{table.rows.name} \\ {table.columns.name}", rows, columns, text)
+
+    def _export(self) -> None:
+        filename = fd.asksaveasfilename(parent=self, confirmoverwrite=True, defaultextension=".csv",
+                                        filetypes=[("CSV file", "*.csv")])
+        if not filename:
+            return
+        try:
+            with open_text(filename, "w") as stream:
+                self._table.write_csv(stream, self._measure_var.get())
+        except IOError as e:
+            mb.showerror("Export error", f"Could not export the pivot table:\n{str(e)}", parent=self)
@@ -1,201 +1,428 @@
-import datetime
+import math
 import tkinter as tk
 from tkinter import ttk
-import math
 from collections import Counter
+from datetime import date, timedelta
 
 import matplotlib
-from matplotlib import pyplot as plt
+from matplotlib import dates as mdates
+from matplotlib.axes import Axes
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from matplotlib.figure import Figure
+from mamlambo.Database import Database
+from mamlambo.Database.balance_index import BalanceIndex
 from mamlambo.Database.database_view import DatabaseView
+from mamlambo.Database.query import SortKey
+from mamlambo.Database.statistics import SAMPLE_SIZE, compute_statistics, prepare_pie_data, sample_statistics
+from mamlambo.GUI.background import run_in_background
+from mamlambo.Transactions import Money
 matplotlib.use("TkAgg")
 
 
-def unzip(l: list):
-    """Unzips the list of tuples to two lists."""
-    if len(l) == 0:
-        return [], []
-
-    unzipped = list(zip(*l))
-    return list(unzipped[0]), list(unzipped[1])
+class StatisticsWindow(tk.Toplevel):
+    """
+    Renders the statistics window.
 
+    The window follows the view it was opened for: commits, reverts and changes of the filters update
+    the statistics in place. The figures are created once and only their data is replaced, the balance line
+    is redrawn over a cached background (blitted) as long as it fits in the current axes.
 
-class StatisticsWindow(tk.Toplevel):
-    """Renders the statistics window."""
-    def __init__(self, master, database: DatabaseView):
+    The statistics of a large in-memory ledger are first estimated from a sample (see `sample_statistics`)
+    and shown with their error bounds right away, while the exact ones are computed from a snapshot
+    of the database in the background and replace the estimate once done. The statistics of an SQLite
+    ledger, which may be larger than memory, are only computed in the background, read by a single query.
+    """
+    def __init__(self, master, source: DatabaseView):
+        """
+        :param master: The parent widget.
+        :param source: The view to show the statistics of, usually the one of the main table.
+        """
         super().__init__(master)
         self.title("Statistics")
         self.resizable(False, False)
 
-        data, group_data, time_data = self._prepare_data(database)
-        title_text = f"Statistics from {data['min_date']} to {data['max_date']}"
-        ttk.Label(self, text=title_text, font=("Arial", 18)
-                  ).grid(column=0, row=0, columnspan=2, sticky="nsew", padx=5, pady=(5, 10))
-        StatisticsDataFrame(self, data).grid(row=1, column=0, sticky="nsew", padx=5, pady=(5, 10))
-        self.plot_line(time_data, data["currency"])
-        self.plot_pies(group_data["incomes"], group_data["expenses"])
-
-    def plot_line(self, time_data, currency: str):
-        dates = time_data["dates"]
-        totals = time_data["totals"]
+        self._source: DatabaseView | None = None
+        self._view: DatabaseView | None = None  # Sorted by date, ascending, for the balance to make sense
+        self._balances: BalanceIndex | None = None
+        self._pending = None  # The scheduled refresh, so that a burst of changes is shown only once
+        self._rescale = True  # Whether the line's axes have to be fitted to its data again
+        self._currency = None
+        self._generation = 0  # Increased by every refresh, so that the exact statistics of an older one are dropped
 
-        fig, ax1 = plt.subplots(nrows=1, ncols=1, figsize=(5, 5))
-        fig.set_facecolor("#f0f0f0")
+        self._title_var = tk.StringVar()
+        ttk.Label(self, textvariable=self._title_var, font=("Arial", 18)
+                  ).grid(column=0, row=0, columnspan=2, sticky="nsew", padx=5, pady=(5, 10))
+        self._data_frame = StatisticsDataFrame(self)
+        self._data_frame.grid(row=1, column=0, sticky="nsew", padx=5, pady=(5, 10))
+        self._setup_line()
+        self._setup_pies()
+        # The totals of a date range are answered by an index, so they follow the sliders instantly
+        self._range_frame = BalanceRangeFrame(self)
+
+        self.set_source(source)
+        self.bind("<Destroy>", self._on_destroy)
+
+    def set_source(self, source: DatabaseView) -> None:
+        """Show the statistics of another view, e.g. after a different session was opened."""
+        if source is self._source:
+            return
+
+        self._release()
+        self._rescale = True
+        self._source = source
+        self._view = DatabaseView(SortKey("Date"), False, database=source.database, filters=source.filters)
+        self._rebuild_balances()
+        self._view.subscribe(self._schedule_refresh)
+        source.subscribe(self._on_source_change)
+
+    def _release(self) -> None:
+        """Stop following the current view."""
+        if self._source is not None:
+            self._source.unsubscribe(self._on_source_change)
+        if self._view is not None:
+            self._view.close()
+        if self._balances is not None:
+            self._balances.close()
+        self._source, self._view, self._balances = None, None, None
+
+    def _on_destroy(self, event):
+        if event.widget is self:
+            if self._pending is not None:
+                self.after_cancel(self._pending)
+                self._pending = None
+            self._release()
+
+    def _on_source_change(self):
+        # The source is sorted by the user as well, only a change of its filters matters
+        if self._source.filters is not self._view.filters:
+            self._rescale = True
+            self._view.sort_by(filters=self._source.filters)  # Schedules the refresh through the subscription
+            self._rebuild_balances()
+
+    def _rebuild_balances(self) -> None:
+        if self._balances is not None:
+            self._balances.close()
+        self._balances = BalanceIndex(self._view.database, list(self._view.filters))
+
+    def _schedule_refresh(self):
+        if self._pending is None:
+            self._pending = self.after_idle(self._refresh)
+
+    def _refresh(self):
+        self._pending = None
+        self._generation += 1
+        if not isinstance(self._view.database, Database):
+            self._title_var.set("Computing the statistics\u2026")
+            self._refine(self._generation)
+        elif len(self._view) > SAMPLE_SIZE:
+            self._show(*sample_statistics(self._view))
+            self._refine(self._generation)
+        else:
+            self._show(*self._prepare_data(self._view))
 
-        ax1.set_title("Balance over time")
-        ax1.set_xlabel("Date")
-        ax1.set_ylabel(f"Balance [{currency}]")
+    def _refine(self, generation: int):
+        """
+        Compute the exact statistics in the background, from a snapshot of the view's transactions
+        (or a single query of an SQLite database, see `SQLiteDatabase.read_entries`), and index their balances
+        along the way, so that the range does not read them on the Tk thread.
+        """
+        database, balances = self._view.database, self._balances
+        if isinstance(database, Database):
+            snapshot = database.snapshot()
+            indices = self._view.database_indices()
+            version = snapshot.version
+
+            def read():
+                return [snapshot[i] for i in indices]
+        else:
+            filters = list(self._view.filters)
+            version = database.get_version()
+
+            def read():
+                return database.read_entries(filters, SortKey("Date"))
+
+        def task():
+            entries = read()
+            return compute_statistics(entries), balances.index(entries)
+
+        # Polled by the main window, which outlives this one
+        run_in_background(self.master, task,
+                          lambda result: self._on_exact(generation, balances, version, result),
+                          lambda e: self._on_exact_error(generation, e))
+
+    def _on_exact(self, generation: int, balances: BalanceIndex, version: int, result: tuple):
+        if generation == self._generation and self.winfo_exists():
+            statistics, indexed = result
+            if balances is self._balances:
+                balances.attach(indexed, version)
+            self._show(*statistics)
+
+    def _on_exact_error(self, generation: int, e: Exception):
+        if generation == self._generation and self.winfo_exists():
+            self._title_var.set(f"Could not compute the exact statistics: {str(e)}")
+
+    def _show(self, data: dict, group_data: dict, time_data: dict):
+        """Show the statistics computed by `compute_statistics` or estimated by `sample_statistics`."""
+        if len(data["currencies"]) > 1:
+            self._title_var.set("Statistics work with only one currency, use a filter to choose one.")
+            return
+
+        if data["currency"] != self._currency:
+            self._currency = data["currency"]
+            self._rescale = True
+        if data["min_date"] is None:
+            self._title_var.set("No transactions to show statistics of")
+        elif data["approximate"]:
+            self._title_var.set(f"Estimated statistics from {data['min_date']} to {data['max_date']}, refining\u2026")
+        else:
+            self._title_var.set(f"Statistics from {data['min_date']} to {data['max_date']}")
 
-        ax1.plot(dates, totals)
-        ax1.tick_params(axis='x', labelrotation=70)
-        fig.tight_layout()
+        self._data_frame.update_data(data)
+        self.plot_line(time_data, data["currency"])
+        self.plot_pies(group_data["incomes"], group_data["expenses"], group_data.get("margins"))
+        if data["approximate"]:
+            return  # Indexing the balances reads every transaction, so the range waits for the exact statistics
+        if data["min_date"] is not None:
+            self._range_frame.set_range(self._balances, data["currency"], data["min_date"], data["max_date"])
+            self._range_frame.grid(row=3, column=0, columnspan=2, sticky="nsew", padx=5, pady=(5, 10))
+        else:
+            self._range_frame.grid_remove()
+
+    def _setup_line(self):
+        self._line_figure = Figure(figsize=(5, 5), facecolor="#f0f0f0")
+        self._line_axes = self._line_figure.add_subplot()
+        self._line_axes.set_title("Balance over time")
+        self._line_axes.set_xlabel("Date")
+        self._line_axes.tick_params(axis='x', labelrotation=70)
+        # An animated line is left out of full redraws, so that it can be drawn over the cached background
+        self._line, = self._line_axes.plot([], [], animated=True)
+        self._line_background = None
 
         # Embed the figure as a Tkinter widget
-        canvas = FigureCanvasTkAgg(fig, master=self)
-        canvas.draw()
-        canvas.get_tk_widget().grid(row=2, column=0)
+        self._line_canvas = FigureCanvasTkAgg(self._line_figure, master=self)
+        self._line_canvas.mpl_connect("draw_event", self._on_line_draw)
+        self._line_canvas.get_tk_widget().grid(row=2, column=0)
 
-    def plot_pies(self, incomes: Counter, expenses: Counter):
-        # Data for the "Incomes" pie chart
-        inc_values, inc_labels = self.prepare_pie_data(incomes)
-
-        # Data for the "Expenses" pie chart
-        exp_values, exp_labels = self.prepare_pie_data(expenses)
+    def _on_line_draw(self, event):
+        # Keep the freshly drawn axes as the background of the line, and draw the line over them
+        self._line_background = self._line_canvas.copy_from_bbox(self._line_axes.bbox)
+        self._line_axes.draw_artist(self._line)
 
+    def plot_line(self, time_data, currency: str):
+        """Show the balance over time, replacing the data of the line."""
+        dates = time_data["dates"]
+        totals = time_data["totals"]
+        self._line.set_data(dates, totals)
+
+        if not self._rescale and self._line_background is not None and self._fits_axes(dates, totals):
+            # Only the line changed, so only the line is redrawn
+            self._line_canvas.restore_region(self._line_background)
+            self._line_axes.draw_artist(self._line)
+            self._line_canvas.blit(self._line_axes.bbox)
+            return
+
+        self._rescale = False
+        self._line_axes.set_ylabel(f"Balance [{currency}]")
+        self._line_axes.relim()
+        self._line_axes.autoscale_view()
+        self._line_figure.tight_layout()
+        self._line_canvas.draw_idle()
+
+    def _fits_axes(self, dates: list[date], totals: list[float]) -> bool:
+        """Return whether the line's data lies within its current axes."""
+        if not dates:
+            return False
+        left, right = self._line_axes.get_xlim()
+        bottom, top = self._line_axes.get_ylim()
+        return (left <= mdates.date2num(dates[0]) and mdates.date2num(dates[-1]) <= right and
+                bottom <= min(totals) and max(totals) <= top)
+
+    def _setup_pies(self):
         # Create the figure and subplots
-        fig, (ax1, ax2) = plt.subplots(nrows=2, ncols=1, figsize=(5, 5))
-        fig.set_facecolor("#f0f0f0")
-
-        # Plot the "Incomes" pie chart
-        ax1.pie(inc_values, labels=inc_labels, startangle=90, labeldistance=1.1)
-        ax1.set_title('Incomes')
-
-        # Plot the "Expenses" pie chart
-        ax2.pie(exp_values, labels=exp_labels, startangle=90, labeldistance=1.1),
-        ax2.set_title('Expenses')
+        self._pie_figure = Figure(figsize=(5, 5), facecolor="#f0f0f0")
+        self._income_axes, self._expense_axes = self._pie_figure.subplots(nrows=2, ncols=1)
+        self._pies: dict[Axes, tuple[list, list]] = dict()  # The wedges and the labels of every pie
 
         # Embed the figure as a Tkinter widget
-        canvas = FigureCanvasTkAgg(fig, master=self)
-        canvas.draw()
-        canvas.get_tk_widget().grid(row=0, rowspan=3, column=1)
-
-    def _prepare_data(self, database: DatabaseView):
-        """Runs through the data, collecting needed statistics from it."""
-        data, group_data = self._init_dicts()
-        dates_totals: list[tuple[datetime.date, float]] = []
-        total_balance = 0
-
-        for i in range(len(database)):
-            curr_transaction = database[i]
-            amount = curr_transaction.amount
-
-            if amount > data["max"][0]:
-                data["max"] = (amount, curr_transaction.title)
-            elif amount < data["min"][0]:
-                data["min"] = (amount, curr_transaction.title)
-
-            if amount > 0:
-                group_data["incomes"][curr_transaction.group.name] += amount
-            elif amount < 0:
-                # Subtracting so that the Counter returns the group with the biggest expenses first
-                group_data["expenses"][curr_transaction.group.name] -= amount
-
-            if data["min_date"] is None or data["min_date"] > curr_transaction.date:
-                data["min_date"] = curr_transaction.date
-            if data["max_date"] is None or data["max_date"] < curr_transaction.date:
-                data["max_date"] = curr_transaction.date
-
-            if data["currency"] is None:
-                data["currency"] = curr_transaction.currency
-
-            total_balance += amount
-            dates_totals.append((curr_transaction.date, total_balance))
-
-        if len(database) != 0:
-            data["avg"] = total_balance / len(database)
-
-        time_data = self._get_time_data(dates_totals)  # Convert the data in time to the required representation
-
-        return data, group_data, time_data
+        self._pie_canvas = FigureCanvasTkAgg(self._pie_figure, master=self)
+        self._pie_canvas.get_tk_widget().grid(row=0, rowspan=3, column=1)
 
-    @staticmethod
-    def _init_dicts():
-        data = {
-            "max": (-math.inf, None),
-            "min": (math.inf, None),
-            "avg": 0.0,
-            "min_date": None,
-            "max_date": None,
-            "currency": None
-        }
-        group_data = {
-            "incomes": Counter(),
-            "expenses": Counter()
-        }
-        return data, group_data
+    def plot_pies(self, incomes: Counter, expenses: Counter, margins: dict[str, Counter] = None):
+        """
+        Show the largest groups of the incomes and the expenses, reusing the wedges where possible.
+        The error bounds of estimated sums are shown as shares of the pie next to the groups' names.
+        """
+        margins = margins or dict()
+        self._update_pie(self._income_axes, "Incomes", incomes, margins.get("incomes"))
+        self._update_pie(self._expense_axes, "Expenses", expenses, margins.get("expenses"))
+        self._pie_canvas.draw_idle()
+
+    def _update_pie(self, axes: Axes, title: str, data: Counter, margins: Counter | None):
+        values, labels = self.prepare_pie_data(data)
+        values = [float(value) for value in values]  # The exact sums are only needed in numbers, not in the pies
+        wedges, texts = self._pies.get(axes, ([], []))
+        total = sum(values)
+        if margins and total > 0:
+            labels = [f"{label} \u00b1{100 * margins[label] / total:.0f} %" if label in margins else label
+                      for label in labels]
+
+        if len(values) != len(wedges) or total <= 0:
+            # A different number of groups, the pie is drawn anew
+            axes.clear()
+            axes.set_title(title)
+            if total > 0:
+                wedges, texts = axes.pie(values, labels=labels, startangle=90, labeldistance=1.1)
+            else:
+                wedges, texts = [], []
+            self._pies[axes] = (wedges, texts)
+            return
+
+        # The same layout as `Axes.pie`: counterclockwise from the top, the labels next to the middles of the wedges
+        angle = 90.0
+        for wedge, text, value, label in zip(wedges, texts, values, labels):
+            sweep = 360.0 * value / total
+            wedge.set_theta1(angle)
+            wedge.set_theta2(angle + sweep)
+            middle = math.radians(angle + sweep / 2)
+            x, y = 1.1 * math.cos(middle), 1.1 * math.sin(middle)
+            text.set_position((x, y))
+            text.set_horizontalalignment("left" if x > 0 else "right")
+            text.set_text(label)
+            angle += sweep
 
     @staticmethod
-    def _get_time_data(totals_dates: list[tuple[datetime.date, float]]):
-        # Converts the list of tuples to a dictionary
-        time_data = {
-            "totals": [],
-            "dates": []
-        }
-
-        dates, totals = unzip(totals_dates)
-        time_data["dates"] = dates
-        time_data["totals"] = totals
-        return time_data
+    def _prepare_data(database: DatabaseView):
+        """
+        Runs through the data, collecting needed statistics from it.
+        Does not touch any widgets, so it can also be called without a running Tk instance.
+        """
+        return compute_statistics(database)
 
     @staticmethod
     def prepare_pie_data(data: Counter, n=4):
         # Selects up to `n` largest groups from the data, putting the rest in a category called "Rest"
-        rest_sum = None
-
-        if len(data) > n:
-            n_largest_incomes = data.most_common()[:n]
-            rest_sum = sum(map(lambda x: x[1], data.most_common()[n:]))
-        else:
-            n_largest_incomes = data.most_common()
+        return prepare_pie_data(data, n)
 
-        group_name, group_value = unzip(n_largest_incomes)
-        if rest_sum is not None:
-            group_value.append(rest_sum)
-            group_name.append("Rest")
 
-        return group_value, group_name
+class BalanceRangeFrame(tk.Frame):
+    """
+    Shows the incomes, the expenses and the balance between two dates, chosen by a pair of sliders.
+    """
+    def __init__(self, master):
+        super().__init__(master)
+        self._balances: BalanceIndex | None = None
+        self._currency = None
+        self._first: date | None = None
+
+        self._start_var = tk.IntVar(value=0)
+        self._end_var = tk.IntVar(value=0)
+        self._range_var = tk.StringVar()
+        self._totals_var = tk.StringVar()
+
+        ttk.Label(self, text="From:").grid(row=0, column=0, sticky="nsw", padx=5)
+        self._start_scale = ttk.Scale(self, from_=0, to=0, variable=self._start_var, command=self._on_start)
+        self._start_scale.grid(row=0, column=1, sticky="nsew", padx=5)
+        ttk.Label(self, text="To:").grid(row=1, column=0, sticky="nsw", padx=5)
+        self._end_scale = ttk.Scale(self, from_=0, to=0, variable=self._end_var, command=self._on_end)
+        self._end_scale.grid(row=1, column=1, sticky="nsew", padx=5)
+        ttk.Label(self, textvariable=self._range_var, font="bold").grid(row=0, column=2, sticky="nsw", padx=5)
+        ttk.Label(self, textvariable=self._totals_var).grid(row=1, column=2, sticky="nsw", padx=5)
+        self.columnconfigure(1, weight=1)
+
+    def set_range(self, balances: BalanceIndex, currency: str, first: date, last: date):
+        """Let the sliders choose from the given dates, keeping the chosen range if it still fits."""
+        days = (last - first).days
+        whole = self._first is None or self._end_var.get() == self._end_scale.cget("to")
+        self._balances = balances
+        self._currency = currency
+        self._first = first
+
+        self._start_scale.configure(to=days)
+        self._end_scale.configure(to=days)
+        self._start_var.set(min(self._start_var.get(), days))
+        self._end_var.set(days if whole else min(self._end_var.get(), days))
+        self._update()
+
+    def _on_start(self, value: str):
+        # The range never ends before it starts
+        if int(float(value)) > self._end_var.get():
+            self._end_var.set(int(float(value)))
+        self._update()
+
+    def _on_end(self, value: str):
+        if int(float(value)) < self._start_var.get():
+            self._start_var.set(int(float(value)))
+        self._update()
+
+    def _update(self):
+        if self._balances is None:
+            return
+
+        start = self._first + timedelta(days=int(self._start_var.get()))
+        end = self._first + timedelta(days=int(self._end_var.get()))
+        incomes = self._balances.incomes(self._currency, start, end)
+        expenses = self._balances.expenses(self._currency, start, end)
+        balance = self._balances.balance(self._currency, end)
+
+        self._range_var.set(f"{start} to {end}")
+        self._totals_var.set(f"Incomes: {incomes}, expenses: {expenses}, net: {incomes + expenses}, "
+                             f"balance: {balance} {self._currency}")
 
 
 class StatisticsDataFrame(tk.Frame):
     """
     Displays the statistics in numbers.
     """
-    def __init__(self, master, data):
+    def __init__(self, master):
         super().__init__(master)
-        self.data = data
+        self._vars: dict[str, tuple[tk.StringVar, tk.StringVar]] = dict()
         self._setup_labels()
 
     def _setup_labels(self):
-        currency = self.data["currency"]
+        self._create_stats_labels("max", "Maximum amount:", titled=True)
+        self._create_stats_labels("min", "Minimum amount:", titled=True)
+        self._create_stats_labels("avg", "Average amount:")
 
-        self._create_stats_labels("Maximum amount:", self.data['max'][0], currency, self.data['max'][1])
-        self._create_stats_labels("Minimum amount:", self.data['min'][0], currency, self.data['min'][1])
-        self._create_stats_labels("Average amount:", self.data['avg'], currency)
+    def update_data(self, data: dict):
+        """
+        Show the statistics computed by `compute_statistics`. Estimated ones (see `sample_statistics`)
+        show the average with its error bound, and the extremes of the sample as bounds of the real ones.
+        """
+        currency = data["currency"]
+        approximate = data["approximate"]
+        for stat, bound in (("max", "\u2265 "), ("min", "\u2264 ")):
+            amount, title = data[stat]
+            self._set(stat, amount, currency, title, prefix=bound if approximate else "")
+        self._set("avg", data["avg"], currency, margin=data["margins"].get("avg") if approximate else None)
+
+    def _set(self, stat: str, amount: Money | float, currency: str, title: str = None, prefix: str = "",
+             margin: float = None):
+        amount_var, title_var = self._vars[stat]
+        if isinstance(amount, Money):
+            amount_var.set(f"{prefix}{amount} {currency}")  # Exact, with the decimals of the currency
+        elif not math.isfinite(amount):
+            amount_var.set("")
+        elif margin is not None:
+            amount_var.set("{}{:.2f} \u00b1 {:.2f} {}".format(prefix, amount, margin, currency))
+        else:
+            amount_var.set("{}{:.2f} {}".format(prefix, amount, currency))
+        title_var.set(title or "")
 
-    def _create_stats_labels(self, stat_type: str, amount: float, currency: str, title: str = None):
+    def _create_stats_labels(self, stat: str, stat_type: str, titled: bool = False):
         """
         Creates multiple labels in the format
         <Stat_type> <Amount> <Currency> [Title]
         """
-        currency_text = "{:.2f} {}".format(amount, currency)
+        amount_var, title_var = tk.StringVar(), tk.StringVar()
+        self._vars[stat] = (amount_var, title_var)
 
         ttk.Label(self, text=stat_type, font="bold"
                   ).grid(row=self._new_row(), column=0, sticky="nsw", padx=5, pady=(5, 10))
-        ttk.Label(self, text=currency_text, font="bold"
+        ttk.Label(self, textvariable=amount_var, font="bold"
                   ).grid(row=self._curr_row(), column=1, sticky="nsw", padx=5, pady=(5, 10))
-        if title is not None:
-            ttk.Label(self, text=title, font="bold"
-                     ).grid(row=self._curr_row(), column=2, sticky="nsw", pady=(5, 10))
+        if titled:
+            ttk.Label(self, textvariable=title_var, font="bold"
+                      ).grid(row=self._curr_row(), column=2, sticky="nsw", pady=(5, 10))
 
     def _new_row(self):
         return self.grid_size()[1]
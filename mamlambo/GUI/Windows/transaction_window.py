@@ -3,6 +3,7 @@ from tkinter import ttk
 import tkinter.messagebox as mb
 from typing import Union
 
+from mamlambo.Database.autocomplete import AutocompleteIndex
 from mamlambo.Transactions import Transaction
 
 
@@ -13,8 +14,10 @@ class TransactionWindow(tk.Toplevel):
     :param master: The parent window.
     :param templates: Optional dictionary of templates.
     :param transaction: Optional Transaction object to edit.
+    :param suggestions: Optional index suggesting the title, the group and the currency as they are typed.
     """
-    def __init__(self, master, templates=None, transaction: Transaction | None = None):
+    def __init__(self, master, templates=None, transaction: Transaction | None = None,
+                 suggestions: AutocompleteIndex | None = None):
         super().__init__(master)
 
         self.resizable(True, False)
@@ -23,6 +26,7 @@ class TransactionWindow(tk.Toplevel):
         self._result = None
         self.templates = templates
         self.template_sel = None
+        self.suggestions = suggestions
 
         self._setup_all()
 
@@ -196,8 +200,29 @@ class TransactionWindow(tk.Toplevel):
             self._values[entry] = tk.StringVar()
             row = self._next_row()
             ttk.Label(self, text=entry).grid(row=row, column=0, sticky="w", pady=(0, 8), padx=(5, 0))
-            ttk.Entry(self, textvariable=self._values[entry]
-                      ).grid(row=row, column=1, columnspan=2, sticky="ew", pady=(0, 8), padx=(0, 10))
+            if self.suggestions is not None and entry in ("Title", "Group", "Amount"):
+                widget = ttk.Combobox(self, textvariable=self._values[entry])
+                widget.configure(postcommand=lambda box=widget, name=entry: self._suggest(box, name))
+                widget.bind("<KeyRelease>", lambda event, name=entry: self._suggest(event.widget, name))
+            else:
+                widget = ttk.Entry(self, textvariable=self._values[entry])
+            widget.grid(row=row, column=1, columnspan=2, sticky="ew", pady=(0, 8), padx=(0, 10))
+
+    def _suggest(self, box: ttk.Combobox, entry: str) -> None:
+        """
+        Offer the values completing the entry's text in its drop-down list.
+        Groups are completed a segment at a time, and the amount by its currency.
+        """
+        text = self._values[entry].get()
+        match entry:
+            case "Title":
+                values = self.suggestions.titles(text)
+            case "Group":
+                values = self.suggestions.groups(text)
+            case _:
+                amount, _, currency = text.strip().partition(" ")
+                values = [f"{amount} {code}" for code in self.suggestions.currencies(currency)] if amount else []
+        box["values"] = values
 
 
 class EntryWindow(tk.Toplevel):
@@ -0,0 +1,45 @@
+import threading
+import tkinter as tk
+from typing import Any, Callable
+
+
+def run_in_background(widget: tk.Misc, task: Callable[[], Any], on_done: Callable[[Any], None],
+                      on_error: Callable[[Exception], None] = None, interval: int = 50) -> threading.Thread:
+    """
+    Run `task` in a daemon thread and hand its result over to the Tk thread.
+
+    Tk is not thread-safe, so the task itself must never touch any widgets. Instead, the Tk thread polls
+    the task every `interval` milliseconds and calls `on_done` with its result (or `on_error` with the
+    raised exception) once it finishes.
+
+    :param widget: The widget whose event loop polls the task.
+    :param task: The function to run in the background.
+    :param on_done: Called in the Tk thread with the result of the task.
+    :param on_error: Called in the Tk thread with the exception raised by the task. If not given, it is re-raised.
+    :param interval: The polling interval in milliseconds.
+    :return: The started thread.
+    """
+    outcome = dict()
+
+    def worker():
+        try:
+            outcome["result"] = task()
+        except Exception as e:
+            outcome["error"] = e
+
+    def poll():
+        if thread.is_alive():
+            widget.after(interval, poll)
+            return
+
+        if "error" in outcome:
+            if on_error is None:
+                raise outcome["error"]
+            on_error(outcome["error"])
+        else:
+            on_done(outcome.get("result"))
+
+    thread = threading.Thread(target=worker, daemon=True)
+    thread.start()
+    widget.after(interval, poll)
+    return thread
@@ -4,13 +4,29 @@ import tkinter.messagebox as mb
 from pathlib import Path
 import json
 
-from mamlambo.Database import DatabaseView
-from mamlambo.GUI.Windows import AboutWindow, TransactionWindow, FiltersWindow, StatisticsWindow
+from mamlambo.Database import Database, DatabaseView, create_database
+from mamlambo.Database.autocomplete import AutocompleteIndex
+from mamlambo.Database.autosave import AutoSaver
+from mamlambo.Database.database import MANIFEST_NAME
+from mamlambo.Database.compression import ledger_suffix
+from mamlambo.Database.file_watcher import FileWatcher, LedgerDiff
+from mamlambo.Database.progressive_load import ProgressiveLoad
+from mamlambo.Database.query import SortKey
+from mamlambo.GUI import Windows
+from mamlambo.GUI.Windows import AboutWindow, TransactionWindow, FiltersWindow, DiagnosticsWindow, PivotWindow
+from mamlambo.GUI.background import run_in_background
 from mamlambo.GUI.Frames import TransactionPagesFrame, ButtonRowFrame
 from mamlambo.GUI.Windows.conversion_window import ConversionWindow
 from mamlambo.Transactions import Transaction
 
 
+# Milliseconds between two checks of the session's file for changes made by other programs
+WATCH_INTERVAL = 2000
+
+# Milliseconds between two appends of the transactions parsed by a progressive load, see `_poll_loading`
+LOAD_POLL_INTERVAL = 50
+
+
 class MainWindow(tk.Tk):
     def __init__(self):
         """Initialize the main application window."""
@@ -26,6 +42,19 @@ class MainWindow(tk.Tk):
         self._database: DatabaseView | None = None
         self._conversions = []
         self._templates = dict()
+        self._last_session: str | None = None
+        self._config_ready = False  # Whether the configuration was already read, see `_load_config`
+        self._autosave_interval = 300  # Seconds between two autosaves of the session
+        self._statistics = None  # The statistics window, once opened
+        self._pivot = None  # The pivot table window, once opened
+        self._row_cache_budget: int | None = None  # MiB of materialized transactions kept for a compact ledger
+        self._autosaver: AutoSaver | None = None
+        self._saving = None  # The thread saving the session in the background, if any
+        self._watch_var = tk.BooleanVar(value=False)  # Whether to reload the changes other programs make to the file
+        self._watcher: FileWatcher | None = None
+        self._reloading = False  # Whether the watched file is being compared with the session in the background
+        self._suggestions: AutocompleteIndex | None = None  # The suggestions of the session, see `_get_suggestions`
+        self._loading: ProgressiveLoad | None = None  # The progressive load of the session, until it finishes
         self.protocol("WM_DELETE_WINDOW", self._exit_app)
 
         self._setup_menubar()
@@ -33,6 +62,7 @@ class MainWindow(tk.Tk):
         self._setup_transaction_view()
         self._update_buttons()
         self._load_config("./data/config.json")
+        self.after(WATCH_INTERVAL, self._poll_watcher)
 
     def _setup_button_row(self):
         """Set up the row of buttons in the main window."""
@@ -62,10 +92,96 @@ class MainWindow(tk.Tk):
         if not answer:
             return
 
-        self._database = DatabaseView(lambda x: x.date, True)
+        self._set_database(DatabaseView(SortKey("Date"), True))
+        self._start_autosave(None)
+        self._watch_session(None)
+
+    def _set_database(self, database: DatabaseView):
+        """Make the given database the current session."""
+        self._cancel_loading()
+        self._database = database
         self._database.subscribe(self._update_buttons)
         self.trns_pages.set_database(self._database)
         self._left_btn_row.enable_all()
+        self._follow_session()
+
+    def _follow_session(self):
+        """Let the open statistics and pivot table windows show the current session."""
+        if self._statistics is not None and self._statistics.winfo_exists():
+            self._statistics.set_source(self._database)
+        if self._pivot is not None and self._pivot.winfo_exists():
+            self._pivot.set_source(self._database)
+
+    def _start_autosave(self, session: str | None):
+        """
+        Start autosaving the current session next to its file, or into the data folder for a new session.
+        The session file itself is never overwritten by the autosave.
+        """
+        self._stop_autosave()
+        if self._database is None or not isinstance(self._database.database, Database):
+            return  # An SQLite database stores every commit in its file right away
+
+        if session is None:
+            filename = Path("./data/autosave.csv")
+        else:
+            session = Path(session)
+            suffix = ledger_suffix(session)
+            filename = session.with_name(f"{session.name.removesuffix(suffix)}.autosave{suffix or '.csv'}")
+        self._autosaver = AutoSaver(self._database.database, filename, self._autosave_interval)
+        self._autosaver.start()
+
+    def _cache_budget(self) -> int | None:
+        """Return the budget of the cache of materialized transactions in bytes, `None` to keep them all."""
+        return None if self._row_cache_budget is None else self._row_cache_budget * 1024 * 1024
+
+    def _watch_session(self, session: str | None):
+        """Watch the file of the current session for changes made by other programs, see `_poll_watcher`."""
+        self._watcher = None
+        if session is not None and isinstance(self._database.database, Database) and ledger_suffix(session):
+            self._watcher = FileWatcher(session)
+
+    def _poll_watcher(self):
+        """
+        Reload the changes other programs made to the session's file, if enabled. Only the changed transactions
+        are replaced, as a single commit, so the table keeps its sorting, filters and position.
+        """
+        self.after(WATCH_INTERVAL, self._poll_watcher)
+        if (not self._watch_var.get() or self._watcher is None or self._reloading or self._database is None or
+                not self._database.all_committed()):
+            return  # The uncommitted changes are waited for, they cannot be mixed with those of the file
+        if not self._watcher.poll():
+            return
+
+        database, watcher = self._database.database, self._watcher
+        self._reloading = True
+
+        def done(diff: LedgerDiff):
+            self._reloading = False
+            if self._watcher is not watcher:
+                return  # Another session was opened meanwhile
+            if len(diff) > 0 and not database.is_saved():
+                if not mb.askyesno("File changed", f"The file {watcher.path.name} was changed by another program, "
+                                                   "but this session was not saved.\nReload the changed transactions "
+                                                   "and lose the unsaved changes?"):
+                    watcher.acknowledge()
+                    return
+            try:
+                database.apply_diff(diff)
+            except ValueError:
+                return  # The session changed meanwhile, compared again on the next poll
+            watcher.acknowledge()
+
+        def failed(e: Exception):
+            self._reloading = False
+            watcher.acknowledge()  # Not retried until the file changes again
+            mb.showerror("Reload error", f"Could not reload the changed file:\n{str(e)}")
+
+        run_in_background(self, lambda: database.diff_file(watcher.path), done, failed)
+
+    def _stop_autosave(self):
+        if self._autosaver is not None:
+            self._autosaver.stop()
+            self._autosaver = None
 
     def _open_session(self):
         """Open an existing database session from a file."""
@@ -73,25 +189,155 @@ class MainWindow(tk.Tk):
         if not answer:
             return
 
-        filename = fd.askopenfilename(defaultextension=".csv")
+        filename = fd.askopenfilename(defaultextension=".csv",
+                                      filetypes=[("Comma Separated Values", "*.csv"),
+                                                 ("JSON Lines", "*.jsonl"),
+                                                 ("Compressed ledger", "*.gz *.bz2 *.xz"),
+                                                 ("SQLite database", "*.sqlite *.sqlite3 *.db"),
+                                                 ("All files", "*")])
         if filename == "":
             return
-        self._database = DatabaseView(lambda x: x.date, True)
+        self._open_file(filename)
+
+    def _open_file(self, filename: str):
+        """Open the session stored in the file, replacing the current one without asking."""
+        database = create_database(filename, self._cache_budget())
+        self._cancel_loading()
+        self._database = DatabaseView(SortKey("Date"), True, database=database)
         self._database.subscribe(self._update_buttons)
         self.trns_pages.set_database(self._database)
         try:
+            if isinstance(database, Database) and Path(filename).name != MANIFEST_NAME:
+                # The first pages are shown at once, while the rest of the file is still being parsed
+                self._loading = ProgressiveLoad(database, filename, Transaction.parse)
+                self._stop_autosave()
+                self._watcher = None
+                self._left_btn_row.disable_all()
+                self._left_btn_row["filter"]["state"] = "normal"  # Filtering applies to the transactions to come too
+                self._poll_loading(self._loading, filename)
+                return
             self._database.load(filename, Transaction.parse)
         except ValueError as e:
-            mb.showerror("Import error", str(e))
-            self._database = None
+            self._open_failed(e)
             return
+        self._session_opened(filename)
+
+    def _poll_loading(self, loading: ProgressiveLoad, filename: str):
+        """Show the transactions parsed by the progressive load of the session so far, see `ProgressiveLoad`."""
+        if loading is not self._loading:
+            return  # Another session was opened meanwhile
+        try:
+            finished = loading.poll()
+        except (IOError, ValueError) as e:
+            self._open_failed(e)
+            return
+
+        if not finished:
+            self.title(f"Mamlambo - loading {Path(filename).name}: {len(loading)} transactions")
+            self.after(LOAD_POLL_INTERVAL, lambda: self._poll_loading(loading, filename))
+            return
+        self._loading = None
+        self.title("Mamlambo")
+        self._session_opened(filename)
+
+    def _cancel_loading(self):
+        """Stop the progressive load of the current session, if it did not finish yet."""
+        if self._loading is not None:
+            self._loading.cancel()
+            self._loading = None
+            self.title("Mamlambo")
+
+    def _session_opened(self, filename: str):
+        """Let the user edit the session opened from the file, once it is loaded."""
         self._left_btn_row.enable_all()
+        self._follow_session()
+        self._last_session = filename
+        self._start_autosave(filename)
+        self._watch_session(filename)
+        if self._config_ready:
+            self._save_config("./data/config.json")
+
+    def _open_failed(self, e: Exception):
+        """
+        Drop the session that could not be loaded, including the transactions a progressive load
+        already showed, so that a truncated ledger can be neither committed nor saved over the file.
+        """
+        self._cancel_loading()
+        self._stop_autosave()
+        self._watcher = None
+        if self._database is not None:
+            self._database.unsubscribe(self._update_buttons)
+        self._database = None
+        self.trns_pages.set_database(None)
+        self._left_btn_row.disable_all()
+        self._update_buttons()
+        mb.showerror("Import error", f"Nothing was loaded:\n{str(e)}")
+
+    def _import_files(self):
+        """
+        Open a new session merged from several ledgers (e.g. monthly exports), sorted by date.
+        The ledgers are parsed in parallel, in the background.
+        """
+        answer = self._check_saved_committed()
+        if not answer:
+            return
+
+        filenames = fd.askopenfilenames(filetypes=[("Ledgers", "*.csv *.json *.jsonl *.gz *.bz2 *.xz"),
+                                                   ("Comma Separated Values", "*.csv"),
+                                                   ("JavaScript Object Notation", "*.json"),
+                                                   ("JSON Lines", "*.jsonl"),
+                                                   ("Compressed ledger", "*.gz *.bz2 *.xz")])
+        if not filenames:
+            return
+
+        def load() -> DatabaseView:
+            database = DatabaseView(SortKey("Date"), True, database=create_database(None, self._cache_budget()))
+            database.load_many(list(filenames), Transaction.parse)
+            return database
+
+        def done(database: DatabaseView):
+            self._set_database(database)
+            self._start_autosave(None)
+            self._watch_session(None)
+
+        def failed(e: Exception):
+            mb.showerror("Import error", f"Could not import the files:\n{str(e)}")
+
+        run_in_background(self, load, done, failed)
+
+    def _restore_session(self, filename: str | None):
+        """
+        Load the last session in the background, so that the window can be shown in the meantime.
+        The loaded session is dropped if the user opens or creates another one before it finishes.
+        """
+        if filename is None or not Path(filename).is_file():
+            return
+
+        def load() -> DatabaseView:
+            storage = create_database(filename, self._cache_budget())
+            database = DatabaseView(SortKey("Date"), True, database=storage)
+            database.load(filename, Transaction.parse)
+            return database
+
+        def done(database: DatabaseView):
+            if self._database is None:
+                self._set_database(database)
+                self._start_autosave(filename)
+                self._watch_session(filename)
+
+        def failed(e: Exception):
+            mb.showerror("Import error", f"Could not restore the last session:\n{str(e)}")
+
+        run_in_background(self, load, done, failed)
 
     def _save_session(self):
         """Save the current database session to a file."""
         if self._database is None:
             mb.showinfo("Empty database", "No database was created.")
             return
+        if self._loading is not None:
+            mb.showinfo("Loading", "The session is still being loaded.")
+            return
 
         if not self._database.all_committed():
             answer = mb.askyesno("Confirmation", "Not all changes were committed, do you want to continue?")
@@ -101,21 +347,82 @@ class MainWindow(tk.Tk):
         filename = fd.asksaveasfilename(confirmoverwrite=True,
                                         defaultextension=".*",
                                         filetypes=[("Comma Separated Values", "*.csv"),
-                                                   ("JavaScript Object Notation", "*.json")])
+                                                   ("JavaScript Object Notation", "*.json"),
+                                                   ("JSON Lines", "*.jsonl"),
+                                                   ("Compressed CSV", "*.csv.gz *.csv.bz2 *.csv.xz")])
         if filename == "":
             return
+        database = self._database.database
+        if not isinstance(database, Database) or not ledger_suffix(filename):
+            # Other paths are either unsupported or a partitioned dump, which is written in place.
+            # An SQLite database is exported in place as well, it cannot be shared with another thread
+            try:
+                self._database.dump(Path(filename))
+                self._session_saved(filename)
+            except ValueError as e:
+                mb.showerror("Unsupported file type", str(e))
+            except IOError as e:
+                self._save_failed(e)
+            return
+
+        # Write a snapshot in the background, so that the window stays responsive and editable meanwhile
+        snapshot = database.snapshot()
+
+        def done(_):
+            self._saving = None
+            database.mark_saved(snapshot.version, Path(filename))
+            self._session_saved(filename)
+
+        def failed(e: Exception):
+            self._saving = None
+            if not isinstance(e, IOError):
+                raise e
+            self._save_failed(e)
+
+        self._saving = run_in_background(self, lambda: snapshot.dump(Path(filename)), done, failed)
+
+    def _session_saved(self, filename: str):
+        self._last_session = filename
+        self._save_config("./data/config.json")
+        self._start_autosave(filename)
+        self._watch_session(filename)  # Our own save is not a change to reload
+
+    @staticmethod
+    def _save_failed(e: IOError):
+        mb.showerror("Database error", f"Could not save the database:\n{str(e)}")
+
+    def _import_tail(self):
+        """Schedule the transactions appended to the opened CSV file since it was opened, to be committed."""
+        if self._database is None or not isinstance(self._database.database, Database):
+            mb.showinfo("No CSV file", "Only a session opened from a CSV file can import the appended transactions.")
+            return
+
         try:
-            self._database.dump(Path(filename))
-            self._save_config("./data/config.json")
+            count = self._database.database.import_tail()
         except ValueError as e:
-            mb.showerror("Unsupported file type", str(e))
+            mb.showinfo("No CSV file", str(e))
+            return
         except IOError as e:
-            mb.showerror("Database error", f"Could not save the database:\n{str(e)}")
+            mb.showerror("Import error", f"Could not read the file:\n{str(e)}")
+            return
+
+        if count is None:
+            source = self._database.database.source
+            if (mb.askyesno("File changed", "The file was changed, not only appended to.\nOpen it again?") and
+                    self._check_saved_committed()):
+                self._open_file(str(source))
+        elif count == 0:
+            mb.showinfo("Nothing new", "No transactions were appended to the file.")
+        else:
+            mb.showinfo("Transactions imported", f"{count} appended transactions are ready to be committed.")
 
     def _exit_app(self):
         """Handle the application exit event."""
         answer = self._check_saved_committed()
         if answer:
+            if self._saving is not None:
+                self._saving.join()  # Do not leave a half-written session behind
+            self._stop_autosave()
             self.quit()
             self.destroy()
 
@@ -123,25 +430,38 @@ class MainWindow(tk.Tk):
         ConversionWindow(self, self._conversions).focus_set()
 
     def _show_statistics(self):
-        """Show statistics for the current database view. Sorts the data by date, ascending."""
+        """Show statistics for the current database view, in a separate view sorted by date, ascending."""
         if self._database is None:
             mb.showinfo("No database", "There is no database connected.")
             return
 
-        # Check that there is only a single currency in the currently shown data
-        currency = None
-        for i in range(len(self._database)):
-            if currency is not None and currency != self._database[i].currency:
-                mb.showinfo("More currencies", "Statistics work with only one type of currency."
-                                               "Use a filter to have only one type of currency.")
-                return
-            currency = self._database[i].currency
+        # A single statistics window follows the current view, showing its changes as they are made.
+        # It asks for a single currency itself, so the ledger is not read up front.
+        if self._statistics is not None and self._statistics.winfo_exists():
+            self._statistics.set_source(self._database)
+            self._statistics.deiconify()
+            self._statistics.lift()
+        else:
+            self._statistics = Windows.StatisticsWindow(self, self._database)
+        self._statistics.focus_set()
 
-        # Sort the database by date, ascending, so that the statistics window can plot the
-        # "Balance" graph correctly
-        self._database.sort_by(sort_key=lambda x: x.date, reverse=False)
+    def _show_pivot(self):
+        """Show the pivot table of the current database view, e.g. the sums of the groups by month."""
+        if self._database is None:
+            mb.showinfo("No database", "There is no database connected.")
+            return
 
-        StatisticsWindow(self, self._database).focus_set()
+        if self._pivot is not None and self._pivot.winfo_exists():
+            self._pivot.set_source(self._database)
+            self._pivot.deiconify()
+            self._pivot.lift()
+        else:
+            self._pivot = PivotWindow(self, self._database)
+        self._pivot.focus_set()
+
+    def _show_diagnostics(self):
+        """Show the measurements of the data layer's instrumentation."""
+        DiagnosticsWindow(self).focus_set()
 
     def _display_about(self):
         """Display the 'About' window."""
@@ -155,13 +475,19 @@ class MainWindow(tk.Tk):
         file_menu = tk.Menu(menubar, tearoff=0)
         file_menu.add_command(label='New', command=self._new_session)
         file_menu.add_command(label="Open", command=self._open_session)
+        file_menu.add_command(label="Import files", command=self._import_files)
         file_menu.add_command(label="Save", command=self._save_session)
+        file_menu.add_command(label="Import appended", command=self._import_tail)
+        file_menu.add_checkbutton(label="Reload external changes", variable=self._watch_var,
+                                  command=self._save_watch_config)
         file_menu.add_command(label='Exit', command=self._exit_app)
 
         # "Tools" option
         tools_menu = tk.Menu(menubar, tearoff=0)
         tools_menu.add_command(label="Convert currency", command=self._show_conversion)
         tools_menu.add_command(label="Statistics", command=self._show_statistics)
+        tools_menu.add_command(label="Pivot table", command=self._show_pivot)
+        tools_menu.add_command(label="Diagnostics", command=self._show_diagnostics)
 
         # "Help" option
         help_menu = tk.Menu(menubar, tearoff=0)
@@ -174,7 +500,7 @@ class MainWindow(tk.Tk):
 
     def _add_trn_comm(self):
         """Open the transaction window to add a new transaction."""
-        transaction_window = TransactionWindow(self, templates=self._templates)
+        transaction_window = TransactionWindow(self, templates=self._templates, suggestions=self._get_suggestions())
         transaction_window.focus_set()
         transaction_window.grab_set()
         transaction_window.wait_window()
@@ -189,7 +515,8 @@ class MainWindow(tk.Tk):
         selected = self.trns_pages.get_selection()
         for index in selected:
             transaction = self._database[index]
-            edit_window = TransactionWindow(self, templates=self._templates, transaction=transaction)
+            edit_window = TransactionWindow(self, templates=self._templates, transaction=transaction,
+                                            suggestions=self._get_suggestions())
             edit_window.focus_set()
             edit_window.grab_set()
             edit_window.wait_window()
@@ -198,6 +525,17 @@ class MainWindow(tk.Tk):
                 continue
             self._database.edit(index, edit_window.get_transaction())
 
+    def _get_suggestions(self) -> AutocompleteIndex | None:
+        """Return the autocomplete index of the current session's database, created on first use."""
+        if self._database is None:
+            return None
+
+        if self._suggestions is None or self._suggestions.database is not self._database.database:
+            if self._suggestions is not None:
+                self._suggestions.close()
+            self._suggestions = AutocompleteIndex(self._database.database)
+        return self._suggestions
+
     def _remove_trn_comm(self):
         """Remove selected transactions from the database."""
         selected = self.trns_pages.get_selection()
@@ -212,7 +550,7 @@ class MainWindow(tk.Tk):
         filter_window.wait_window()
 
         filters = filter_window.get_results()
-        self._database.sort_by(sort_key=lambda x: x.date, filters=filters, reverse=True)
+        self._database.sort_by(sort_key=SortKey("Date"), filters=filters, reverse=True)
 
     def _revert_comm(self):
         """Revert the last committed change."""
@@ -228,7 +566,7 @@ class MainWindow(tk.Tk):
 
         :return: True if it is safe to proceed, False otherwise.
         """
-        if self._database is not None:
+        if self._database is not None and self._loading is None:  # A loading session has no changes yet
             if not self._database.all_committed():
                 answer = mb.askyesno("Confirmation", "Not all changes were committed, all uncommitted data "
                                                      "will be lost.\nContinue?")
@@ -256,29 +594,53 @@ class MainWindow(tk.Tk):
             self._right_btn_row["commit"]["state"] = "disable"
 
     def _load_config(self, filename: str):
-        try:
-            with open(filename, "r", encoding="utf-8") as f:
-                config = json.load(f)
-        except IOError:
-            mb.showerror("No configuration found", "The program couldn't find the configuration file."
-                                                   "\nAn empty one will be created.")
-            return
-        except json.JSONDecodeError:
+        """Parse the configuration in the background and apply it once it is ready."""
+        run_in_background(self, lambda: self._read_config(filename), self._apply_config, self._config_error)
+
+    @staticmethod
+    def _read_config(filename: str) -> dict:
+        with open(filename, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _config_error(self, e: Exception):
+        self._config_ready = True
+        if isinstance(e, json.JSONDecodeError):
             mb.showerror("Malformed configuration", "The program configuration file is malformed."
                                                     "\nAn empty one will be created.")
-            return
+        elif isinstance(e, IOError):
+            mb.showerror("No configuration found", "The program couldn't find the configuration file."
+                                                   "\nAn empty one will be created.")
+        else:
+            raise e
 
+    def _apply_config(self, config: dict):
+        self._config_ready = True
         try:
             self._templates = config["templates"]
             self._conversions = config["conversions"]
         except KeyError:
             mb.showerror("Malformed configuration", "The program configuration file is malformed."
                                                     "\nAn empty one will be created.")
+            return
+
+        self._autosave_interval = config.get("autosave_interval", self._autosave_interval)
+        self._row_cache_budget = config.get("row_cache_budget", self._row_cache_budget)
+        self._watch_var.set(config.get("watch_file", False))
+        self._last_session = config.get("last_session")
+        self._restore_session(self._last_session)
+
+    def _save_watch_config(self):
+        if self._config_ready:
+            self._save_config("./data/config.json")
 
     def _save_config(self, filename: str):
         config = {
             "conversions": self._conversions,
-            "templates": self._templates
+            "templates": self._templates,
+            "last_session": self._last_session,
+            "autosave_interval": self._autosave_interval,
+            "row_cache_budget": self._row_cache_budget,
+            "watch_file": self._watch_var.get()
         }
 
         try:
@@ -0,0 +1,2 @@
+from mamlambo.Server.server import LedgerServer, serve
+from mamlambo.Server.client import LedgerClient
@@ -0,0 +1,169 @@
+import itertools
+import socket
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable
+
+from mamlambo.Server.protocol import DEFAULT_HOST, DEFAULT_PORT, encode_frame, recv_frame
+from mamlambo.Transactions import Transaction
+
+
+class LedgerClient:
+    """
+    A blocking client of a `LedgerServer`, usable from scripts and from the GUI alike.
+
+    The requests may be sent from several threads. The responses and the change events are received
+    by a background thread, which also calls the subscribed callbacks, so a Tk client should hand
+    the events over to its main loop (e.g. by `after`) instead of touching widgets in the callbacks.
+    """
+    def __init__(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, path: str | None = None,
+                 timeout: float | None = None):
+        """
+        :param host: The address of the server.
+        :param port: The TCP port of the server.
+        :param path: The Unix socket of the server, used instead of the host and the port.
+        :param timeout: How long to wait for a response in seconds, forever by default.
+        """
+        if path is not None:
+            self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._sock.connect(path)
+        else:
+            self._sock = socket.create_connection((host, port))
+        self._timeout = timeout
+        self._ids = itertools.count(1)
+        self._waiting: dict[int, Future] = dict()
+        self._subscribers: list[Callable[[dict], None]] = []
+        self._send_lock = threading.Lock()
+        self._lost: ConnectionError | None = None  # Set once the connection is lost
+        self._reader = threading.Thread(target=self._read_loop, name="ledger-client", daemon=True)
+        self._reader.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self) -> None:
+        """Disconnect from the server. The pending changes that were not committed are dropped."""
+        try:
+            self._sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass  # Already disconnected
+        self._sock.close()
+        self._reader.join()
+
+    def request(self, op: str, **arguments) -> Any:
+        """
+        Run an operation on the server and wait for its result, see `LedgerServer`.
+
+        :raises ValueError: If the server could not run the operation.
+        :raises ConnectionError: If the connection was lost.
+        """
+        request_id = next(self._ids)
+        future = Future()
+        self._waiting[request_id] = future
+        if self._lost is not None:
+            self._waiting.pop(request_id, None)
+            raise self._lost
+        try:
+            with self._send_lock:
+                self._sock.sendall(encode_frame({"id": request_id, "op": op, **arguments}))
+        except OSError as e:
+            self._waiting.pop(request_id, None)
+            raise ConnectionError(f"Could not send the request: {str(e)}")
+
+        response = future.result(self._timeout)
+        if "error" in response:
+            raise ValueError(response["error"])
+        return response["result"]
+
+    def load(self, filename: str) -> int:
+        """Make the server load the ledger from its file (as seen by the server), return the number of transactions."""
+        return self.request("load", filename=filename)["count"]
+
+    def query(self, filters: list[str] = None, sort: str = "Date", descending: bool = True,
+              offset: int = 0, limit: int = 50) -> tuple[int, list[Transaction]]:
+        """
+        Filter and sort the ledger, and return a page of it.
+
+        :param filters: Filters prefixed with their property, e.g. `Amount > 50`.
+        :param sort: The property to sort by, one of `Transaction.value_names`.
+        :param descending: Whether to sort in descending order.
+        :param offset: The position of the first returned transaction.
+        :param limit: The largest number of returned transactions.
+        :return: The number of all transactions passing the filters, and the requested page of them.
+        """
+        result = self.request("query", filters=filters or [], sort=sort, descending=descending,
+                              offset=offset, limit=limit)
+        return result["total"], [Transaction.parse(row) for row in result["rows"]]
+
+    def add(self, transaction: Transaction) -> None:
+        """Schedule a transaction to be added by the next `commit`."""
+        self.request("add", values=transaction.dump())
+
+    def edit(self, position: int, transaction: Transaction) -> None:
+        """Schedule the transaction at the position of the last `query` to be replaced by the next `commit`."""
+        self.request("edit", position=position, values=transaction.dump())
+
+    def remove(self, position: int) -> None:
+        """Schedule the transaction at the position of the last `query` to be removed by the next `commit`."""
+        self.request("remove", position=position)
+
+    def discard(self) -> None:
+        """Drop the scheduled changes."""
+        self.request("discard")
+
+    def commit(self) -> int:
+        """Apply the scheduled changes at once, return the new version of the ledger."""
+        return self.request("commit")["version"]
+
+    def revert(self) -> int:
+        """Revert the last commit of any client, return the new version of the ledger."""
+        return self.request("revert")["version"]
+
+    def statistics(self, filters: list[str] = None) -> dict:
+        """Return the statistics of the transactions passing the filters, by currency (see `statistics_report`)."""
+        return self.request("statistics", filters=filters or [])
+
+    def save(self, filename: str = None) -> str:
+        """Make the server save the ledger, into the file it was loaded from by default."""
+        arguments = {} if filename is None else {"filename": filename}
+        return self.request("save", **arguments)["filename"]
+
+    def subscribe(self, callback: Callable[[dict], None]) -> int:
+        """
+        Call the callback with every change event of the ledger: its `event` (`load`, `commit` or `revert`),
+        the new `version` of the ledger and the number of `changes`.
+
+        :return: The current version of the ledger.
+        """
+        if callback not in self._subscribers:
+            self._subscribers.append(callback)
+        return self.request("subscribe")["version"]
+
+    def unsubscribe(self, callback: Callable[[dict], None]) -> None:
+        """Stop calling a callback subscribed before."""
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+        if not self._subscribers:
+            self.request("unsubscribe")
+
+    def _read_loop(self) -> None:
+        error: Exception = ConnectionError("The connection to the server was closed.")
+        try:
+            while (message := recv_frame(self._sock)) is not None:
+                if "event" in message:
+                    for callback in list(self._subscribers):
+                        callback(message)
+                    continue
+
+                future = self._waiting.pop(message.get("id"), None)
+                if future is not None:
+                    future.set_result(message)
+        except (OSError, ValueError) as e:
+            error = ConnectionError(f"The connection to the server was lost: {str(e)}")
+        finally:
+            self._lost = error
+            while self._waiting:
+                self._waiting.popitem()[1].set_exception(error)
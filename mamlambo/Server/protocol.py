@@ -0,0 +1,85 @@
+import asyncio
+import json
+import socket
+import struct
+from typing import Any
+
+# Every message is a JSON object, preceded by its length in bytes as a 4-byte big-endian unsigned integer
+HEADER = struct.Struct(">I")
+
+# The largest message accepted, so that a broken or hostile peer cannot make the other side allocate without bound
+MAX_FRAME = 64 * 1024 * 1024
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 7625
+
+
+def encode_frame(message: dict[str, Any]) -> bytes:
+    """Encode a message into a frame: its length followed by its compact UTF-8 JSON. Dates are sent as strings."""
+    payload = json.dumps(message, separators=(",", ":"), default=str).encode("utf-8")
+    if len(payload) > MAX_FRAME:
+        raise ValueError(f"The message is too large: {len(payload)} bytes.")
+    return HEADER.pack(len(payload)) + payload
+
+
+def decode_payload(payload: bytes) -> dict[str, Any]:
+    """Decode the JSON of a frame, without its length."""
+    message = json.loads(payload.decode("utf-8"))
+    if not isinstance(message, dict):
+        raise ValueError("A message has to be a JSON object.")
+    return message
+
+
+def _check_length(length: int) -> int:
+    if length > MAX_FRAME:
+        raise ValueError(f"The message is too large: {length} bytes.")
+    return length
+
+
+async def read_frame(reader: asyncio.StreamReader) -> dict[str, Any] | None:
+    """
+    Read a single message from an asyncio stream.
+
+    :return: The message, or `None` if the stream ended between two messages.
+    :raises ValueError: If the message is too large or not a JSON object.
+    :raises asyncio.IncompleteReadError: If the stream ended in the middle of a message.
+    """
+    try:
+        header = await reader.readexactly(HEADER.size)
+    except asyncio.IncompleteReadError as e:
+        if not e.partial:
+            return None
+        raise
+    (length,) = HEADER.unpack(header)
+    return decode_payload(await reader.readexactly(_check_length(length)))
+
+
+def recv_frame(sock: socket.socket) -> dict[str, Any] | None:
+    """
+    Read a single message from a blocking socket, see `read_frame`.
+
+    :raises ConnectionError: If the connection was closed in the middle of a message.
+    """
+    header = _recv_exactly(sock, HEADER.size)
+    if header is None:
+        return None
+    (length,) = HEADER.unpack(header)
+    payload = _recv_exactly(sock, _check_length(length))
+    if payload is None:
+        raise ConnectionError("The connection was closed in the middle of a message.")
+    return decode_payload(payload)
+
+
+def _recv_exactly(sock: socket.socket, size: int) -> bytes | None:
+    """Receive exactly `size` bytes, or `None` if the connection was closed before any of them arrived."""
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        count = sock.recv_into(view[received:])
+        if count == 0:
+            if received == 0:
+                return None
+            raise ConnectionError("The connection was closed in the middle of a message.")
+        received += count
+    return bytes(buffer)
@@ -0,0 +1,309 @@
+import asyncio
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, Callable
+
+from mamlambo.Database import DatabaseView, create_database
+from mamlambo.Database.query import SortKey, parse_filter_text
+from mamlambo.Database.statistics import partition_statistics, statistics_report
+from mamlambo.Diagnostics import instruments
+from mamlambo.Enums.enums import Action
+from mamlambo.Server.protocol import DEFAULT_HOST, DEFAULT_PORT, encode_frame, read_frame
+from mamlambo.Transactions import Transaction
+
+# The number of transactions returned by a query when the client does not ask for a page size
+DEFAULT_PAGE = 50
+
+
+class ReadWriteLock:
+    """
+    An asyncio lock letting in any number of readers at once, or a single writer.
+    A waiting writer keeps new readers out, so that a steady stream of reads cannot starve the writes.
+    """
+    def __init__(self):
+        self._condition = asyncio.Condition()
+        self._readers = 0
+        self._writing = False
+        self._waiting_writers = 0
+
+    @asynccontextmanager
+    async def read(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: not self._writing and self._waiting_writers == 0)
+            self._readers += 1
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self._readers -= 1
+                self._condition.notify_all()
+
+    @asynccontextmanager
+    async def write(self):
+        async with self._condition:
+            self._waiting_writers += 1
+            try:
+                await self._condition.wait_for(lambda: not self._writing and self._readers == 0)
+            finally:
+                self._waiting_writers -= 1
+            self._writing = True
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self._writing = False
+                self._condition.notify_all()
+
+
+class ClientSession:
+    """The state of a single connected client: its view of the ledger and the changes it did not commit yet."""
+    def __init__(self, writer: asyncio.StreamWriter):
+        self.writer = writer
+        self.view: DatabaseView | None = None  # Created by the first query
+        self.query: tuple | None = None  # The sort key, order and filters the view was last sorted by
+        self.version: int | None = None  # The version of the ledger the positions in the view refer to
+        self.pending: list[tuple[str, int | None, Transaction | None]] = []  # The action, database index and value
+        self.subscribed = False
+
+    def send(self, message: dict[str, Any]) -> None:
+        """Send a message without waiting for it to be written, see `LedgerServer._respond`."""
+        if not self.writer.is_closing():
+            self.writer.write(encode_frame(message))
+
+    def close(self) -> None:
+        if self.view is not None:
+            self.view.close()
+            self.view = None
+
+
+class LedgerServer:
+    """
+    Hosts a single ledger in memory and shares it with any number of clients over a local socket,
+    see `mamlambo.Server.protocol` for the framing of the messages.
+
+    A request is a JSON object with an `id`, the `op` to run and its arguments; the response carries the same `id`
+    and either the `result` or an `error`. The requests of a client are run one after another, those of different
+    clients concurrently: the reads (`query`, `statistics`, `save`) run on worker threads at the same time,
+    while the writes (`load`, `commit`, `revert`) wait for them and run one at a time.
+
+    Every client has its own view of the ledger, and its own changes (`add`, `edit`, `remove`), applied together
+    by its `commit`. The changes refer to the positions of the client's last query; if another client changed
+    the ledger since then, the commit is refused and the client has to query again. Subscribed clients are sent
+    an event after every change of the ledger, the way `DatabaseView.subscribe` notifies its callbacks.
+    """
+    def __init__(self, filename: str | None = None, cache_budget: int | None = None):
+        """
+        :param filename: The ledger to serve, loaded by `start`. Without it, the server starts with an empty ledger.
+        :param cache_budget: See `create_database`.
+        """
+        self.filename = filename
+        self.database = create_database(filename, cache_budget)
+        self.version = 0  # Increased by every load, commit and revert
+        self._lock = ReadWriteLock()
+        self._sessions: set[ClientSession] = set()
+        self._server: asyncio.Server | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._handlers: dict[str, tuple[Callable, bool | None]] = {
+            # The handler and whether it changes the ledger (`None` if it does not even read it)
+            "load": (self._load, True),
+            "query": (self._query, False),
+            "add": (self._add, None),
+            "edit": (self._edit, False),
+            "remove": (self._remove, False),
+            "discard": (self._discard, None),
+            "commit": (self._commit, True),
+            "revert": (self._revert, True),
+            "statistics": (self._statistics, False),
+            "save": (self._save, False),
+            "subscribe": (self._subscribe, None),
+            "unsubscribe": (self._unsubscribe, None),
+        }
+        self.database.subscribe(self._on_change)
+
+    async def start(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, path: str | None = None) -> None:
+        """
+        Load the ledger and start listening, on a Unix socket if `path` is given, on a TCP port otherwise.
+        Only listen on a local address: the clients are not authenticated.
+        """
+        self._loop = asyncio.get_running_loop()
+        if self.filename is not None and Path(self.filename).exists():
+            async with self._lock.write():
+                await asyncio.to_thread(self.database.load, self.filename, Transaction.parse)
+
+        if path is not None:
+            self._server = await asyncio.start_unix_server(self._serve_client, path)
+        else:
+            self._server = await asyncio.start_server(self._serve_client, host, port)
+
+    def addresses(self) -> list:
+        """Return the addresses the server listens on, e.g. to find out the port it was given."""
+        return [sock.getsockname() for sock in self._server.sockets]
+
+    async def serve_forever(self) -> None:
+        await self._server.serve_forever()
+
+    async def close(self) -> None:
+        """Stop listening and disconnect all clients."""
+        if self._server is not None:
+            self._server.close()
+        for session in list(self._sessions):
+            session.writer.close()
+            session.close()
+        if self._server is not None:
+            await self._server.wait_closed()
+        self.database.unsubscribe(self._on_change)
+
+    async def _serve_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        session = ClientSession(writer)
+        self._sessions.add(session)
+        try:
+            while (request := await read_frame(reader)) is not None:
+                await self._respond(session, request)
+        except (ValueError, asyncio.IncompleteReadError, ConnectionError):
+            pass  # A broken message or connection, the client is dropped
+        finally:
+            self._sessions.discard(session)
+            session.close()
+            writer.close()
+
+    async def _respond(self, session: ClientSession, request: dict) -> None:
+        request_id = request.get("id")
+        handler = self._handlers.get(request.get("op"))
+        with instruments.probe(f"server.{request.get('op')}"):
+            try:
+                if handler is None:
+                    raise ValueError(f"Unknown operation: {request.get('op')}")
+                function, writes = handler
+                if writes is None:
+                    result = function(session, request)
+                elif writes:
+                    async with self._lock.write():
+                        result = await asyncio.to_thread(function, session, request)
+                else:
+                    async with self._lock.read():
+                        result = await asyncio.to_thread(function, session, request)
+                response = {"id": request_id, "result": result}
+            except Exception as e:  # Reported to the client, the server keeps serving the others
+                response = {"id": request_id, "error": str(e) or type(e).__name__}
+
+        session.send(response)
+        await session.writer.drain()
+
+    def _on_change(self, action: Action, changes: list[dict]) -> None:
+        # Called on the worker thread running a write, the clients are notified from the event loop
+        if action not in (Action.LOAD, Action.COMMIT, Action.REVERT):
+            return
+        self.version += 1
+        event = {"event": action.name.lower(), "version": self.version, "changes": len(changes)}
+        self._loop.call_soon_threadsafe(self._broadcast, event)
+
+    def _broadcast(self, event: dict) -> None:
+        for session in self._sessions:
+            if session.subscribed:
+                session.send(event)
+
+    def _load(self, session: ClientSession, request: dict) -> dict:
+        filename = request["filename"]
+        self.database.load(filename, Transaction.parse)
+        self.filename = filename
+        return {"count": len(self.database), "version": self.version}
+
+    def _query(self, session: ClientSession, request: dict) -> dict:
+        sort, descending = request.get("sort", "Date"), bool(request.get("descending", True))
+        texts = tuple(request.get("filters", []))
+        if session.view is None:
+            session.view = DatabaseView(SortKey(sort), descending, database=self.database,
+                                        filters=[parse_filter_text(text) for text in texts])
+        elif (sort, descending, texts) != session.query:
+            session.view.sort_by(SortKey(sort), descending, [parse_filter_text(text) for text in texts])
+        session.query = (sort, descending, texts)
+        session.version = self.version
+
+        offset = max(0, int(request.get("offset", 0)))
+        limit = max(0, int(request.get("limit", DEFAULT_PAGE)))
+        return {
+            "version": self.version,
+            "total": len(session.view),
+            "offset": offset,
+            "rows": [transaction.dump() for transaction in session.view[offset:offset + limit]],
+        }
+
+    def _add(self, session: ClientSession, request: dict) -> dict:
+        session.pending.append(("add", None, Transaction.parse(request["values"])))
+        return {"pending": len(session.pending)}
+
+    def _edit(self, session: ClientSession, request: dict) -> dict:
+        value = Transaction.parse(request["values"])
+        session.pending.append(("update", self._database_index(session, request), value))
+        return {"pending": len(session.pending)}
+
+    def _remove(self, session: ClientSession, request: dict) -> dict:
+        session.pending.append(("remove", self._database_index(session, request), None))
+        return {"pending": len(session.pending)}
+
+    def _database_index(self, session: ClientSession, request: dict) -> int:
+        """Find the transaction at the position of the client's last query."""
+        if session.view is None:
+            raise ValueError("Query the ledger before changing its transactions.")
+        position = int(request["position"])
+        if not 0 <= position < len(session.view):
+            raise IndexError(f"No transaction at position {position}.")
+        return session.view.database_index(position)
+
+    def _discard(self, session: ClientSession, request: dict) -> dict:
+        session.pending.clear()
+        return {"pending": 0}
+
+    def _commit(self, session: ClientSession, request: dict) -> dict:
+        pending, session.pending = session.pending, []
+        if not pending:
+            return {"version": self.version}
+        if session.version != self.version and any(action != "add" for action, _, _ in pending):
+            raise ValueError("The ledger was changed by another client, query it again and repeat the changes.")
+
+        for action, index, value in pending:
+            match action:
+                case "add":
+                    self.database.add(value)
+                case "update":
+                    self.database.edit(index, value)
+                case "remove":
+                    self.database.remove(index)
+        self.database.commit()
+        return {"version": self.version}
+
+    def _revert(self, session: ClientSession, request: dict) -> dict:
+        if not self.database.get_history():
+            raise ValueError("No commit to revert.")
+        self.database.revert()
+        return {"version": self.version}
+
+    def _statistics(self, session: ClientSession, request: dict) -> dict:
+        filters = [parse_filter_text(text) for text in request.get("filters", [])]
+        return statistics_report(partition_statistics(self.database, filters))
+
+    def _save(self, session: ClientSession, request: dict) -> dict:
+        filename = request.get("filename", self.filename)
+        if filename is None:
+            raise ValueError("The ledger has no file to be saved to.")
+        self.database.dump(Path(filename))
+        return {"filename": str(filename)}
+
+    def _subscribe(self, session: ClientSession, request: dict) -> dict:
+        session.subscribed = True
+        return {"version": self.version}  # Lets the new subscriber know the current state
+
+    def _unsubscribe(self, session: ClientSession, request: dict) -> dict:
+        session.subscribed = False
+        return {"version": self.version}
+
+
+async def serve(filename: str | None, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, path: str | None = None,
+                cache_budget: int | None = None) -> None:
+    """Serve the ledger until the task is cancelled, see `LedgerServer`."""
+    server = LedgerServer(filename, cache_budget)
+    await server.start(host, port, path)
+    try:
+        await server.serve_forever()
+    finally:
+        await server.close()
@@ -1 +1,2 @@
+from .money import Money
 from .transaction import Transaction
@@ -1,21 +1,119 @@
-from typing import Any
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from datetime import date
+from typing import Any, Iterable
+
+from mamlambo.Diagnostics import instruments
+from mamlambo.Transactions.money import Money
+
+
+class RateSeries:
+    """The rates of a single currency pair in time, sorted by the dates they are effective from."""
+    def __init__(self):
+        self.dates: list[date] = []
+        self.rates: list[float] = []
+
+    def set(self, effective: date, rate: float) -> None:
+        """Set the rate effective from the given date (until the next one), replacing the one from the same date."""
+        i = bisect_left(self.dates, effective)
+        if i < len(self.dates) and self.dates[i] == effective:
+            self.rates[i] = rate
+        else:
+            self.dates.insert(i, effective)
+            self.rates.insert(i, rate)
+
+    def rate_at(self, on: date) -> float:
+        """
+        Return the rate effective on the given date.
+
+        :raises KeyError: If no rate is effective yet on the date.
+        """
+        i = bisect_right(self.dates, on) - 1
+        if i < 0:
+            raise KeyError(on)
+        return self.rates[i]
 
 
 class Converter:
+    """
+    Converts amounts between currencies, using the conversions from the configuration.
+
+    A conversion may have a `Date` (in the YYYY-MM-DD format) from which its rate is effective,
+    until the next conversion of the same pair. A conversion without a date is effective from the beginning,
+    so a configuration without any dates has a single rate per pair.
+    """
     def __init__(self, conversion_data: list[dict[str, Any]]) -> None:
         self._conversions: dict[str, set[str]] = dict()
-        self._conversion_values: dict[str, dict[str, float]] = dict()
-        self._find_conversions(conversion_data)
+        self._conversion_values: dict[str, dict[str, RateSeries]] = dict()
+        with instruments.probe("converter.build") as probe:
+            self._find_conversions(conversion_data)
+            probe.rows = len(conversion_data)
 
-    def convert(self, from_currency: str, to_currency: str, value: float) -> str:
+    def rate(self, from_currency: str, to_currency: str, on: date = None) -> float:
+        """
+        Return the rate of the conversion effective on the given date, found by a binary search
+        in the rates of the pair (see `RateSeries`).
+
+        :param on: The date of the conversion, today if not given.
+        :raises KeyError: If the currencies cannot be converted (on that date).
+        """
         if from_currency == to_currency:
-            return "{:.2f}".format(value)
+            return 1.0
+
+        return self._conversion_values[from_currency][to_currency].rate_at(date.today() if on is None else on)
 
+    def convert(self, from_currency: str, to_currency: str, value: float | Money, on: date = None) -> str:
+        """Convert the value at the rate effective on the given date (today if not given), formatted for display."""
         try:
-            return "{:.2f}".format(value * self._conversion_values[from_currency][to_currency])
+            return "{:.2f}".format(float(value) * self.rate(from_currency, to_currency, on))
         except KeyError:
             return "Unsupported conversion"
 
+    def convert_many(self, currencies: Iterable[str], to_currency: str, values: Iterable[float | Money],
+                     dates: Iterable[date]) -> list[float | None]:
+        """
+        Convert whole columns of values (e.g. the amounts of a ledger) into a single currency,
+        each at the rate effective on its date.
+
+        The values of every currency are ordered by their dates and walked through along with the rates
+        of the currency, so each rate is looked up only once, however many values share it.
+
+        :param currencies: The currency of every value.
+        :param to_currency: The currency to convert to.
+        :param values: The values to convert, e.g. the amounts of the transactions.
+        :param dates: The date of every value.
+        :return: The converted values as floats (the rates are floats), `None` for values that cannot be converted.
+        """
+        values = [float(value) for value in values]
+        dates = list(dates)
+        result: list[float | None] = [None] * len(values)
+
+        positions = defaultdict(list)
+        for i, currency in enumerate(currencies):
+            positions[currency].append(i)
+
+        with instruments.probe("converter.convert_many") as probe:
+            for currency, indices in positions.items():
+                if currency == to_currency:
+                    for i in indices:
+                        result[i] = values[i]
+                    continue
+
+                series = self._conversion_values.get(currency, dict()).get(to_currency)
+                if series is None:
+                    continue
+
+                indices.sort(key=dates.__getitem__)
+                current = -1  # The index of the rate effective on the current date
+                for i in indices:
+                    while current + 1 < len(series.dates) and series.dates[current + 1] <= dates[i]:
+                        current += 1
+                    if current >= 0:
+                        result[i] = values[i] * series.rates[current]
+            probe.rows = len(values)
+
+        return result
+
     def get_available_conversions(self, currency: str) -> list[str]:
         try:
             return list(self._conversions[currency])
@@ -33,16 +131,10 @@ class Converter:
             from_node = entry['#1']
             to_node = entry['#2']
             value = entry['Value']
+            effective = date.fromisoformat(entry['Date']) if 'Date' in entry else date.min
 
-            if from_node not in graph:
-                graph[from_node] = {to_node: value}
-            else:
-                graph[from_node][to_node] = value
-
-            if to_node not in graph:
-                graph[to_node] = {from_node: 1/value}
-            else:
-                graph[to_node][from_node] = 1/value
+            graph.setdefault(from_node, dict()).setdefault(to_node, RateSeries()).set(effective, value)
+            graph.setdefault(to_node, dict()).setdefault(from_node, RateSeries()).set(effective, 1/value)
 
             if from_node not in conversions:
                 conversions[from_node] = set()
@@ -13,5 +13,8 @@ class Group:
     def __eq__(self, other):
         return self.name == other.name
 
+    def __hash__(self):
+        return hash(self.name)
+
     def __lt__(self, other):
         return self.name < other.name
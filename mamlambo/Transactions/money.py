@@ -0,0 +1,201 @@
+import math
+import sys
+from decimal import Decimal, InvalidOperation
+from fractions import Fraction
+from typing import Iterable
+
+# The number of decimals of the currencies whose minor unit is not a hundredth, see ISO 4217
+CURRENCY_SCALES = {
+    "BIF": 0, "CLP": 0, "DJF": 0, "GNF": 0, "ISK": 0, "JPY": 0, "KMF": 0, "KRW": 0, "PYG": 0, "RWF": 0,
+    "UGX": 0, "UYI": 0, "VND": 0, "VUV": 0, "XAF": 0, "XOF": 0, "XPF": 0,
+    "BHD": 3, "IQD": 3, "JOD": 3, "KWD": 3, "LYD": 3, "OMR": 3, "TND": 3,
+    "CLF": 4, "UYW": 4,
+}
+
+# The number of decimals of the other currencies
+DEFAULT_SCALE = 2
+
+# The most decimals an amount can have, that of the finest minor unit of ISO 4217
+MAX_SCALE = 4
+
+# The powers of ten turning units of every scale into units of `MAX_SCALE`, see `Money.exact`
+_FACTORS = tuple(10 ** (MAX_SCALE - scale) for scale in range(MAX_SCALE + 1))
+
+# Python hashes every number by its rational value modulo this prime, see `Money.__hash__`
+_MODULUS = sys.hash_info.modulus
+_INVERSE = pow(_FACTORS[0], -1, _MODULUS)
+
+
+def currency_scale(currency: str | None) -> int:
+    """Return the number of decimals of the currency's minor unit, e.g. 2 for cents or 0 for the yen."""
+    return CURRENCY_SCALES.get(currency, DEFAULT_SCALE)
+
+
+class Money:
+    """
+    An exact amount of money: an integer number of minor units along with the number of their decimals
+    (the scale), e.g. 12.30 CZK is 1230 units of the scale 2. An amount has the scale of its currency
+    (see `currency_scale`), or more if it has more decimals, up to `MAX_SCALE`.
+
+    Amounts of any scale are compared and summed exactly as integers, through `exact`, their units
+    of the largest scale. An amount is compared with a plain number by its exact value as well,
+    the same as a `Decimal`, so `Money.parse("1.50") == 1.5` but `Money.parse("0.10") != 0.1`,
+    as the float closest to 0.1 is not exactly a tenth. That is what the aggregations (statistics, pivot tables, balances) do
+    with millions of amounts, and what the views sort by, instead of comparing the amounts one by one.
+    """
+    __slots__ = ("units", "scale")
+
+    def __init__(self, units: int, scale: int = DEFAULT_SCALE):
+        """
+        :param units: The number of minor units.
+        :param scale: The number of decimals of the minor unit, at most `MAX_SCALE`.
+        """
+        if not 0 <= scale <= MAX_SCALE:
+            raise ValueError(f"The scale of an amount has to be between 0 and {MAX_SCALE}.")
+        self.units = units
+        self.scale = scale
+
+    @staticmethod
+    def parse(value: str | int | float, scale: int = DEFAULT_SCALE) -> "Money":
+        """
+        Parse a decimal amount exactly, e.g. `-12.3`. A float is read by its shortest representation,
+        so an amount with a few decimals is read back as it was written.
+
+        :param value: The amount, a decimal number without an exponent is parsed fastest.
+        :param scale: The least scale of the amount, usually that of its currency. More decimals raise it.
+        :raises ValueError: If the value is not a finite number with at most `MAX_SCALE` decimals.
+        """
+        text = value if isinstance(value, str) else repr(value)
+        whole, _, fraction = text.partition(".")
+        digits = len(fraction)
+        if (digits == 0 or fraction.isdecimal()) and "_" not in text:
+            if digits > scale:
+                fraction = fraction.rstrip("0")
+                digits = len(fraction)
+                scale = max(scale, digits)
+            try:
+                units = int(whole + fraction) * 10 ** (scale - digits)
+            except ValueError:
+                pass  # E.g. an exponent or a missing integer part, left to the decimal parser
+            else:
+                if scale <= MAX_SCALE:
+                    return Money(units, scale)
+                raise ValueError(f"An amount can have at most {MAX_SCALE} decimals.")
+        return Money._parse_decimal(text, scale)
+
+    @staticmethod
+    def _parse_decimal(text: str, scale: int) -> "Money":
+        try:
+            number = Decimal(text)
+        except InvalidOperation:
+            number = None
+        if number is None or not number.is_finite() or "_" in text:
+            raise ValueError("Incorrect amount format. Possible cause: using comma instead of a dot.")
+
+        exponent = number.normalize().as_tuple().exponent
+        scale = max(scale, -exponent)
+        if scale > MAX_SCALE:
+            raise ValueError(f"An amount can have at most {MAX_SCALE} decimals.")
+        return Money(int(number.scaleb(scale)), scale)
+
+    @staticmethod
+    def of_exact(exact: int, scale: int = DEFAULT_SCALE) -> "Money":
+        """
+        Return the amount of the given units of `MAX_SCALE` (e.g. a sum of `exact`), with the least scale
+        showing it exactly that is at least the given one.
+        """
+        while scale < MAX_SCALE and exact % _FACTORS[scale]:
+            scale += 1
+        return Money(exact // _FACTORS[scale], scale)
+
+    @staticmethod
+    def total(amounts: Iterable["Money"], scale: int = DEFAULT_SCALE) -> "Money":
+        """Return the exact sum of the amounts, with at least the given scale."""
+        return Money.of_exact(sum(amount.exact for amount in amounts), scale)
+
+    @property
+    def exact(self) -> int:
+        """The amount in units of `MAX_SCALE`, so that amounts of different scales can be summed and compared."""
+        return self.units * _FACTORS[self.scale]
+
+    def __str__(self):
+        if self.scale == 0:
+            return str(self.units)
+        whole, fraction = divmod(abs(self.units), 10 ** self.scale)
+        return f"{'-' if self.units < 0 else ''}{whole}.{fraction:0{self.scale}d}"
+
+    def __repr__(self):
+        return f"Money('{self}')"
+
+    def __format__(self, spec: str) -> str:
+        """Format the amount exactly, e.g. rounded half to even by `.2f`, as a `Decimal`."""
+        if not spec:
+            return str(self)
+        return format(Decimal(self.units).scaleb(-self.scale), spec)
+
+    def __float__(self):
+        return self.units / 10 ** self.scale
+
+    def __bool__(self):
+        return self.units != 0
+
+    def __neg__(self):
+        return Money(-self.units, self.scale)
+
+    def __abs__(self):
+        return Money(abs(self.units), self.scale)
+
+    def __add__(self, other):
+        if not isinstance(other, Money):
+            return NotImplemented
+        if other.scale == self.scale:
+            return Money(self.units + other.units, self.scale)
+        return Money.of_exact(self.exact + other.exact, min(self.scale, other.scale))
+
+    def __radd__(self, other):
+        if other == 0:
+            return self  # The start of `sum`
+        return NotImplemented
+
+    def __sub__(self, other):
+        if not isinstance(other, Money):
+            return NotImplemented
+        return self + -other
+
+    def __eq__(self, other):
+        difference = self._difference(other)
+        return NotImplemented if difference is None else difference == 0
+
+    def __hash__(self):
+        # The hash of the equal numbers, as Python hashes a fraction n / d by n times the inverse of d
+        value = abs(self.exact) * _INVERSE % _MODULUS
+        value = -value if self.exact < 0 else value
+        return -2 if value == -1 else value
+
+    def __lt__(self, other):
+        difference = self._difference(other)
+        return NotImplemented if difference is None else difference < 0
+
+    def __le__(self, other):
+        difference = self._difference(other)
+        return NotImplemented if difference is None else difference <= 0
+
+    def __gt__(self, other):
+        difference = self._difference(other)
+        return NotImplemented if difference is None else difference > 0
+
+    def __ge__(self, other):
+        difference = self._difference(other)
+        return NotImplemented if difference is None else difference >= 0
+
+    def _difference(self, other) -> int | float | Fraction | None:
+        """Return a number with the sign of the exact difference, comparing infinities and NaN as floats."""
+        if isinstance(other, Money):
+            return self.exact - other.exact
+        if isinstance(other, int):
+            return self.exact - other * _FACTORS[0]
+        if isinstance(other, float):
+            if not math.isfinite(other):
+                return float(self) - other
+            return Fraction(self.exact, _FACTORS[0]) - Fraction(other)
+        return None
@@ -1,5 +1,19 @@
+import csv
+import hashlib
 from datetime import date
 from mamlambo.Transactions.group import Group
+from mamlambo.Transactions.money import Money, currency_scale
+
+
+class _Echo:
+    """A file-like object returning what is written into it, so that `csv.writer.writerow` returns the formatted row."""
+    @staticmethod
+    def write(line: str) -> str:
+        return line
+
+
+# The writers formatting the CSV lines, by their delimiter
+_CSV_WRITERS = dict()
 
 
 class Transaction:
@@ -14,6 +28,8 @@ class Transaction:
         self._amount = amount
         self._currency = currency
         self._note = note
+        self._line: bytes | None = None  # The cached CSV line, see `csv_line`
+        self._line_delimiter: str | None = None
 
     def __eq__(self, other):
         if isinstance(other, Transaction):
@@ -25,6 +41,31 @@ class Transaction:
                     self._note == other._note)
         return False
 
+    def __hash__(self):
+        return hash((self._date, self._title, self._group, self._amount, self._currency, self._note))
+
+    def content_hash(self) -> str:
+        """
+        Return a digest of the transaction's values. Unlike `hash`, it is the same in every run of the program,
+        so it can be stored or compared between processes.
+        """
+        return hashlib.blake2b("\x1f".join(self.dump()).encode("utf-8"), digest_size=16).hexdigest()
+
+    def csv_line(self, delimiter: str = ',') -> bytes:
+        """
+        Return the transaction as a UTF-8 encoded CSV line, formatted the same way as by `csv.writer`.
+
+        The line is cached, since a transaction never changes (an edit replaces it by a new one),
+        so saving a ledger again only formats the transactions added or edited since it was last saved.
+        """
+        if self._line is None or self._line_delimiter != delimiter:
+            writer = _CSV_WRITERS.get(delimiter)
+            if writer is None:
+                writer = _CSV_WRITERS[delimiter] = csv.writer(_Echo(), delimiter=delimiter)
+            self._line = writer.writerow(self.dump()).encode("utf-8")
+            self._line_delimiter = delimiter
+        return self._line
+
     def to_dict(self) -> dict[str, str]:
         values = self.dump()
         result = {key: value for key, value in zip(self.value_names, values)}
@@ -66,11 +107,9 @@ class Transaction:
             raise ValueError("Incorrect date format. The format is\nYYYY-MM-DD")
 
     @staticmethod
-    def validate_amount(value: str):
-        try:
-            return float(value)
-        except ValueError:
-            raise ValueError("Incorrect amount format. Possible cause: using comma instead of a dot.")
+    def validate_amount(value: str, currency: str = None) -> Money:
+        """Parse the amount exactly, with the scale of the currency (see `Money.parse`)."""
+        return Money.parse(value, currency_scale(currency))
 
     @staticmethod
     def validate_currency(code: str):
@@ -80,19 +119,12 @@ class Transaction:
 
     @staticmethod
     def parse(row):
-        parsers = [
-            Transaction.validate_date,
-            str,
-            Group,
-            Transaction.validate_amount,
-            Transaction.validate_currency,
-            str
-        ]
-
-        if len(row) < len(parsers):
+        if len(row) < len(Transaction.value_names):
             raise ValueError("Not enough data.")
-        parsed = [func(val) for func, val in zip(parsers, row)]
-        return Transaction(*parsed)
+        # The currency is validated first, as the amount is parsed with its scale
+        currency = Transaction.validate_currency(row[4])
+        return Transaction(Transaction.validate_date(row[0]), str(row[1]), Group(row[2]),
+                           Transaction.validate_amount(row[3], currency), currency, str(row[5]))
 
     def dump(self):
         values = [
@@ -0,0 +1,300 @@
+"""
+Headless command-line interface of Mamlambo. Works on top of the same data layer as the GUI,
+but never imports Tk or matplotlib, so it can run on servers without a display.
+
+Usage:
+    python -m mamlambo export ledger.csv --filter "Currency == CZK" --sort amount -o report.json
+    python -m mamlambo stats ledger.csv --filter "Date >= 2024-01-01"
+    python -m mamlambo pivot ledger.csv --rows group:2 --columns month --filter "Currency == CZK" -o pivot.csv
+    python -m mamlambo import ledger.csv january.csv february.csv
+    python -m mamlambo partition ledger.csv ledger/ --by month
+    python -m mamlambo merge year.csv january.csv february.csv march.csv
+    python -m mamlambo serve ledger.csv --port 7625
+
+Ledgers ending in `.sqlite` (or `.sqlite3`, `.db`) are SQLite databases, filtered and sorted in SQL.
+Ledgers may also be JSON or JSON Lines files, and any of them compressed, e.g. `ledger.csv.gz` or `ledger.jsonl.xz`.
+"""
+import argparse
+import csv
+import json
+import sys
+from pathlib import Path
+from typing import Iterable, TextIO
+
+from mamlambo.Database import Database, DatabaseView, create_database
+from mamlambo.Database.compression import ledger_format, open_text
+from mamlambo.Database.partition import PARTITION_SCHEMES
+from mamlambo.Database.pivot import PIVOT_DIMENSIONS, PIVOT_MEASURES, PivotTable
+from mamlambo.Database.query import Filter, SortKey, parse_filter_text
+from mamlambo.Database.statistics import partition_statistics, statistics_report
+from mamlambo.Enums.enums import DuplicatePolicy
+from mamlambo.Server.protocol import DEFAULT_HOST, DEFAULT_PORT
+from mamlambo.Transactions import Transaction
+
+SORT_KEYS: dict[str, SortKey] = {
+    "date": SortKey("Date"),
+    "title": SortKey("Title"),
+    "group": SortKey("Group"),
+    "amount": SortKey("Amount"),
+    "currency": SortKey("Currency"),
+}
+
+
+DUPLICATE_POLICIES: dict[str, DuplicatePolicy] = {
+    "keep": DuplicatePolicy.KEEP,
+    "skip": DuplicatePolicy.SKIP_EXACT,
+    "skip-near": DuplicatePolicy.SKIP_ALL,
+}
+
+
+def parse_cli_filter(text: str) -> Filter:
+    """
+    Parse a filter given on the command line, e.g. `Amount > 50`.
+    The property name is case-insensitive, the rest follows the syntax of the Filters window.
+    """
+    try:
+        return parse_filter_text(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def open_view(filename: str, filters: list[Filter], sort: str, descending: bool) -> DatabaseView:
+    """Load a ledger into a new view, filtered and sorted as requested."""
+    # The view is filtered from the start, so the loaded ledger is filtered and sorted only once
+    view = DatabaseView(SORT_KEYS[sort], descending, database=create_database(filename), filters=filters)
+    view.load(filename, Transaction.parse)
+    return view
+
+
+def write_csv(transactions: Iterable[Transaction], stream: TextIO, delimiter: str = ",") -> int:
+    """
+    Stream the transactions into a header-less CSV, row by row.
+
+    :return: The number of written transactions.
+    """
+    writer = csv.writer(stream, delimiter=delimiter)
+    count = 0
+    for transaction in transactions:
+        writer.writerow(transaction.dump())
+        count += 1
+    return count
+
+
+def write_json(transactions: Iterable[Transaction], stream: TextIO) -> int:
+    """
+    Stream the transactions into a JSON array, one object per line, without building the whole document in memory.
+
+    :return: The number of written transactions.
+    """
+    count = 0
+    stream.write("[")
+    for transaction in transactions:
+        stream.write(",\n    " if count > 0 else "\n    ")
+        stream.write(json.dumps(transaction.to_dict()))
+        count += 1
+    stream.write("\n]\n" if count > 0 else "]\n")
+    return count
+
+
+def write_jsonl(transactions: Iterable[Transaction], stream: TextIO) -> int:
+    """
+    Stream the transactions into JSON Lines, one object per line.
+
+    :return: The number of written transactions.
+    """
+    count = 0
+    for transaction in transactions:
+        stream.write(json.dumps(transaction.to_dict()) + "\n")
+        count += 1
+    return count
+
+
+def _output_stream(output: str | None) -> TextIO:
+    if output is None or output == "-":
+        return sys.stdout
+    return open_text(output, "w")  # Compressed by the codec of the extension, if any
+
+
+def _export_command(args) -> int:
+    view = open_view(args.ledger, args.filters, args.sort, args.descending)
+    fmt = args.format
+    if fmt is None:
+        fmt = ledger_format(args.output)[0] if args.output is not None else None
+        fmt = "csv" if fmt is None else fmt[1:]
+
+    stream = _output_stream(args.output)
+    try:
+        if fmt == "json":
+            count = write_json(view, stream)
+        elif fmt == "jsonl":
+            count = write_jsonl(view, stream)
+        else:
+            count = write_csv(view, stream, args.delimiter)
+    finally:
+        if stream is not sys.stdout:
+            stream.close()
+
+    print(f"Exported {count} transactions.", file=sys.stderr)
+    return 0
+
+
+def _stats_command(args) -> int:
+    database = create_database(args.ledger)
+    database.load(args.ledger, Transaction.parse)
+    stream = _output_stream(args.output)
+    try:
+        json.dump(statistics_report(partition_statistics(database, args.filters)), stream, indent=4, default=str)
+        stream.write("\n")
+    finally:
+        if stream is not sys.stdout:
+            stream.close()
+    return 0
+
+
+def _pivot_command(args) -> int:
+    database = create_database(args.ledger)
+    database.load(args.ledger, Transaction.parse)
+    table = PivotTable(database, args.rows, args.columns, args.filters)
+    stream = _output_stream(args.output)
+    try:
+        count = table.write_csv(stream, args.measure, args.delimiter)
+    finally:
+        if stream is not sys.stdout:
+            stream.close()
+
+    print(f"Exported {count} rows of {len(table.column_labels())} columns.", file=sys.stderr)
+    return 0
+
+
+def _import_command(args) -> int:
+    view = DatabaseView(SORT_KEYS["date"], True, database=create_database(args.ledger))
+    if Path(args.ledger).exists():
+        view.load(args.ledger, Transaction.parse)
+
+    for source in args.sources:
+        database = Database()
+        database.load(source, Transaction.parse)
+        report = view.database.import_entries(database, DUPLICATE_POLICIES[args.duplicates])
+        # Committed right away, so that the overlaps of the sources are found as well
+        view.commit()
+        print(f"{source}: {len(report.added)} of {len(database)} transactions imported, "
+              f"{len(report.exact)} exact and {len(report.near)} near duplicates, {report.skipped} skipped.",
+              file=sys.stderr)
+        for transaction, similar in report.near:
+            print(f"    near duplicate: {','.join(transaction.dump())} (similar to \"{similar}\")", file=sys.stderr)
+
+    view.dump(Path(args.output if args.output is not None else args.ledger))
+    return 0
+
+
+def _partition_command(args) -> int:
+    database = Database(partition_by=args.by)
+    database.load(args.ledger, Transaction.parse)
+    database.dump_partitioned(Path(args.directory), args.delimiter)
+    print(f"Written {len(database.partitions())} partitions.", file=sys.stderr)
+    return 0
+
+
+def _merge_command(args) -> int:
+    database = Database()
+    database.load_many(args.sources, Transaction.parse, args.delimiter, args.workers)
+    database.dump(Path(args.output), args.delimiter)
+    print(f"Merged {len(database)} transactions.", file=sys.stderr)
+    return 0
+
+
+def _serve_command(args) -> int:
+    # Imported here, so that the other commands do not pay for importing asyncio
+    import asyncio
+    from mamlambo.Server import serve
+
+    print(f"Serving {args.ledger or 'an empty ledger'} on {args.socket or f'{args.host}:{args.port}'}, "
+          "press Ctrl+C to stop.", file=sys.stderr)
+    try:
+        asyncio.run(serve(args.ledger, args.host, args.port, args.socket))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m mamlambo", description="Headless Mamlambo ledger tools.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    filter_args = argparse.ArgumentParser(add_help=False)
+    filter_args.add_argument("-f", "--filter", dest="filters", action="append", type=parse_cli_filter,
+                             default=[], help="A filter such as \"Amount > 50\", can be repeated.")
+
+    export = commands.add_parser("export", parents=[filter_args], help="Filter, sort and export a ledger.")
+    export.add_argument("ledger", help="The ledger file or SQLite database, or the directory of a partitioned one.")
+    export.add_argument("-s", "--sort", choices=list(SORT_KEYS.keys()), default="date",
+                        help="The property to sort by.")
+    export.add_argument("--ascending", dest="descending", action="store_false",
+                        help="Sort in ascending order instead of descending.")
+    export.add_argument("-o", "--output", help="The output file, standard output by default.")
+    export.add_argument("--format", choices=["csv", "json", "jsonl"],
+                        help="The output format, derived from the output file's extension by default.")
+    export.add_argument("-d", "--delimiter", default=",", help="The delimiter of the CSV output.")
+    export.set_defaults(handler=_export_command)
+
+    stats = commands.add_parser("stats", parents=[filter_args], help="Compute the statistics of a ledger.")
+    stats.add_argument("ledger", help="The ledger file or SQLite database, or the directory of a partitioned one.")
+    stats.add_argument("-o", "--output", help="The output JSON file, standard output by default.")
+    stats.set_defaults(handler=_stats_command)
+
+    pivot = commands.add_parser("pivot", parents=[filter_args],
+                                help="Summarize a ledger by two dimensions, e.g. by group and month, into a CSV.")
+    pivot.add_argument("ledger", help="The ledger file or SQLite database, or the directory of a partitioned one.")
+    pivot.add_argument("-r", "--rows", default="group", help=f"The dimension of the rows, one of "
+                       f"{', '.join(PIVOT_DIMENSIONS)} (any group:N level works).")
+    pivot.add_argument("-c", "--columns", default="month", help="The dimension of the columns, see --rows.")
+    pivot.add_argument("-m", "--measure", choices=PIVOT_MEASURES, default="sum",
+                       help="What to compute of the amounts in every cell.")
+    pivot.add_argument("-o", "--output", help="The output CSV file, standard output by default.")
+    pivot.add_argument("-d", "--delimiter", default=",", help="The delimiter of the CSV output.")
+    pivot.set_defaults(handler=_pivot_command)
+
+    bulk_import = commands.add_parser("import", help="Append several ledgers to a ledger.")
+    bulk_import.add_argument("ledger", help="The ledger to append to, created if it does not exist.")
+    bulk_import.add_argument("sources", nargs="+", help="The ledgers to import.")
+    bulk_import.add_argument("-o", "--output", help="Where to save the result, the ledger itself by default.")
+    bulk_import.add_argument("--duplicates", choices=list(DUPLICATE_POLICIES.keys()), default="skip",
+                             help="Whether to keep the duplicates of transactions already in the ledger, skip the "
+                                  "exact ones, or skip the near ones (same date, amount and currency, similar title) "
+                                  "as well.")
+    bulk_import.set_defaults(handler=_import_command)
+
+    partition = commands.add_parser("partition", help="Split a ledger into time partitions.")
+    partition.add_argument("ledger", help="The ledger to split.")
+    partition.add_argument("directory", help="The directory to write the partitions to.")
+    partition.add_argument("--by", choices=PARTITION_SCHEMES, default="month", help="The length of a partition.")
+    partition.add_argument("-d", "--delimiter", default=",", help="The delimiter of the CSV segments.")
+    partition.set_defaults(handler=_partition_command)
+
+    merge = commands.add_parser("merge", help="Merge several ledgers into one, sorted by date.")
+    merge.add_argument("output", help="The file to write the merged ledger to, e.g. merged.csv or merged.jsonl.gz.")
+    merge.add_argument("sources", nargs="+", help="The ledgers to merge.")
+    merge.add_argument("-w", "--workers", type=int,
+                       help="The number of worker processes, the number of CPUs by default.")
+    merge.add_argument("-d", "--delimiter", default=",", help="The delimiter of the CSV files.")
+    merge.set_defaults(handler=_merge_command)
+
+    server = commands.add_parser("serve", help="Share a ledger with several clients over a local socket.")
+    server.add_argument("ledger", nargs="?", help="The ledger to serve, an empty one by default.")
+    server.add_argument("--host", default=DEFAULT_HOST,
+                        help="The address to listen on. Clients are not authenticated, so keep it local.")
+    server.add_argument("-p", "--port", type=int, default=DEFAULT_PORT, help="The TCP port to listen on.")
+    server.add_argument("--socket", help="A Unix socket to listen on instead of the TCP port.")
+    server.set_defaults(handler=_serve_command)
+
+    return parser
+
+
+def main(argv: list[str] = None) -> int:
+    parser = build_parser()
+    try:
+        args = parser.parse_args(argv)
+        return args.handler(args)
+    except (ValueError, IOError) as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        return 1
@@ -0,0 +1,58 @@
+import datetime
+import unittest
+
+from mamlambo.Database import Database
+from mamlambo.Database.balance_index import BalanceIndex
+from mamlambo.Transactions import Transaction
+
+
+class BalanceIndexTest(unittest.TestCase):
+    """An index built from a snapshot in the background answers like one built on first use."""
+    def setUp(self):
+        start = datetime.date(2024, 1, 1)
+        self.database = Database()
+        for i in range(500):
+            self.database.add(Transaction.parse([(start + datetime.timedelta(days=i % 90)).isoformat(),
+                                                 f"Transaction {i}", "Expenses::Food", f"{i % 7 - 3}.25", "EUR", ""]))
+        self.database.commit()
+
+    def index_snapshot(self, balances: BalanceIndex):
+        snapshot = self.database.snapshot()
+        return balances.index([snapshot[i] for i in range(len(snapshot))]), snapshot.version
+
+    def test_attached_index_matches_the_built_one(self):
+        built = BalanceIndex(self.database)
+        attached = BalanceIndex(self.database)
+        self.assertTrue(attached.attach(*self.index_snapshot(attached)))
+        on = datetime.date(2024, 2, 10)
+        for balances in (built, attached):
+            self.assertEqual(balances.incomes("EUR", None, on), built.incomes("EUR", None, on))
+            self.assertEqual(balances.expenses("EUR", None, on, "Expenses"), built.expenses("EUR", None, on))
+        self.assertEqual(attached.balance("EUR", on), built.balance("EUR", on))
+
+    def test_changed_database_is_not_attached(self):
+        balances = BalanceIndex(self.database)
+        indexed, version = self.index_snapshot(balances)
+        self.database.add(Transaction.parse(["2024-02-01", "Late", "Expenses::Food", "-100", "EUR", ""]))
+        self.database.commit()
+        self.assertFalse(balances.attach(indexed, version))
+        self.assertEqual(balances.balance("EUR", datetime.date(2024, 12, 31)).exact,
+                         sum(entry.amount.exact for entry in self.database))
+
+    def test_large_amounts_do_not_overflow(self):
+        balances = BalanceIndex(self.database)
+        on = datetime.date(2024, 3, 1)
+        before = balances.balance("IDR", on)
+        for amount in ("900000000000000", "900000000000000", "-1"):  # Beyond 2 ** 63 units of `Money.exact`
+            self.database.add(Transaction.parse(["2024-02-01", "Sale", "Income", amount, "IDR", ""]))
+        self.database.commit()
+        self.assertEqual(str(before), "0.00")
+        self.assertEqual(str(balances.balance("IDR", on)), "1799999999999999.00")
+        self.assertEqual(str(balances.incomes("IDR", None, on)), "1800000000000000.00")
+
+    def test_removed_transactions_are_not_indexed(self):
+        self.database.remove(0)
+        self.database.commit()
+        balances = BalanceIndex(self.database)
+        self.assertEqual(balances.balance("EUR", datetime.date(2024, 12, 31)).exact,
+                         sum(entry.amount.exact for entry in self.database if entry is not None))
@@ -0,0 +1,39 @@
+import datetime
+import unittest
+
+from mamlambo.Transactions import Money
+from mamlambo.Transactions.converter import Converter
+
+CONVERSIONS = [
+    {"#1": "EUR", "#2": "CZK", "Value": 25.0},
+    {"#1": "EUR", "#2": "CZK", "Value": 24.0, "Date": "2024-06-01"},
+]
+
+
+class ConverterTest(unittest.TestCase):
+    def setUp(self):
+        self.converter = Converter(CONVERSIONS)
+
+    def test_convert_many_money(self):
+        dates = [datetime.date(2024, 1, 1), datetime.date(2024, 7, 1), datetime.date(2024, 7, 1),
+                 datetime.date(2024, 7, 1)]
+        result = self.converter.convert_many(["EUR", "EUR", "CZK", "USD"], "CZK",
+                                             [Money.parse("10.50"), Money.parse("-2"), Money.parse("12.30"),
+                                              Money.parse("1")], dates)
+        self.assertEqual(result, [262.5, -48.0, 12.3, None])
+        self.assertTrue(all(isinstance(value, float) for value in result[:3]))
+
+    def test_convert_money(self):
+        self.assertEqual(self.converter.convert("EUR", "CZK", Money.parse("2"), datetime.date(2024, 1, 1)), "50.00")
+
+    def test_rate_by_date(self):
+        self.assertEqual(self.converter.rate("EUR", "CZK", datetime.date(2024, 5, 31)), 25.0)
+        self.assertEqual(self.converter.rate("EUR", "CZK", datetime.date(2024, 6, 1)), 24.0)
+        self.assertEqual(self.converter.rate("CZK", "EUR", datetime.date(2024, 6, 1)), 1 / 24.0)
+        self.assertEqual(self.converter.rate("CZK", "CZK"), 1.0)
+        with self.assertRaises(KeyError):
+            self.converter.rate("EUR", "USD")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import csv
+import tempfile
+import unittest
+from pathlib import Path
+
+from mamlambo.Database import Database
+from mamlambo.Transactions import Transaction
+
+ROWS = [
+    ["2024-01-01", "Salary", "Incomes::Work", "1000.00", "CZK", ""],
+    ["2024-01-02", "Groceries", "Expenses::Food", "-120.50", "CZK", "Weekly"],
+    ["2024-01-03", "Cinema", "Expenses::Fun", "-15.00", "EUR", ""],
+]
+
+
+def write_rows(path: Path, rows: list[list[str]], mode: str = "w") -> None:
+    with open(path, mode, encoding="utf-8", newline="") as f:
+        csv.writer(f).writerows(rows)
+
+
+class ImportTailTest(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.path = Path(self._directory.name) / "ledger.csv"
+        write_rows(self.path, ROWS)
+        self.database = Database()
+        self.database.load(str(self.path), Transaction.parse)
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def test_appended_rows_are_scheduled(self):
+        write_rows(self.path, [["2024-01-04", "Bonus", "Incomes::Work", "50.00", "CZK", ""]], "a")
+        self.assertEqual(self.database.import_tail(), 1)
+        self.assertEqual(self.database.import_tail(), 0)
+
+    def test_saving_into_the_source_keeps_following_it(self):
+        self.database.add(Transaction.parse(["2024-01-04", "Bonus", "Incomes::Work", "50.00", "CZK", ""]))
+        self.database.commit()
+        self.database.dump(self.path)
+
+        self.assertEqual(self.database.import_tail(), 0)
+        write_rows(self.path, [["2024-01-05", "Rent", "Expenses::Home", "-500.00", "CZK", ""]], "a")
+        self.assertEqual(self.database.import_tail(), 1)
+
+    def test_snapshot_saved_into_the_source_keeps_following_it(self):
+        self.database.add(Transaction.parse(["2024-01-04", "Bonus", "Incomes::Work", "50.00", "CZK", ""]))
+        self.database.commit()
+        snapshot = self.database.snapshot()
+        snapshot.dump(self.path)
+        self.database.mark_saved(snapshot.version, self.path)
+
+        self.assertTrue(self.database.is_saved())
+        self.assertEqual(self.database.import_tail(), 0)
+
+    def test_changed_file_is_not_reloaded(self):
+        self.database.add(Transaction.parse(["2024-01-04", "Bonus", "Incomes::Work", "50.00", "CZK", ""]))
+        write_rows(self.path, ROWS[1:])
+
+        self.assertIsNone(self.database.import_tail())
+        self.assertEqual(len(self.database), len(ROWS))
+        self.assertEqual(len(self.database.get_commits()), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,31 @@
+import unittest
+from fractions import Fraction
+
+from mamlambo.Transactions import Money
+
+
+class MoneyTest(unittest.TestCase):
+    """Amounts are compared with plain numbers by their exact value, consistently with their hashes."""
+    def test_equal_numbers(self):
+        self.assertEqual(Money.parse("1.50", 2), 1.5)
+        self.assertEqual(Money.parse("0", 2), 0)
+        self.assertEqual(Money.parse("-12", 0), -12)
+        self.assertEqual(Money.parse("1.5", 2), Money.parse("1.5000", 4))
+        self.assertNotEqual(Money.parse("0.10", 2), 0.1)  # The float is not exactly a tenth
+        self.assertNotEqual(Money.parse("1.50", 2), "1.50")
+
+    def test_ordering_agrees_with_equality(self):
+        amount = Money.parse("1.50", 2)
+        self.assertTrue(amount >= 1.5 and amount <= 1.5 and not amount < 1.5 and not amount > 1.5)
+        self.assertLess(Money.parse("0.10", 2), 0.1)
+        self.assertLess(amount, float("inf"))
+        self.assertGreater(amount, float("-inf"))
+        self.assertFalse(amount == float("nan") or amount < float("nan"))
+
+    def test_hash_of_equal_numbers(self):
+        for text, scale in (("0", 2), ("1.50", 2), ("-7", 0), ("0.0001", 4), ("-1234.125", 3), ("0.10", 2)):
+            amount = Money.parse(text, scale)
+            self.assertEqual(hash(amount), hash(Fraction(text)), text)
+        self.assertEqual(hash(Money.parse("1.50", 2)), hash(1.5))
+        self.assertEqual(hash(Money.parse("-1", 2)), hash(-1))
+        self.assertEqual(len({Money.parse("2.5", 1), Money.parse("2.50", 2), 2.5}), 1)
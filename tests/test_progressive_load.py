@@ -0,0 +1,40 @@
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from mamlambo.Database import Database
+from mamlambo.Database.progressive_load import ProgressiveLoad
+from mamlambo.Transactions import Transaction
+
+
+def poll_until_finished(loading: ProgressiveLoad, timeout: float = 10) -> None:
+    deadline = time.monotonic() + timeout
+    while not loading.poll():
+        if time.monotonic() > deadline:
+            raise AssertionError("The progressive load never finished")
+        time.sleep(0.01)
+
+
+class ProgressiveLoadTest(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.directory = Path(self._directory.name)
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def test_ledger_is_loaded_in_chunks(self):
+        path = self.directory / "ledger.csv"
+        path.write_text("".join(f"2024-01-{i % 28 + 1:02},Transaction {i},Food,-{i}.5,EUR,\n" for i in range(100)))
+        database = Database()
+        poll_until_finished(ProgressiveLoad(database, str(path), Transaction.parse, first_chunk=8, largest_chunk=32))
+        self.assertEqual(len(database), 100)
+
+    def test_malformed_json_ledger_is_reported(self):
+        path = self.directory / "ledger.json"
+        path.write_text("[1, 2, 3]")
+        loading = ProgressiveLoad(Database(), str(path), Transaction.parse)
+        with self.assertRaises(ValueError):
+            poll_until_finished(loading)
+        self.assertTrue(loading.poll())
@@ -0,0 +1,67 @@
+import asyncio
+import datetime
+import tempfile
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from mamlambo.Database import Database
+from mamlambo.Server import LedgerClient
+from mamlambo.Server.server import LedgerServer
+from mamlambo.Transactions import Transaction
+
+CLIENTS = 4
+
+
+class ConcurrentReadsTest(unittest.TestCase):
+    """The reads of different clients run at the same time, and may load the partitions of the ledger."""
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        directory = Path(self._directory.name)
+        start = datetime.date(2018, 1, 1)
+        self.rows = [[(start + datetime.timedelta(days=i % 1500)).isoformat(), f"Transaction {i}",
+                      "Expenses::Food" if i % 3 else "Incomes::Work", f"{(i % 200) - 150}.25", "CZK", ""]
+                     for i in range(20000)]
+        ledger = Database(partition_by="year")
+        for row in self.rows:
+            ledger.add(Transaction.parse(row))
+        ledger.commit()
+        ledger.dump_partitioned(directory / "ledger")
+
+        self.server = LedgerServer(str(directory / "ledger"))
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self.server.start("127.0.0.1", 0), self._loop).result()
+        self.port = self.server.addresses()[0][1]
+
+    def tearDown(self):
+        asyncio.run_coroutine_threadsafe(self.server.close(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._directory.cleanup()
+
+    def _statistics(self, filters: list[str]) -> dict:
+        with LedgerClient(port=self.port) as client:
+            return client.statistics(filters)
+
+    def test_concurrent_statistics_load_every_partition_once(self):
+        filters = ["Date >= 2020-03-15"]
+        with ThreadPoolExecutor(CLIENTS) as pool:
+            reports = list(pool.map(self._statistics, [filters] * CLIENTS))
+
+        expected = sum(1 for row in self.rows if row[0] >= "2020-03-15")
+        for report in reports:
+            self.assertEqual(report["currencies"]["CZK"]["count"], expected)
+
+        # Reading the whole ledger loads the remaining partitions, none of them twice
+        with LedgerClient(port=self.port) as client:
+            total, _ = client.query()
+        self.assertEqual(total, len(self.rows))
+        self.assertEqual(len(self.server.database), len(self.rows))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import datetime
+import sqlite3
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+from mamlambo.Database import SQLiteDatabase
+from mamlambo.Database.balance_index import BalanceIndex
+from mamlambo.Database.query import SortKey, parse_filter_text
+from mamlambo.Transactions import Transaction
+
+
+class SQLiteDatabaseTest(unittest.TestCase):
+    """The amounts are stored exactly, as integers, see `Money.exact`."""
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.path = Path(self._directory.name) / "ledger.sqlite"
+        self.database = SQLiteDatabase()
+        self.database.load(str(self.path), Transaction.parse)
+        for row in (["2024-01-01", "Coffee", "Food", "0.10", "EUR", ""],
+                    ["2024-01-02", "Tea", "Food", "0.20", "EUR", ""],
+                    ["2024-01-03", "Rice", "Food", "-12000", "JPY", ""],
+                    ["2024-01-04", "Tax", "State", "1.125", "KWD", ""],
+                    ["2024-01-05", "Fee", "Bank", "0.0001", "EUR", ""]):
+            self.database.add(Transaction.parse(row))
+        self.database.commit()
+
+    def tearDown(self):
+        self.database.close()
+        self._directory.cleanup()
+
+    def test_amounts_are_stored_as_integers(self):
+        connection = sqlite3.connect(self.path)
+        try:
+            amounts = [row[0] for row in connection.execute("SELECT amount FROM transactions ORDER BY id")]
+        finally:
+            connection.close()
+        self.assertEqual(amounts, [1000, 2000, -120000000, 11250, 1])
+
+    def test_amounts_are_read_back_with_their_scale(self):
+        self.assertEqual([str(entry.amount) for entry in self.database],
+                         ["0.10", "0.20", "-12000", "1.125", "0.0001"])
+
+    def test_amount_filters_compare_exactly(self):
+        filters = [parse_filter_text("Amount >= 0.2"), parse_filter_text("Currency == EUR")]
+        titles = [self.database[i].title for i in self.database.candidate_indices(filters)]
+        self.assertEqual(titles, ["Tea"])
+        filters = [parse_filter_text("Amount == 0.0001")]
+        self.assertEqual([self.database[i].title for i in self.database.candidate_indices(filters)], ["Fee"])
+
+    def test_entries_are_read_in_one_ordered_query(self):
+        filters = [parse_filter_text("Currency == EUR")]
+        result = []
+        worker = threading.Thread(target=lambda: result.extend(self.database.read_entries(filters, SortKey("Amount"),
+                                                                                          True)))
+        worker.start()
+        worker.join()
+        self.assertEqual([entry.title for entry in result], ["Tea", "Coffee", "Fee"])
+        self.assertEqual([entry.title for entry in self.database.read_entries([])],
+                         ["Coffee", "Tea", "Rice", "Tax", "Fee"])
+
+    def test_balance_index_attaches_entries_read_in_the_background(self):
+        balances = BalanceIndex(self.database, [parse_filter_text("Currency == EUR")])
+        version = self.database.get_version()
+        entries = self.database.read_entries([parse_filter_text("Currency == EUR")], SortKey("Date"))
+        self.assertTrue(balances.attach(balances.index(entries), version))
+        self.assertEqual(str(balances.balance("EUR", datetime.date(2024, 1, 31))), "0.3001")
@@ -0,0 +1,82 @@
+import datetime
+import tempfile
+import unittest
+from pathlib import Path
+
+from mamlambo.Database import Database
+from mamlambo.Database.partition import PartitionSummary
+from mamlambo.Database.query import parse_filter_text
+from mamlambo.Database.statistics import partition_statistics
+from mamlambo.Transactions import Transaction
+
+
+def amounts(summary) -> dict:
+    """The amounts of the summary by currency. The titles of equal extremes depend on the order of the entries."""
+    return {name: (currency.count, currency.total, currency.max[0], currency.min[0], currency.expenses)
+            for name, currency in summary.currencies.items()}
+
+
+class PartitionStatisticsTest(unittest.TestCase):
+    """The statistics of a partitioned ledger, partly combined from the summaries, match those of a flat one."""
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        start = datetime.date(2023, 1, 1)
+        rows = [[(start + datetime.timedelta(days=i % 700)).isoformat(), f"Transaction {i}", "Expenses::Food",
+                 f"-{i % 90}.50", "EUR" if i % 4 else "USD", ""] for i in range(3000)]
+        self.flat = Database()
+        self.partitioned = Database(partition_by="month")
+        for database in (self.flat, self.partitioned):
+            for row in rows:
+                database.add(Transaction.parse(row))
+            database.commit()
+        directory = Path(self._directory.name) / "ledger"
+        self.partitioned.dump_partitioned(directory)
+        self.partitioned = Database()
+        self.partitioned.load(str(directory), Transaction.parse)
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def assert_same(self, *texts: str):
+        filters = [parse_filter_text(text) for text in texts]
+        flat = partition_statistics(self.flat, filters)
+        partitioned = partition_statistics(self.partitioned, filters)
+        self.assertEqual(partitioned.count, flat.count, texts)
+        self.assertEqual(amounts(partitioned), amounts(flat))
+        return flat
+
+    def test_date_ranges(self):
+        self.assertGreater(self.assert_same("Date >= 2023-03-15", "Date < 2024-02-01").count, 0)
+        self.assert_same("Date == 2023-06-30", "Currency == EUR")
+
+    def test_excluded_day(self):
+        self.assertGreater(self.assert_same("Date != 2023-06-30").count, 0)
+
+    def test_conflicting_currencies(self):
+        self.assertEqual(self.assert_same("Currency == EUR", "Currency == USD").count, 0)
+
+
+class PartitionSummaryTest(unittest.TestCase):
+    def test_manifest_keeps_the_decimals_of_the_currencies(self):
+        summary = PartitionSummary()
+        for row in (["2024-01-01", "Sushi", "Expenses::Food", "-4991", "JPY", ""],
+                    ["2024-01-02", "Rent", "Expenses::Home", "-120.125", "KWD", ""],
+                    ["2024-01-03", "Lunch", "Expenses::Food", "-12.3", "CZK", ""]):
+            summary.add(Transaction.parse(row))
+
+        loaded = PartitionSummary.from_dict(summary.to_dict())
+        self.assertEqual(loaded.to_dict(), summary.to_dict())
+        self.assertEqual(str(loaded.currencies["JPY"].min[0]), "-4991")
+        self.assertEqual(str(loaded.currencies["KWD"].min[0]), "-120.125")
+        self.assertEqual(str(loaded.currencies["CZK"].min[0]), "-12.30")
+
+    def test_float_manifest_is_read_exactly(self):
+        data = {"count": 2, "total": 0.30000000000000004, "max": [0.2, "b"], "min": [0.1, "a"],
+                "incomes": {"Incomes": 0.3}, "expenses": {}}
+        loaded = PartitionSummary.from_dict({"count": 2, "min_date": "2024-01-01", "max_date": "2024-01-01",
+                                             "currencies": {"CZK": data}})
+        self.assertEqual(loaded.currencies["CZK"].to_dict()["incomes"], {"Incomes": "0.30"})
+
+
+if __name__ == "__main__":
+    unittest.main()